@@ -24,7 +24,9 @@ if _IS_GEVENT_WORKER:
 # --- End Gevent Monkey Patching ---
 
 from celery import Celery
+from celery.signals import worker_process_shutdown
 from django.conf import settings
+from kombu import Exchange, Queue
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LifeLedger.settings')
@@ -48,9 +50,61 @@ app.conf.update(
                                        getattr(settings, 'CELERY_TASK_DEFAULT_QUEUE', 'celery')),
 )
 
+# --- Queues and routing ---
+# Per-entry AI tasks (interactive), period insights, suggestions and bulk reprocessing (batch) and
+# housekeeping (maintenance) each have their own queue; anything unrouted stays on the default queue.
+INTERACTIVE_QUEUE = getattr(settings, 'CELERY_INTERACTIVE_QUEUE', 'ai_interactive')
+BATCH_QUEUE = getattr(settings, 'CELERY_BATCH_QUEUE', 'ai_batch')
+MAINTENANCE_QUEUE = getattr(settings, 'CELERY_MAINTENANCE_QUEUE', 'maintenance')
+
+TASK_QUEUES = {
+    'ai_services.tasks.generate_quote_for_entry_task': INTERACTIVE_QUEUE,
+    'ai_services.tasks.detect_mood_for_entry_task': INTERACTIVE_QUEUE,
+    'ai_services.tasks.suggest_tags_for_entry_task': INTERACTIVE_QUEUE,
+    'ai_services.tasks.analyze_entry_task': INTERACTIVE_QUEUE,
+    'ai_services.tasks.generate_insights_for_period_task': BATCH_QUEUE,
+    'ai_services.tasks.summarize_period_window_task': BATCH_QUEUE,
+    'ai_services.tasks.merge_insights_summaries_task': BATCH_QUEUE,
+    'ai_services.tasks.generate_life_suggestions_task': BATCH_QUEUE,
+    'ai_services.tasks.sweep_task_results_task': MAINTENANCE_QUEUE,
+    'LifeLedger.celery.debug_task_explicit': MAINTENANCE_QUEUE,
+}
+
+
+def queue_options(queue):
+    """Returns the apply_async routing options (queue and priority) for `queue`."""
+    options = {'queue': queue}
+    priority = getattr(settings, 'CELERY_QUEUE_PRIORITIES', {}).get(queue)
+    if priority is not None:
+        options['priority'] = priority
+    return options
+
+
+def _declare_queue(name, exchange=None, routing_key=None):
+    return Queue(name, Exchange(exchange or name, type='direct'), routing_key=routing_key or name)
+
+
+app.conf.update(
+    task_queues=(
+        _declare_queue(app.conf.task_default_queue, app.conf.task_default_exchange, app.conf.task_default_routing_key),
+        _declare_queue(INTERACTIVE_QUEUE),
+        _declare_queue(BATCH_QUEUE),
+        _declare_queue(MAINTENANCE_QUEUE),
+    ),
+    task_routes={task_name: queue_options(queue) for task_name, queue in TASK_QUEUES.items()},
+)
+
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks() 
 
+@worker_process_shutdown.connect
+def close_ai_http_session(**kwargs):
+    """
+    Closes the pooled AI provider connections when a worker process exits.
+    """
+    from ai_services.http_client import close_http_session
+    close_http_session()
+
 # This is the debug task defined in your project's celery.py
 @app.task(bind=True, ignore_result=True, name='LifeLedger.celery.debug_task_explicit')
 def debug_task(self):
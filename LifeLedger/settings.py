@@ -1,6 +1,7 @@
 # LifeLedger/LifeLedger/settings.py
 
 import os
+import json
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -140,6 +141,49 @@ LOGGING = {
     'root': {'handlers': ['console'],'level': 'INFO',},
 }
 
+# --- Cache Configuration ---
+# Set CACHE_REDIS_URL in production so caches and AI metrics are shared by all web and worker
+# processes. Without it, each process falls back to its own in-memory cache.
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+
+# Cached AI provider responses, keyed on task, model, prompt version and content hash.
+AI_RESPONSE_CACHE_ENABLED = os.getenv('AI_RESPONSE_CACHE_ENABLED', 'True').lower() in ('true', '1', 't')
+AI_RESPONSE_CACHE_TTL = int(os.getenv('AI_RESPONSE_CACHE_TTL', 60 * 60 * 24 * 7))
+AI_RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('AI_RESPONSE_CACHE_MAX_ENTRIES', 10000))
+AI_RESPONSE_CACHE_MAX_VALUE_BYTES = int(os.getenv('AI_RESPONSE_CACHE_MAX_VALUE_BYTES', 16 * 1024))
+# How long memoized insights/suggestions results are served while the user's entries are unchanged.
+AI_RESULT_CACHE_TTL = int(os.getenv('AI_RESULT_CACHE_TTL', 60 * 60 * 24))
+# How long the dashboard's chart data is cached; entries whose mood or date changes invalidate it sooner.
+AI_CHART_CACHE_TTL = int(os.getenv('AI_CHART_CACHE_TTL', 60 * 60 * 24))
+
+if CACHE_REDIS_URL:
+    # On Redis, size is bounded by the key TTL plus the server's eviction policy
+    # (configure maxmemory with volatile-lru or allkeys-lru).
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        },
+        'ai_responses': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+            'TIMEOUT': AI_RESPONSE_CACHE_TTL,
+            'KEY_PREFIX': 'lifeledger',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'ai_responses': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'ai-responses',
+            'TIMEOUT': AI_RESPONSE_CACHE_TTL,
+            'OPTIONS': {'MAX_ENTRIES': AI_RESPONSE_CACHE_MAX_ENTRIES},
+        },
+    }
+
 # --- Celery Configuration ---
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
@@ -149,16 +193,147 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_ALWAYS_EAGER = False # Ensure this is False for actual async behavior
 
+# --- Celery Results ---
+# Per-entry AI tasks record their outcome on the entry and store no result. Stored results expire after
+# CELERY_RESULT_EXPIRES seconds; insights and suggestions, which are polled once and then memoized,
+# after AI_POLL_RESULT_TTL. On Redis, results go through ai_services.result_backend.CompactRedisBackend,
+# which applies those per-task TTLs and zlib-compresses payloads of at least AI_RESULT_COMPRESSION_MIN_BYTES
+# bytes (0 disables compression).
+CELERY_RESULT_EXPIRES = int(os.getenv('CELERY_RESULT_EXPIRES', 60 * 60 * 24))
+AI_POLL_RESULT_TTL = int(os.getenv('AI_POLL_RESULT_TTL', 60 * 60))
+AI_RESULT_COMPRESSION_MIN_BYTES = int(os.getenv('AI_RESULT_COMPRESSION_MIN_BYTES', 1024))
+if CELERY_RESULT_BACKEND.startswith(('redis://', 'rediss://')):
+    CELERY_RESULT_BACKEND = 'ai_services.result_backend:CompactRedisBackend+' + CELERY_RESULT_BACKEND
+# The maintenance queue's sweeper gives results stored without an expiry one (or deletes them if their
+# task no longer stores results). Run `celery -A LifeLedger beat` to schedule it.
+AI_RESULT_SWEEP_INTERVAL = int(os.getenv('AI_RESULT_SWEEP_INTERVAL', 60 * 60))
+CELERY_BEAT_SCHEDULE = {
+    'sweep-task-results': {
+        'task': 'ai_services.tasks.sweep_task_results_task',
+        'schedule': AI_RESULT_SWEEP_INTERVAL,
+    },
+}
+
 # Define a default queue, exchange, and routing key explicitly
 CELERY_TASK_DEFAULT_QUEUE = 'lifelookup_default_queue'
 CELERY_TASK_DEFAULT_EXCHANGE = 'lifelookup_default_exchange'
 CELERY_TASK_DEFAULT_ROUTING_KEY = 'lifelookup_default_key'
 
+# AI work is split into queues by latency class, so slow batch jobs cannot hold up the per-entry
+# tasks a user is watching in the progress modal. Tasks are routed in LifeLedger/celery.py; run one
+# worker per queue in production (see README) to size concurrency and prefetch per workload.
+CELERY_INTERACTIVE_QUEUE = os.getenv('CELERY_INTERACTIVE_QUEUE', 'ai_interactive')
+CELERY_BATCH_QUEUE = os.getenv('CELERY_BATCH_QUEUE', 'ai_batch')
+CELERY_MAINTENANCE_QUEUE = os.getenv('CELERY_MAINTENANCE_QUEUE', 'maintenance')
+# Message priority of each queue's tasks; 0 is served first. Redis emulates priorities with one
+# list per priority step, which matters when a worker consumes several queues.
+CELERY_QUEUE_PRIORITIES = {
+    CELERY_INTERACTIVE_QUEUE: 0,
+    CELERY_BATCH_QUEUE: 6,
+    CELERY_MAINTENANCE_QUEUE: 9,
+}
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+# AI tasks acknowledge late; reserving one task per process keeps queued work available to the
+# next idle process instead of waiting behind a slow one.
+CELERY_WORKER_PREFETCH_MULTIPLIER = int(os.getenv('CELERY_WORKER_PREFETCH_MULTIPLIER', 1))
+
 
 # --- OpenRouter API Configuration ---
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
 YOUR_SITE_URL = os.getenv('YOUR_SITE_URL', 'http://localhost:8000') 
 YOUR_SITE_NAME = os.getenv('YOUR_SITE_NAME', 'LifeLedger') 
 
+AI_MODEL_FOR_JOURNAL_ANALYSIS = os.getenv('AI_MODEL_FOR_JOURNAL_ANALYSIS', 'openai/gpt-3.5-turbo')
+# Base URL of the OpenAI-compatible chat-completions API. Point it at the bundled
+# mock provider (`python manage.py ai_mock_provider`) for offline load testing.
+OPENROUTER_API_BASE_URL = os.getenv('OPENROUTER_API_BASE_URL', 'https://openrouter.ai/api/v1')
+
+# --- AI Provider HTTP Client ---
+# One pooled keep-alive session is kept per worker process (see ai_services/http_client.py).
+# Under the gevent pool, AI_HTTP_POOL_SIZE should be at least the worker's --concurrency.
+AI_HTTP_POOL_SIZE = int(os.getenv('AI_HTTP_POOL_SIZE', 10))
+AI_HTTP_POOL_CONNECTIONS = int(os.getenv('AI_HTTP_POOL_CONNECTIONS', 2))
+AI_HTTP_POOL_BLOCK = os.getenv('AI_HTTP_POOL_BLOCK', 'False').lower() in ('true', '1', 't')
+AI_HTTP_CONNECT_TIMEOUT = float(os.getenv('AI_HTTP_CONNECT_TIMEOUT', 5))
+AI_HTTP_READ_TIMEOUT = float(os.getenv('AI_HTTP_READ_TIMEOUT', 60))
+
+# --- AI Provider Rate Limiting ---
+# Shared Redis state for AI coordination (rate limits, concurrency slots).
+AI_REDIS_URL = os.getenv('AI_REDIS_URL', CELERY_BROKER_URL)
+AI_RATE_LIMIT_ENABLED = os.getenv('AI_RATE_LIMIT_ENABLED', 'True').lower() in ('true', '1', 't')
+# Seconds a task waits for capacity before giving up (and retrying later).
+AI_RATE_LIMIT_MAX_WAIT = float(os.getenv('AI_RATE_LIMIT_MAX_WAIT', 120))
+# Per-model limits, shared by all workers. Keys are model names as used in AI_MODEL_FOR_JOURNAL_ANALYSIS;
+# 'default' applies to any model without its own entry. AI_RATE_LIMITS_JSON may add or override models,
+# e.g. '{"openai/gpt-4o": {"requests_per_second": 2, "tokens_per_minute": 30000, "max_in_flight": 8}}'.
+AI_RATE_LIMITS = {
+    'default': {
+        'requests_per_second': float(os.getenv('AI_RATE_LIMIT_RPS', 5)),
+        'tokens_per_minute': int(os.getenv('AI_RATE_LIMIT_TPM', 100000)),
+        'max_in_flight': int(os.getenv('AI_RATE_LIMIT_MAX_IN_FLIGHT', 20)),
+    },
+}
+AI_RATE_LIMITS.update(json.loads(os.getenv('AI_RATE_LIMITS_JSON', '{}')))
+
+# --- AI Provider Circuit Breaker ---
+# Opens when, over the last WINDOW_SIZE calls (at least MIN_CALLS), the error rate reaches ERROR_RATE or the
+# LATENCY_PERCENTILE latency exceeds LATENCY_THRESHOLD seconds. While open, AI tasks use their fallbacks
+# immediately; after COOLDOWN seconds HALF_OPEN_PROBES trial calls decide whether it closes again.
+AI_CIRCUIT_BREAKER_ENABLED = os.getenv('AI_CIRCUIT_BREAKER_ENABLED', 'True').lower() in ('true', '1', 't')
+AI_CIRCUIT_BREAKER_WINDOW_SIZE = int(os.getenv('AI_CIRCUIT_BREAKER_WINDOW_SIZE', 50))
+AI_CIRCUIT_BREAKER_MIN_CALLS = int(os.getenv('AI_CIRCUIT_BREAKER_MIN_CALLS', 10))
+AI_CIRCUIT_BREAKER_ERROR_RATE = float(os.getenv('AI_CIRCUIT_BREAKER_ERROR_RATE', 0.5))
+AI_CIRCUIT_BREAKER_LATENCY_PERCENTILE = float(os.getenv('AI_CIRCUIT_BREAKER_LATENCY_PERCENTILE', 0.95))
+AI_CIRCUIT_BREAKER_LATENCY_THRESHOLD = float(os.getenv('AI_CIRCUIT_BREAKER_LATENCY_THRESHOLD', 20))
+AI_CIRCUIT_BREAKER_COOLDOWN = float(os.getenv('AI_CIRCUIT_BREAKER_COOLDOWN', 30))
+AI_CIRCUIT_BREAKER_HALF_OPEN_PROBES = int(os.getenv('AI_CIRCUIT_BREAKER_HALF_OPEN_PROBES', 1))
+
+# --- AI Task Retries ---
+# Transient provider errors are retried after a random delay in [0, min(MAX, BASE * 2**attempt)] seconds
+# (full jitter); a provider Retry-After header is honored as the minimum delay.
+AI_RETRY_BACKOFF_BASE = float(os.getenv('AI_RETRY_BACKOFF_BASE', 10))
+AI_RETRY_BACKOFF_MAX = float(os.getenv('AI_RETRY_BACKOFF_MAX', 600))
+
+# --- AI Usage Quotas ---
+# Prompt + completion tokens of every provider call are metered per user and day (AIUsageCounter).
+# New insights, suggestions and per-entry AI work is refused with HTTP 429 once the user's or everyone's
+# tokens for the day reach these limits (0 = unlimited). Quotas reset at midnight in TIME_ZONE.
+AI_QUOTA_ENABLED = os.getenv('AI_QUOTA_ENABLED', 'True').lower() in ('true', '1', 't')
+AI_USER_DAILY_TOKEN_QUOTA = int(os.getenv('AI_USER_DAILY_TOKEN_QUOTA', 200000))
+AI_GLOBAL_DAILY_TOKEN_QUOTA = int(os.getenv('AI_GLOBAL_DAILY_TOKEN_QUOTA', 0))
+
+# --- AI Task Deduplication ---
+# Per-entry tasks are claimed in Redis (AI_REDIS_URL) under (entry, task, content hash) when queued, so a
+# duplicate dispatch reuses the in-flight task. Claims of crashed tasks expire after CLAIM_TTL seconds.
+AI_TASK_DEDUP_ENABLED = os.getenv('AI_TASK_DEDUP_ENABLED', 'True').lower() in ('true', '1', 't')
+AI_TASK_CLAIM_TTL = int(os.getenv('AI_TASK_CLAIM_TTL', 900))
+
+# --- AI Progress Streaming ---
+# The journal form's progress modal follows per-entry AI tasks over Server-Sent Events, fed by Redis
+# pub/sub (AI_REDIS_URL). Streams need an ASGI server (e.g. `uvicorn LifeLedger.asgi:application`), so
+# they are off unless AI_PROGRESS_SSE_ENABLED is set; requests served over WSGI never stream. The browser
+# polls when the stream is disabled or unavailable, or ends before all tasks are done.
+AI_PROGRESS_SSE_ENABLED = os.getenv('AI_PROGRESS_SSE_ENABLED', 'False').lower() in ('true', '1', 't')
+AI_PROGRESS_STREAM_TIMEOUT = float(os.getenv('AI_PROGRESS_STREAM_TIMEOUT', 120))
+AI_PROGRESS_HEARTBEAT = float(os.getenv('AI_PROGRESS_HEARTBEAT', 15))
+# Maximum number of entries per request to the batch AI status endpoint.
+AI_STATUS_BATCH_MAX = int(os.getenv('AI_STATUS_BATCH_MAX', 100))
+
+# --- AI Prompt Token Budgets ---
+# Prompts are measured with tiktoken when installed (set TIKTOKEN_CACHE_DIR to a pre-populated
+# directory for offline hosts), otherwise estimated at ~4 characters per token.
+AI_TOKENIZER_ENCODING = os.getenv('AI_TOKENIZER_ENCODING', 'cl100k_base')
+# Token budget of the journal content in each task's prompt; see ai_services/tokens.py for the defaults.
+# e.g. '{"collective_insights": 12000, "mood_detection": 200}'
+AI_PROMPT_TOKEN_BUDGETS = json.loads(os.getenv('AI_PROMPT_TOKEN_BUDGETS_JSON', '{}'))
+
+# When enabled, quote, mood and tags for an entry are requested in one combined AI call
+# (ai_services.tasks.analyze_entry_task) instead of three separate tasks.
+AI_COMBINED_ENTRY_ANALYSIS = os.getenv('AI_COMBINED_ENTRY_ANALYSIS', 'False').lower() in ('true', '1', 't')
+
 if not OPENROUTER_API_KEY:
     print("WARNING: OPENROUTER_API_KEY environment variable not set. AI features requiring it will not work.")
@@ -1 +1,19 @@
-from django.contrib import admin
\ No newline at end of file
+from django.contrib import admin
+
+from .models import AIUsageCounter, DailyMoodRollup
+
+
+@admin.register(AIUsageCounter)
+class AIUsageCounterAdmin(admin.ModelAdmin):
+    list_display = ('day', 'user', 'calls', 'prompt_tokens', 'completion_tokens')
+    list_filter = ('day',)
+    search_fields = ('user__username',)
+    date_hierarchy = 'day'
+
+
+@admin.register(DailyMoodRollup)
+class DailyMoodRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'user', 'happy_count', 'excited_count', 'calm_count', 'neutral_count', 'sad_count',
+                    'angry_count', 'score_sum')
+    search_fields = ('user__username',)
+    date_hierarchy = 'day'
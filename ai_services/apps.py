@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AiServicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ai_services'
+
+    def ready(self):
+        # Connects the period summary invalidation handlers.
+        import ai_services.signals  # noqa: F401
@@ -0,0 +1,150 @@
+# ai_services/async_client.py
+
+"""
+Asyncio-native counterpart of `tasks.call_openrouter_api`, for bulk jobs that
+need many provider requests in flight from a single process.
+
+It shares the request format, the response cache, the Redis rate limiter and
+the circuit breaker with the synchronous path. The blocking Redis calls of
+the limiter and breaker run in worker threads, so the event loop never stalls
+while waiting for capacity.
+"""
+import asyncio
+import logging
+import os
+import time
+
+from django.conf import settings
+
+try:
+    import httpx
+except ImportError:  # httpx is only needed for bulk reprocessing.
+    httpx = None
+
+from . import circuit_breaker
+from .rate_limit import acquire_capacity, release_capacity, estimate_tokens
+from .response_cache import make_cache_key, get_cached_response, set_cached_response
+from .retry import RetryableAIError, compute_backoff, is_retryable_status, parse_retry_after
+from .tokens import record_usage, usage_from_response
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncOpenRouterClient:
+    """
+    A pooled httpx.AsyncClient plus the same admission control used by the
+    Celery tasks. Use as an async context manager:
+
+        async with AsyncOpenRouterClient(max_connections=32) as client:
+            text = await client.complete(prompt, "mood_detection", max_tokens=10)
+    """
+
+    def __init__(self, max_connections=None, max_retries=3):
+        if httpx is None:
+            raise ImportError("httpx is required for the asyncio AI client. Install it with 'pip install httpx'.")
+        from .tasks import AI_MODEL_FOR_ALL_TASKS, OPENROUTER_API_URL
+        self.model = AI_MODEL_FOR_ALL_TASKS
+        self.url = OPENROUTER_API_URL
+        self.max_retries = max_retries
+        self.api_key = os.getenv('OPENROUTER_API_KEY')
+        max_connections = max_connections or getattr(settings, 'AI_HTTP_POOL_SIZE', 10)
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(
+                getattr(settings, 'AI_HTTP_READ_TIMEOUT', 60.0),
+                connect=getattr(settings, 'AI_HTTP_CONNECT_TIMEOUT', 5.0),
+            ),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def complete(self, prompt_text, task_name, max_tokens=250, temperature=0.6, response_format=None,
+                       entry_id=None, cache_content=None, cache_context='', user_id=None):
+        """
+        Sends one chat-completions request and returns the message content,
+        or None on a non-retryable failure or an open circuit breaker.
+        Transient failures are retried here with the shared backoff policy.
+        """
+        from .tasks import PROMPT_VERSIONS
+
+        cache_key = None
+        if cache_content is not None:
+            cache_key = make_cache_key(task_name, self.model, cache_content, PROMPT_VERSIONS.get(task_name, 1), cache_context)
+            cached_response = get_cached_response(cache_key)
+            if cached_response is not None:
+                return cached_response
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                content = await self._request(prompt_text, task_name, max_tokens, temperature, response_format, entry_id,
+                                              user_id)
+            except RetryableAIError as exc:
+                if attempt >= self.max_retries:
+                    logger.error(f"Giving up on {task_name} for entry {entry_id} after {self.max_retries} retries: {exc}")
+                    return None
+                await asyncio.sleep(compute_backoff(attempt, exc.retry_after))
+                continue
+            if content and cache_key:
+                set_cached_response(cache_key, content)
+            return content
+        return None
+
+    async def _request(self, prompt_text, task_name, max_tokens, temperature, response_format, entry_id, user_id=None):
+        from .tasks import build_openrouter_request, extract_response_content
+
+        if not self.api_key:
+            logger.error(f"FATAL: OPENROUTER_API_KEY not found. Aborting {task_name} for entry ID {entry_id}.")
+            return None
+        permit = await asyncio.to_thread(circuit_breaker.allow_request)
+        if not permit:
+            return None
+
+        payload, headers = build_openrouter_request(self.api_key, prompt_text, max_tokens, temperature, response_format)
+        try:
+            slot = await asyncio.to_thread(acquire_capacity, self.model, estimate_tokens(prompt_text, max_tokens))
+            try:
+                started_at = time.monotonic()
+                try:
+                    response = await self._client.post(self.url, headers=headers, json=payload)
+                except httpx.TransportError as e:
+                    await asyncio.to_thread(circuit_breaker.record_result, False, time.monotonic() - started_at, permit=permit)
+                    raise RetryableAIError(f"{type(e).__name__} calling OpenRouter") from e
+                await asyncio.to_thread(
+                    circuit_breaker.record_result,
+                    response.status_code < 500 and response.status_code != 429,
+                    time.monotonic() - started_at,
+                    permit=permit,
+                )
+            finally:
+                await asyncio.to_thread(release_capacity, slot)
+        finally:
+            # A probe that never reached the provider (e.g. no rate limit capacity) reported no outcome.
+            await asyncio.to_thread(circuit_breaker.release_probe, permit)
+
+        if response.status_code >= 400:
+            logger.error(f"OpenRouter API HTTPError for {task_name} (entry ID {entry_id}): "
+                         f"{response.status_code} - {response.text[:200]}")
+            if is_retryable_status(response.status_code):
+                raise RetryableAIError(
+                    f"OpenRouter returned HTTP {response.status_code}",
+                    retry_after=parse_retry_after(response.headers.get('Retry-After')),
+                )
+            return None
+
+        try:
+            response_data = response.json()
+            content = extract_response_content(response_data, response_format)
+        except ValueError as e:
+            logger.warning(f"Malformed OpenRouter response for {task_name} (entry ID {entry_id}): {e}")
+            return None
+        await asyncio.to_thread(
+            record_usage, task_name, *usage_from_response(response_data, prompt_text, content), user_id=user_id,
+        )
+        return content
@@ -0,0 +1,365 @@
+# ai_services/bulk.py
+
+"""
+Bulk (re)processing of AI enrichment across many journal entries.
+
+Entries are streamed from the database in keyset-paginated batches. Each batch
+is analysed with up to `concurrency` provider requests in flight on a single
+event loop (see async_client.py), within the shared rate limits, and its
+results are written back with batched UPDATEs instead of one write per entry.
+"""
+import asyncio
+import datetime
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from .async_client import AsyncOpenRouterClient
+
+logger = logging.getLogger(__name__)
+
+BULK_TASK_TYPES = ('quote', 'mood', 'tags')
+
+# task type -> (provider task name, max_tokens, temperature), as used by the per-entry Celery tasks.
+TASK_PARAMS = {
+    'quote': ('quote_generation', 120, 0.7),
+    'mood': ('mood_detection', 10, 0.4),
+    'tags': ('tag_suggestion', 50, 0.3),
+}
+COMBINED_TASK_PARAMS = ('entry_analysis', 200, 0.5)
+
+_ROW_FIELDS = (
+    'pk', 'user_id', 'content', 'mood', 'ai_mood_task_id', 'ai_tags_task_id',
+    'ai_quote_processed', 'ai_mood_processed', 'ai_tags_processed',
+    'user__profile__ai_enable_quotes',
+    'user__profile__ai_enable_mood_detection',
+    'user__profile__ai_enable_tag_suggestion',
+)
+
+
+class BulkProgress:
+    """Tracks throughput and ETA of a bulk run."""
+
+    def __init__(self, total):
+        self.total = total
+        self.processed = 0
+        self.failed = 0
+        self.last_pk = None
+        self.started_at = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    @property
+    def rate(self):
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        remaining = max(0, self.total - self.processed)
+        if not self.rate:
+            return None
+        return datetime.timedelta(seconds=int(remaining / self.rate))
+
+    def __str__(self):
+        eta = self.eta if self.eta is not None else 'unknown'
+        return (f"{self.processed}/{self.total} entries, {self.failed} failed calls, "
+                f"{self.rate:.1f} entries/s, elapsed {datetime.timedelta(seconds=int(self.elapsed))}, ETA {eta}")
+
+
+def eligible_task_types(row, task_types, only_unprocessed=False):
+    """
+    Returns the requested task types that may be (re)run for an entry row:
+    the user must have the feature enabled, and mood/tags chosen by the user
+    (never assigned by the AI) are left untouched. With `only_unprocessed`,
+    parts already processed are skipped as well.
+    """
+    if only_unprocessed:
+        task_types = [task_type for task_type in task_types if not row[f'ai_{task_type}_processed']]
+    eligible = []
+    if 'quote' in task_types and row['user__profile__ai_enable_quotes']:
+        eligible.append('quote')
+    if 'mood' in task_types and row['user__profile__ai_enable_mood_detection'] \
+            and (row['ai_mood_task_id'] or not row['mood']):
+        eligible.append('mood')
+    if 'tags' in task_types and row['user__profile__ai_enable_tag_suggestion'] \
+            and (row['ai_tags_task_id'] or not row['ai_tags_processed']):
+        eligible.append('tags')
+    return eligible
+
+
+def _fetch_batch(queryset, after_pk, batch_size):
+    return list(queryset.filter(pk__gt=after_pk).order_by('pk').values(*_ROW_FIELDS)[:batch_size])
+
+
+def iter_batches(queryset, after_pk=0, batch_size=200):
+    """Yields lists of entry rows in primary-key order, one keyset-paginated query per batch."""
+    while True:
+        rows = _fetch_batch(queryset, after_pk, batch_size)
+        if not rows:
+            return
+        yield rows
+        after_pk = rows[-1]['pk']
+
+
+async def _analyze_entry(client, semaphore, row, task_types, available_tags):
+    """
+    Runs the eligible analyses of one entry concurrently. A part whose
+    provider call failed is left out of the result, so the entry keeps its
+    current value and stays eligible for the next run.
+    """
+    from .tasks import (
+        build_quote_prompt, parse_quote_response, build_mood_prompt, parse_mood_response,
+        build_tags_prompt, parse_tags_response, get_valid_moods,
+    )
+
+    async def run(task_type, prompt, cache_context=''):
+        task_name, max_tokens, temperature = TASK_PARAMS[task_type]
+        async with semaphore:
+            return await client.complete(
+                prompt, task_name, max_tokens=max_tokens, temperature=temperature, entry_id=row['pk'],
+                cache_content=row['content'], cache_context=cache_context, user_id=row['user_id'],
+            )
+
+    content = row['content']
+    calls = {}
+    if 'quote' in task_types:
+        calls['quote'] = run('quote', build_quote_prompt(content))
+    if 'mood' in task_types:
+        calls['mood'] = run('mood', build_mood_prompt(content), ",".join(get_valid_moods()))
+    if 'tags' in task_types and available_tags:
+        calls['tags'] = run('tags', build_tags_prompt(content, available_tags), ",".join(sorted(available_tags)))
+
+    responses = dict(zip(calls, await asyncio.gather(*calls.values())))
+    result = {'pk': row['pk'], 'failed': sum(1 for r in responses.values() if not r)}
+    # Like the Celery tasks, a response that could not be parsed records the default as a 'fallback'.
+    if responses.get('quote'):
+        quote = parse_quote_response(responses['quote'])
+        result['quote'] = quote or _("Could not generate a quote at this time.")
+        result['quote_status'] = 'success' if quote else 'fallback'
+    if responses.get('mood'):
+        mood = parse_mood_response(responses['mood'])
+        result['mood'] = mood or 'neutral'
+        result['mood_status'] = 'success' if mood else 'fallback'
+    if responses.get('tags'):
+        result['tags'] = parse_tags_response(responses['tags'], available_tags)
+    return result
+
+
+def _write_batch(results):
+    """Writes a batch of results with one bulk UPDATE per field set plus one tag replacement."""
+    from journal.models import JournalEntry, Tag
+    from .mood_rollups import refresh_entries
+    from .tasks import AI_MODEL_FOR_ALL_TASKS
+
+    now = timezone.now()
+    quote_entries = [
+        JournalEntry(pk=r['pk'], ai_quote=r['quote'], ai_quote_processed=True, ai_quote_status=r['quote_status'], ai_quote_completed_at=now)
+        for r in results if 'quote' in r
+    ]
+    mood_entries = [
+        JournalEntry(pk=r['pk'], mood=r['mood'], ai_mood_processed=True, ai_mood_status=r['mood_status'], ai_mood_completed_at=now)
+        for r in results if 'mood' in r
+    ]
+    tag_results = [r for r in results if 'tags' in r]
+    updated_ids = {r['pk'] for r in results if {'quote', 'mood', 'tags'} & r.keys()}
+
+    with transaction.atomic():
+        if quote_entries:
+            JournalEntry.objects.bulk_update(quote_entries, ['ai_quote', 'ai_quote_processed', 'ai_quote_status', 'ai_quote_completed_at'])
+        if mood_entries:
+            JournalEntry.objects.bulk_update(mood_entries, ['mood', 'ai_mood_processed', 'ai_mood_status', 'ai_mood_completed_at'])
+            refresh_entries([entry.pk for entry in mood_entries])
+        if tag_results:
+            Through = JournalEntry.tags.through
+            tag_ids = dict(Tag.objects.filter(
+                name__in={name for r in tag_results for name in r['tags']}
+            ).values_list('name', 'id'))
+            general_tag, _created = Tag.objects.get_or_create(name__iexact='General', defaults={'name': 'General', 'emoji': '🗒️'})
+            entry_ids = [r['pk'] for r in tag_results]
+            Through.objects.filter(journalentry_id__in=entry_ids).delete()
+            Through.objects.bulk_create([
+                Through(journalentry_id=r['pk'], tag_id=tag_id)
+                for r in tag_results
+                for tag_id in ([tag_ids[name] for name in r['tags'] if name in tag_ids] or [general_tag.id])
+            ])
+            # Entries none of whose suggested tags exist got the 'General' fallback.
+            fallback_ids = {r['pk'] for r in tag_results if not any(name in tag_ids for name in r['tags'])}
+            JournalEntry.objects.filter(pk__in=set(entry_ids) - fallback_ids).update(
+                ai_tags_processed=True, ai_tags_status='success', ai_tags_completed_at=now,
+            )
+            if fallback_ids:
+                JournalEntry.objects.filter(pk__in=fallback_ids).update(
+                    ai_tags_processed=True, ai_tags_status='fallback', ai_tags_completed_at=now,
+                )
+        if updated_ids:
+            JournalEntry.objects.filter(pk__in=updated_ids).update(ai_model=AI_MODEL_FOR_ALL_TASKS)
+
+
+async def _reprocess(queryset, task_types, concurrency, batch_size, after_pk, progress_callback, only_unprocessed):
+    from journal.models import Tag
+
+    total = await sync_to_async(queryset.filter(pk__gt=after_pk).count)()
+    available_tags = await sync_to_async(lambda: list(Tag.objects.values_list('name', flat=True)))()
+    progress = BulkProgress(total)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with AsyncOpenRouterClient(max_connections=concurrency) as client:
+        while True:
+            rows = await sync_to_async(_fetch_batch)(queryset, after_pk, batch_size)
+            if not rows:
+                break
+            results = await asyncio.gather(*[
+                _analyze_entry(client, semaphore, row, eligible_task_types(row, task_types, only_unprocessed), available_tags)
+                for row in rows
+            ])
+            await sync_to_async(_write_batch)(results)
+
+            after_pk = rows[-1]['pk']
+            progress.processed += len(rows)
+            progress.failed += sum(r['failed'] for r in results)
+            progress.last_pk = after_pk
+            logger.info(f"Bulk AI reprocessing: {progress}")
+            if progress_callback:
+                await sync_to_async(progress_callback)(progress)
+    return progress
+
+
+def reprocess_entries(queryset, task_types=('mood', 'tags'), concurrency=16, batch_size=200, after_pk=0,
+                      progress_callback=None, only_unprocessed=False):
+    """
+    Re-runs the given AI analyses for every entry in `queryset` with primary
+    key greater than `after_pk`; with `only_unprocessed`, only the parts not
+    processed yet. `progress_callback(progress)` is called after each batch
+    is written, e.g. to report progress or store a checkpoint.
+    Returns the final BulkProgress.
+    """
+    unknown = set(task_types) - set(BULK_TASK_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown AI task types: {', '.join(sorted(unknown))}")
+    return asyncio.run(_reprocess(
+        queryset, tuple(task_types), concurrency, batch_size, after_pk, progress_callback, only_unprocessed,
+    ))
+
+
+def _entry_signatures(row, task_types, combined):
+    """Celery signatures re-running the given analyses of one entry."""
+    from .tasks import (
+        analyze_entry_task, generate_quote_for_entry_task, detect_mood_for_entry_task, suggest_tags_for_entry_task,
+    )
+    if combined:
+        return [analyze_entry_task.si(
+            row['pk'], include_quote='quote' in task_types, include_mood='mood' in task_types,
+            include_tags='tags' in task_types,
+        )]
+    task_by_type = {
+        'quote': generate_quote_for_entry_task,
+        'mood': detect_mood_for_entry_task,
+        'tags': suggest_tags_for_entry_task,
+    }
+    return [task_by_type[task_type].si(row['pk']) for task_type in task_types]
+
+
+def dispatch_celery_batches(queryset, task_types=('mood', 'tags'), batch_size=200, max_in_flight=4, after_pk=0,
+                            combined=None, group_timeout=None, progress_callback=None, only_unprocessed=False):
+    """
+    Re-runs the given AI analyses through the regular entry tasks, one Celery
+    group per keyset batch. At most `max_in_flight` groups are outstanding;
+    the oldest is awaited before the next is sent, so `progress.last_pk`
+    only advances past entries whose tasks have all finished.
+
+    `combined` defaults to settings.AI_COMBINED_ENTRY_ANALYSIS. With
+    `only_unprocessed`, only the parts not processed yet are re-run.
+    Returns the final BulkProgress.
+    """
+    from collections import deque
+    from celery import group
+    from django.conf import settings
+    from LifeLedger.celery import BATCH_QUEUE, queue_options
+
+    if combined is None:
+        combined = getattr(settings, 'AI_COMBINED_ENTRY_ANALYSIS', False)
+    progress = BulkProgress(queryset.filter(pk__gt=after_pk).count())
+    pending = deque()
+
+    def wait_for_oldest():
+        last_pk, size, group_result = pending.popleft()
+        if group_result is not None:
+            group_result.join(timeout=group_timeout, propagate=False)
+            progress.failed += sum(1 for result in group_result.results if result.failed())
+        progress.processed += size
+        progress.last_pk = last_pk
+        logger.info(f"Bulk AI reprocessing (celery): {progress}")
+        if progress_callback:
+            progress_callback(progress)
+
+    for rows in iter_batches(queryset, after_pk, batch_size):
+        signatures = []
+        for row in rows:
+            eligible = eligible_task_types(row, task_types, only_unprocessed)
+            if eligible:
+                signatures.extend(_entry_signatures(row, eligible, combined))
+        if len(pending) >= max_in_flight:
+            wait_for_oldest()
+        # The entry tasks normally run on the interactive queue; reprocessing must not compete with users there.
+        # They also normally store no result, but the group is joined on theirs.
+        group_result = (group(signatures).apply_async(ignore_result=False, **queue_options(BATCH_QUEUE))
+                        if signatures else None)
+        pending.append((rows[-1]['pk'], len(rows), group_result))
+    while pending:
+        wait_for_oldest()
+    return progress
+
+
+def estimate_reprocessing(queryset, task_types=('mood', 'tags'), combined=False, after_pk=0, batch_size=500,
+                          only_unprocessed=False):
+    """
+    Estimates the provider requests, tokens and wall time that reprocessing
+    `queryset` would take, without calling the provider. Wall time is bounded
+    by the configured requests-per-second and tokens-per-minute limits.
+    """
+    from journal.models import Tag
+    from .rate_limit import estimate_tokens, get_limits
+    from .tasks import (
+        AI_MODEL_FOR_ALL_TASKS, build_quote_prompt, build_mood_prompt, build_tags_prompt,
+        build_combined_analysis_prompt,
+    )
+
+    available_tags = list(Tag.objects.values_list('name', flat=True))
+    prompt_builders = {
+        'quote': build_quote_prompt,
+        'mood': build_mood_prompt,
+        'tags': lambda content: build_tags_prompt(content, available_tags),
+    }
+    estimate = {'entries': 0, 'requests': 0, 'tokens': 0}
+    for rows in iter_batches(queryset, after_pk, batch_size):
+        for row in rows:
+            estimate['entries'] += 1
+            eligible = eligible_task_types(row, task_types, only_unprocessed)
+            if not eligible:
+                continue
+            if combined:
+                prompt = build_combined_analysis_prompt(
+                    row['content'], include_quote='quote' in eligible, include_mood='mood' in eligible,
+                    available_tags=available_tags if 'tags' in eligible else None,
+                )
+                estimate['requests'] += 1
+                estimate['tokens'] += estimate_tokens(prompt, COMBINED_TASK_PARAMS[1])
+                continue
+            for task_type in eligible:
+                estimate['requests'] += 1
+                estimate['tokens'] += estimate_tokens(prompt_builders[task_type](row['content']), TASK_PARAMS[task_type][1])
+
+    limits = get_limits(AI_MODEL_FOR_ALL_TASKS)
+    seconds = 0.0
+    if limits.get('requests_per_second'):
+        seconds = max(seconds, estimate['requests'] / limits['requests_per_second'])
+    if limits.get('tokens_per_minute'):
+        seconds = max(seconds, estimate['tokens'] * 60.0 / limits['tokens_per_minute'])
+    estimate['wall_time'] = datetime.timedelta(seconds=int(seconds))
+    return estimate
@@ -0,0 +1,113 @@
+# ai_services/chart_cache.py
+
+"""
+Cached data of the dashboard mood charts.
+
+Chart JSON is cached per user and request (chart, period and options) under
+the user's "chart version", which is reset to the current time whenever the
+user's daily mood rollups are refreshed, i.e. whenever an entry's mood or
+date may have changed (see mood_rollups.py). A new version makes the old
+charts unreachable without explicit deletes. The version also provides the
+charts' validators: the ETag is derived from it, and Last-Modified is the
+later of the version's time and the start of today (local time), when the
+periods move. Callers read the version once per request and pass it to the
+validators and to get_or_build_chart.
+
+The version is kept in the shared AI Redis (AI_REDIS_URL), where the web
+processes see the bumps made by the Celery workers. Without Redis, charts
+are built on every request and served without validators.
+"""
+import datetime
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .redis_client import get_redis
+from .response_cache import RESPONSE_CACHE_ALIAS
+
+logger = logging.getLogger(__name__)
+
+CHART_VERSION_KEY = 'ai_chart_version:{user_id}'
+
+
+def _cache():
+    return caches[RESPONSE_CACHE_ALIAS]
+
+
+def _version_ttl():
+    # A version that expired is reinitialised from the clock, which only invalidates the user's charts.
+    return getattr(settings, 'AI_CHART_CACHE_TTL', 60 * 60 * 24)
+
+
+def get_chart_version(user_id):
+    """
+    Returns the user's current chart version, in nanoseconds since the epoch,
+    or None if Redis is unavailable. A missing version (first use or expiry)
+    is initialised from the clock, so it can never match a version that
+    charts were stored under.
+    """
+    key = CHART_VERSION_KEY.format(user_id=user_id)
+    try:
+        client = get_redis()
+        client.set(key, time.time_ns(), nx=True, ex=_version_ttl())
+        version = client.get(key)
+    except Exception as e:
+        logger.warning(f"Could not read chart version for user ID {user_id}: {e}")
+        return None
+    return int(version) if version is not None else None
+
+
+def bump_chart_version(user_id):
+    """Invalidates every cached chart of the user."""
+    try:
+        get_redis().set(CHART_VERSION_KEY.format(user_id=user_id), time.time_ns(), ex=_version_ttl())
+    except Exception as e:
+        logger.warning(f"Could not bump chart version for user ID {user_id}: {e}")
+
+
+def _chart_digest(chart, user_id, params, version):
+    # The periods end today (a local calendar day), so a chart is only valid on the day it was built.
+    relevant = {'chart': chart, 'user': user_id, 'params': params, 'day': timezone.localdate().isoformat(), 'version': version}
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def chart_etag(chart, user_id, params, version):
+    """The ETag of a chart request, or None (no conditional handling) if the version is unavailable."""
+    return None if version is None else _chart_digest(chart, user_id, params, version)[:32]
+
+
+def chart_last_modified(version):
+    if version is None:
+        return None
+    changed = datetime.datetime.fromtimestamp(version / 1e9, tz=datetime.timezone.utc)
+    today = timezone.make_aware(datetime.datetime.combine(timezone.localdate(), datetime.time.min))
+    return max(changed, today)
+
+
+def get_or_build_chart(chart, user_id, params, version, build):
+    """
+    Returns the cached chart data of the request under `version` (see
+    get_chart_version), calling `build()` and caching its result on a miss.
+    """
+    if version is None:
+        return build()
+    key = f"ai_chart:v1:{_chart_digest(chart, user_id, params, version)}"
+    cache = _cache()
+    try:
+        data = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Chart cache read failed: {e}")
+        data = None
+    if data is not None:
+        return data
+    data = build()
+    try:
+        cache.set(key, data, timeout=getattr(settings, 'AI_CHART_CACHE_TTL', 60 * 60 * 24))
+    except Exception as e:
+        logger.warning(f"Chart cache write failed: {e}")
+    return data
@@ -0,0 +1,246 @@
+# ai_services/circuit_breaker.py
+
+"""
+Shared circuit breaker around the AI provider.
+
+State lives in Redis so every worker sees the same breaker:
+
+* closed    - calls flow; outcomes are recorded in a sliding window. The
+              breaker opens when the window's error rate or latency percentile
+              crosses its threshold.
+* open      - calls are refused immediately so tasks use their local fallbacks
+              instead of waiting on a degraded provider.
+* half_open - after the cooldown a few probe calls are let through; a success
+              closes the breaker, a failure opens it again. Only the probes'
+              outcomes count: each probe is tagged with an ID, and late
+              results of calls let through while the breaker was closed are
+              ignored. A probe that ends without an outcome (e.g. it got no
+              rate limit capacity) is released, so another can take its place
+              at once.
+
+Every transition is counted in ai_services.metrics.
+"""
+import logging
+import time
+import uuid
+
+from django.conf import settings
+
+from .metrics import incr_counter
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_BREAKER = 'openrouter'
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+# KEYS: state hash, probe set. ARGV: now_ms, cooldown_ms, max_probes, probe_id
+# Returns {allowed, previous_state, new_state, is_probe}
+_ALLOW_LUA = """
+local now = tonumber(ARGV[1])
+local cooldown = tonumber(ARGV[2])
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+if state == 'closed' then
+    return {1, state, state, 0}
+end
+local function start_probe()
+    redis.call('SADD', KEYS[2], ARGV[4])
+    redis.call('PEXPIRE', KEYS[2], cooldown * 2 + 1000)
+end
+local changed_at = tonumber(redis.call('HGET', KEYS[1], 'changed_at') or '0')
+if state == 'open' then
+    if now - changed_at < cooldown then
+        return {0, state, state, 0}
+    end
+    redis.call('HSET', KEYS[1], 'state', 'half_open', 'changed_at', now, 'probes', 1)
+    redis.call('DEL', KEYS[2])
+    start_probe()
+    return {1, 'open', 'half_open', 1}
+end
+-- half_open: allow a limited number of probes; re-arm them if the probes
+-- never reported back (e.g. the worker died) within another cooldown.
+if now - changed_at >= cooldown then
+    redis.call('HSET', KEYS[1], 'changed_at', now, 'probes', 1)
+    redis.call('DEL', KEYS[2])
+    start_probe()
+    return {1, state, state, 1}
+end
+local probes = tonumber(redis.call('HGET', KEYS[1], 'probes') or '0')
+if probes < tonumber(ARGV[3]) then
+    redis.call('HINCRBY', KEYS[1], 'probes', 1)
+    start_probe()
+    return {1, state, state, 1}
+end
+return {0, state, state, 0}
+"""
+
+# Gives back a probe that ended without an outcome.
+# KEYS: state hash, probe set. ARGV: probe_id
+_RELEASE_PROBE_LUA = """
+if redis.call('SREM', KEYS[2], ARGV[1]) == 1 then
+    local probes = tonumber(redis.call('HGET', KEYS[1], 'probes') or '0')
+    redis.call('HSET', KEYS[1], 'probes', math.max(0, probes - 1))
+    return 1
+end
+return 0
+"""
+
+# KEYS: state hash, outcome window list, probe set.
+# ARGV: now_ms, ok (1/0), latency_ms, window_size, min_calls,
+#       error_rate_threshold, latency_threshold_ms, latency_percentile, probe_id ('' if none)
+# Returns {previous_state, new_state}
+_RECORD_LUA = """
+local now = tonumber(ARGV[1])
+local ok = tonumber(ARGV[2])
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+
+if state == 'half_open' then
+    if ARGV[9] == '' or redis.call('SISMEMBER', KEYS[3], ARGV[9]) == 0 then
+        -- Not a current probe: a late result of a call started earlier.
+        return {state, state}
+    end
+    redis.call('DEL', KEYS[2], KEYS[3])
+    if ok == 1 then
+        redis.call('HSET', KEYS[1], 'state', 'closed', 'changed_at', now, 'probes', 0)
+        return {state, 'closed'}
+    end
+    redis.call('HSET', KEYS[1], 'state', 'open', 'changed_at', now, 'probes', 0)
+    return {state, 'open'}
+end
+if state == 'open' then
+    -- Late result of a call that started before the breaker opened.
+    return {state, state}
+end
+
+redis.call('LPUSH', KEYS[2], ARGV[2] .. ':' .. ARGV[3])
+redis.call('LTRIM', KEYS[2], 0, tonumber(ARGV[4]) - 1)
+redis.call('PEXPIRE', KEYS[2], 3600000)
+
+local outcomes = redis.call('LRANGE', KEYS[2], 0, -1)
+local total = #outcomes
+if total < tonumber(ARGV[5]) then
+    return {state, state}
+end
+
+local errors = 0
+local latencies = {}
+for i, outcome in ipairs(outcomes) do
+    local sep = string.find(outcome, ':')
+    if string.sub(outcome, 1, sep - 1) == '0' then
+        errors = errors + 1
+    end
+    latencies[i] = tonumber(string.sub(outcome, sep + 1))
+end
+table.sort(latencies)
+local rank = math.max(1, math.ceil(tonumber(ARGV[8]) * total))
+local latency_pct = latencies[rank]
+
+if errors / total >= tonumber(ARGV[6]) or latency_pct > tonumber(ARGV[7]) then
+    redis.call('DEL', KEYS[2])
+    redis.call('HSET', KEYS[1], 'state', 'open', 'changed_at', now, 'probes', 0)
+    return {state, 'open'}
+end
+return {state, state}
+"""
+
+
+def _setting(name, default):
+    return getattr(settings, f'AI_CIRCUIT_BREAKER_{name}', default)
+
+
+def _keys(name):
+    return [f"ai_cb:{name}:state", f"ai_cb:{name}:window", f"ai_cb:{name}:probes"]
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _record_transition(name, previous_state, new_state, reason=''):
+    if previous_state == new_state:
+        return
+    incr_counter(f'circuit_breaker.{new_state}')
+    log = logger.warning if new_state == OPEN else logger.info
+    log(f"Circuit breaker '{name}' transitioned {previous_state} -> {new_state}{reason}.")
+
+
+def allow_request(name=PROVIDER_BREAKER):
+    """
+    Returns a false value if no call may be made now, otherwise the call's
+    permit: True, or the probe ID while the breaker is half-open. Pass it to
+    record_result() and, once the call is over, to release_probe(). Fails
+    open (returns True) when the breaker is disabled or Redis is unreachable.
+    """
+    if not _setting('ENABLED', True):
+        return True
+    probe_id = uuid.uuid4().hex
+    try:
+        allowed, previous_state, new_state, is_probe = get_redis().eval(
+            _ALLOW_LUA, 2, *_keys(name)[::2],
+            int(time.time() * 1000),
+            int(_setting('COOLDOWN', 30) * 1000),
+            _setting('HALF_OPEN_PROBES', 1),
+            probe_id,
+        )
+    except Exception as e:
+        logger.warning(f"Circuit breaker '{name}' unavailable, allowing request: {e}")
+        return True
+    _record_transition(name, _decode(previous_state), _decode(new_state), ' after cooldown')
+    if not allowed:
+        incr_counter('circuit_breaker.short_circuited')
+        return False
+    return probe_id if is_probe else True
+
+
+def _probe_id(permit):
+    return permit if isinstance(permit, str) else ''
+
+
+def record_result(success, latency_seconds, name=PROVIDER_BREAKER, permit=True):
+    """
+    Records the outcome of a call that allow_request() let through with
+    `permit`. While half-open only the probes' outcomes count.
+    """
+    if not _setting('ENABLED', True):
+        return
+    latency_ms = int(latency_seconds * 1000)
+    try:
+        previous_state, new_state = get_redis().eval(
+            _RECORD_LUA, 3, *_keys(name),
+            int(time.time() * 1000),
+            1 if success else 0,
+            latency_ms,
+            _setting('WINDOW_SIZE', 50),
+            _setting('MIN_CALLS', 10),
+            _setting('ERROR_RATE', 0.5),
+            int(_setting('LATENCY_THRESHOLD', 20) * 1000),
+            _setting('LATENCY_PERCENTILE', 0.95),
+            _probe_id(permit),
+        )
+    except Exception as e:
+        logger.warning(f"Circuit breaker '{name}' could not record a result: {e}")
+        return
+    _record_transition(name, _decode(previous_state), _decode(new_state))
+
+
+def release_probe(permit, name=PROVIDER_BREAKER):
+    """
+    Gives back a half-open probe that ended without recording an outcome, so
+    another call can probe at once instead of after another cooldown. Safe to
+    call for any permit and after record_result().
+    """
+    if not _probe_id(permit) or not _setting('ENABLED', True):
+        return
+    try:
+        get_redis().eval(_RELEASE_PROBE_LUA, 2, *_keys(name)[::2], permit)
+    except Exception as e:
+        logger.warning(f"Circuit breaker '{name}' could not release probe {permit}: {e}")
+
+
+def get_state(name=PROVIDER_BREAKER):
+    """Returns the breaker's current state name, or 'unknown' if Redis is unreachable."""
+    try:
+        return _decode(get_redis().hget(_keys(name)[0], 'state')) or CLOSED
+    except Exception:
+        return 'unknown'
@@ -0,0 +1,86 @@
+# ai_services/http_client.py
+
+"""
+Process-wide HTTP client used for all calls to the AI provider.
+
+A single `requests.Session` is kept per worker process so that TCP/TLS
+connections to OpenRouter are pooled and reused (keep-alive) instead of being
+re-established for every quote, mood and tag request.
+"""
+import os
+import threading
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# `threading` is replaced by gevent's cooperative primitives when the gevent
+# worker pool monkey-patches the process (see LifeLedger/celery.py), so this
+# lock and the urllib3 connection pool queues are greenlet-safe as well.
+_session_lock = threading.Lock()
+_session = None
+_session_pid = None
+
+
+def get_request_timeout():
+    """
+    Returns the (connect, read) timeout tuple used for provider requests.
+    """
+    return (
+        getattr(settings, 'AI_HTTP_CONNECT_TIMEOUT', 5.0),
+        getattr(settings, 'AI_HTTP_READ_TIMEOUT', 60.0),
+    )
+
+
+def _build_session():
+    """
+    Creates a new session with a connection pool sized from settings.
+    Retries are left to the Celery tasks, so the adapter itself never retries.
+    """
+    pool_size = getattr(settings, 'AI_HTTP_POOL_SIZE', 10)
+    adapter = HTTPAdapter(
+        pool_connections=getattr(settings, 'AI_HTTP_POOL_CONNECTIONS', 2),
+        pool_maxsize=pool_size,
+        pool_block=getattr(settings, 'AI_HTTP_POOL_BLOCK', False),
+        max_retries=0,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    logger.info(f"Created pooled AI HTTP session (pid {os.getpid()}, pool size {pool_size}).")
+    return session
+
+
+def get_http_session():
+    """
+    Returns the session for the current process, creating it on first use.
+
+    The owning PID is tracked so that a session inherited through fork (the
+    prefork pool forks after the parent may already have made requests) is
+    never shared with the parent; each child builds its own pool.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            _session = _build_session()
+            _session_pid = pid
+    return _session
+
+
+def close_http_session():
+    """
+    Closes the current process's session and its pooled connections.
+    """
+    global _session, _session_pid
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _session_pid = None
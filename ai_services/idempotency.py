@@ -0,0 +1,152 @@
+# ai_services/idempotency.py
+
+"""
+Deduplication of in-flight per-entry AI tasks.
+
+When a task is queued (on commit of the dispatching transaction) it claims a
+Redis key made of the entry, the task and the hash of the entry's content. A second dispatch for the same content while
+the first task is queued or running gets the existing task ID back instead of
+queueing a duplicate. A dispatch for changed content claims a different key;
+the older task is superseded, as tasks only write while the entry's
+`content_hash` still matches the content they analysed (see
+`update_if_current`).
+"""
+import logging
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+CLAIM_KEY = "ai_task:{entry_id}:{task_name}:{content_hash}"
+# Entry fields in which callers record the ID dispatch_entry_task returns.
+ENTRY_TASK_ID_FIELDS = ('ai_quote_task_id', 'ai_mood_task_id', 'ai_tags_task_id')
+
+# Deletes the claim only if it still belongs to the finishing task.
+# KEYS: claim key. ARGV: task_id
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _enabled():
+    return getattr(settings, 'AI_TASK_DEDUP_ENABLED', True)
+
+
+def _claim_key(entry_id, task_name, content_hash):
+    return CLAIM_KEY.format(entry_id=entry_id, task_name=task_name, content_hash=content_hash)
+
+
+def claim_entry_task(entry_id, task_name, content_hash, task_id):
+    """
+    Claims (entry, task, content) for `task_id`. Returns the ID of the task
+    already holding the claim, or None if `task_id` now holds it (also when
+    deduplication is disabled or Redis is unreachable, failing open).
+    """
+    if not _enabled():
+        return None
+    key = _claim_key(entry_id, task_name, content_hash)
+    try:
+        client = get_redis()
+        if client.set(key, task_id, nx=True, ex=getattr(settings, 'AI_TASK_CLAIM_TTL', 900)):
+            return None
+        existing = client.get(key)
+    except Exception as e:
+        logger.warning(f"AI task deduplication unavailable, dispatching without it: {e}")
+        return None
+    # The claim may have been released between the two calls.
+    return existing.decode('utf-8') if existing else None
+
+
+def release_entry_task(entry_id, task_name, content_hash, task_id):
+    """Releases the claim of a finished task; claims of retried tasks are kept."""
+    if not _enabled() or not content_hash:
+        return
+    try:
+        get_redis().eval(_RELEASE_LUA, 1, _claim_key(entry_id, task_name, content_hash), task_id)
+    except Exception as e:
+        # The claim expires on its own; only log.
+        logger.warning(f"Could not release AI task claim of {task_id}: {e}")
+
+
+def in_flight_entry_task(entry_id, task_name, content_hash):
+    """Returns the ID of the task holding the claim of (entry, task, content), or None."""
+    if not _enabled():
+        return None
+    try:
+        existing = get_redis().get(_claim_key(entry_id, task_name, content_hash))
+    except Exception as e:
+        logger.warning(f"AI task deduplication unavailable, dispatching without it: {e}")
+        return None
+    return existing.decode('utf-8') if existing else None
+
+
+def _replace_recorded_task_id(entry_id, task_id, new_task_id):
+    """Points the entry's task ID fields that hold `task_id` at `new_task_id`."""
+    from journal.models import JournalEntry
+    for field in ENTRY_TASK_ID_FIELDS:
+        JournalEntry.objects.filter(pk=entry_id, **{field: task_id}).update(**{field: new_task_id})
+
+
+def dispatch_entry_task(task, entry, **kwargs):
+    """
+    Queues `task` for `entry` once the current transaction commits, unless an
+    identical task (same entry and content) is already in flight. Returns the
+    ID of the queued or the in-flight task.
+
+    The claim is only taken on commit, so a rolled-back dispatch leaves none
+    behind. A dispatch that loses the claim to a concurrent one is dropped,
+    and the entry's task ID fields that recorded it are pointed at the task
+    holding the claim.
+    """
+    from journal.models import compute_content_hash
+    content_hash = compute_content_hash(entry.content)
+    existing_id = in_flight_entry_task(entry.id, task.name, content_hash)
+    if existing_id:
+        logger.info(f"{task.name} for entry {entry.id} is already in flight as {existing_id}; not queueing a duplicate.")
+        return existing_id
+    task_id = str(uuid.uuid4())
+
+    # Queued after commit so that the worker reads the content (and hash) this task was dispatched for.
+    def enqueue():
+        existing_id = claim_entry_task(entry.id, task.name, content_hash, task_id)
+        if existing_id:
+            logger.info(f"{task.name} for entry {entry.id} was queued meanwhile as {existing_id}; dropping {task_id}.")
+            _replace_recorded_task_id(entry.id, task_id, existing_id)
+            return
+        task.apply_async(args=[entry.id], kwargs={**kwargs, 'content_hash': content_hash}, task_id=task_id)
+
+    transaction.on_commit(enqueue)
+    return task_id
+
+
+def is_current(entry, content_hash):
+    """True if the task for `content_hash` has not been superseded by a content change."""
+    return not content_hash or entry.content_hash == content_hash
+
+
+def update_if_current(journal_entry_id, content_hash, **updates):
+    """
+    Writes a task's results in one conditional UPDATE, which matches no row if
+    the entry's content changed since the task was dispatched. Returns whether
+    the results were written. Without a `content_hash` (bulk reprocessing) the
+    write is unconditional.
+    """
+    from journal.models import JournalEntry
+    entries = JournalEntry.objects.filter(pk=journal_entry_id)
+    if content_hash:
+        entries = entries.filter(content_hash=content_hash)
+    if entries.update(**updates):
+        if 'mood' in updates:
+            # The UPDATE sends no post_save signal, so refresh the mood rollup here.
+            from .mood_rollups import refresh_entries
+            refresh_entries([journal_entry_id])
+        return True
+    logger.info(f"Discarding superseded AI results for entry {journal_entry_id}: its content changed.")
+    return False
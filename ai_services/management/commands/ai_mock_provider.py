@@ -0,0 +1,61 @@
+# ai_services/management/commands/ai_mock_provider.py
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_services.mock_provider import LATENCY_DISTRIBUTIONS, MockProviderConfig, MockProviderServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a local mock of the OpenRouter chat-completions API for offline load testing. "
+        "Point the app at it with OPENROUTER_API_BASE_URL (any non-empty OPENROUTER_API_KEY works)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8090)
+        parser.add_argument('--latency', type=float, default=0.2,
+                            help="Typical response latency in seconds (mean, or median for lognormal). Default: 0.2.")
+        parser.add_argument('--latency-distribution', choices=LATENCY_DISTRIBUTIONS, default='fixed')
+        parser.add_argument('--latency-sigma', type=float, default=0.5,
+                            help="Spread of the lognormal distribution; larger values give longer tails.")
+        parser.add_argument('--rate-429', type=float, default=0.0, help="Fraction of requests answered with HTTP 429.")
+        parser.add_argument('--rate-500', type=float, default=0.0, help="Fraction of requests answered with HTTP 500.")
+        parser.add_argument('--rate-timeout', type=float, default=0.0,
+                            help="Fraction of requests that hang for --timeout-seconds and then drop the connection.")
+        parser.add_argument('--timeout-seconds', type=float, default=120.0)
+        parser.add_argument('--rate-malformed', type=float, default=0.0,
+                            help="Fraction of requests answered with a truncated JSON body.")
+        parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds sent with HTTP 429.")
+        parser.add_argument('--seed', type=int, help="Random seed, for reproducible injection sequences.")
+
+    def handle(self, *args, **options):
+        rates = [options['rate_429'], options['rate_500'], options['rate_timeout'], options['rate_malformed']]
+        if any(rate < 0 for rate in rates) or sum(rates) > 1:
+            raise CommandError("Injection rates must be non-negative and sum to at most 1.")
+
+        config = MockProviderConfig(
+            latency=options['latency'],
+            latency_distribution=options['latency_distribution'],
+            latency_sigma=options['latency_sigma'],
+            rate_429=options['rate_429'],
+            rate_500=options['rate_500'],
+            rate_timeout=options['rate_timeout'],
+            timeout_seconds=options['timeout_seconds'],
+            rate_malformed=options['rate_malformed'],
+            retry_after=options['retry_after'],
+            seed=options['seed'],
+        )
+        server = MockProviderServer((options['host'], options['port']), config)
+        self.stdout.write(self.style.SUCCESS(f"Mock AI provider listening on {server.base_url}"))
+        self.stdout.write(f"Set OPENROUTER_API_BASE_URL={server.base_url} for the web app and Celery workers. "
+                          f"Press Ctrl+C to stop.")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(json.dumps(server.summary(), indent=2))
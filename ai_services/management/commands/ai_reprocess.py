@@ -0,0 +1,172 @@
+# ai_services/management/commands/ai_reprocess.py
+
+import json
+import os
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+
+from journal.models import JournalEntry
+from ai_services.bulk import (
+    BULK_TASK_TYPES, dispatch_celery_batches, estimate_reprocessing, reprocess_entries,
+)
+
+DEFAULT_CHECKPOINT_FILE = 'ai_reprocess.checkpoint.json'
+
+# Options that select the entries; a checkpoint is only resumed with the same selection.
+SELECTION_OPTIONS = ('tasks', 'user', 'since', 'until', 'only_unprocessed', 'model', 'outdated_model')
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-runs AI enrichment (quote, mood, tags) for existing journal entries in bulk, "
+        "checkpointing progress so an interrupted run can be resumed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tasks', default='mood,tags',
+            help=f"Comma-separated AI analyses to run. Choices: {', '.join(BULK_TASK_TYPES)}. Default: mood,tags.",
+        )
+        # Entry selection
+        parser.add_argument('--user', help="Only entries of this username.")
+        parser.add_argument('--since', help="Only entries created on or after this date (YYYY-MM-DD).")
+        parser.add_argument('--until', help="Only entries created on or before this date (YYYY-MM-DD).")
+        parser.add_argument('--only-unprocessed', action='store_true',
+                            help="Only the requested analyses an entry is still missing.")
+        parser.add_argument('--model', help="Only entries last processed by this AI model.")
+        parser.add_argument('--outdated-model', action='store_true',
+                            help="Only entries last processed by a model other than the current one.")
+        # Execution
+        parser.add_argument('--dispatch', choices=('celery', 'async'), default='celery',
+                            help="'celery' sends chunked groups of the regular entry tasks to the workers; "
+                                 "'async' runs the requests from this process. Default: celery.")
+        parser.add_argument('--batch-size', type=int, default=200, help="Entries fetched (and grouped) per batch.")
+        parser.add_argument('--max-in-flight', type=int, default=4,
+                            help="Celery dispatch: maximum outstanding groups.")
+        parser.add_argument('--concurrency', type=int, default=16,
+                            help="Async dispatch: maximum provider requests in flight.")
+        # Checkpointing
+        parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_FILE,
+                            help=f"Checkpoint file path. Default: {DEFAULT_CHECKPOINT_FILE}.")
+        parser.add_argument('--resume', action='store_true', help="Continue after the entry recorded in the checkpoint.")
+        # Estimation
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only estimate requests, tokens and wall time; nothing is sent or written.")
+        parser.add_argument('--price-per-1k-tokens', type=float,
+                            help="Dry run: also estimate the cost at this price per 1000 tokens.")
+
+    def handle(self, *args, **options):
+        task_types = [t.strip() for t in options['tasks'].split(',') if t.strip()]
+        unknown = set(task_types) - set(BULK_TASK_TYPES)
+        if not task_types or unknown:
+            raise CommandError(f"Invalid --tasks value. Choose from: {', '.join(BULK_TASK_TYPES)}.")
+        for option in ('batch_size', 'max_in_flight', 'concurrency'):
+            if options[option] < 1:
+                raise CommandError(f"--{option.replace('_', '-')} must be positive.")
+
+        queryset = self.build_queryset(task_types, options)
+        after_pk = self.load_checkpoint(options) if options['resume'] else 0
+
+        if options['dry_run']:
+            self.report_estimate(queryset, task_types, after_pk, options)
+            return
+
+        def save_progress(progress):
+            self.save_checkpoint(options, progress.last_pk)
+            self.stdout.write(str(progress))
+
+        if options['dispatch'] == 'async':
+            progress = reprocess_entries(
+                queryset, task_types=task_types, concurrency=options['concurrency'],
+                batch_size=options['batch_size'], after_pk=after_pk, progress_callback=save_progress,
+                only_unprocessed=options['only_unprocessed'],
+            )
+        else:
+            progress = dispatch_celery_batches(
+                queryset, task_types=task_types, batch_size=options['batch_size'],
+                max_in_flight=options['max_in_flight'], after_pk=after_pk, progress_callback=save_progress,
+                only_unprocessed=options['only_unprocessed'],
+            )
+
+        if os.path.exists(options['checkpoint']):
+            os.remove(options['checkpoint'])
+        self.stdout.write(self.style.SUCCESS(f"Done: {progress}"))
+
+    def build_queryset(self, task_types, options):
+        from ai_services.tasks import AI_MODEL_FOR_ALL_TASKS
+
+        queryset = JournalEntry.objects.all()
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist.")
+            queryset = queryset.filter(user=user)
+        if options['since']:
+            queryset = queryset.filter(created_at__gte=self.parse_date(options['since']))
+        if options['until']:
+            queryset = queryset.filter(created_at__lt=self.parse_date(options['until']) + timedelta(days=1))
+        if options['only_unprocessed']:
+            missing = Q()
+            for task_type in task_types:
+                missing |= Q(**{f'ai_{task_type}_processed': False})
+            queryset = queryset.filter(missing)
+        if options['model']:
+            queryset = queryset.filter(ai_model=options['model'])
+        if options['outdated_model']:
+            queryset = queryset.exclude(ai_model=AI_MODEL_FOR_ALL_TASKS)
+        return queryset
+
+    def parse_date(self, value):
+        try:
+            day = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Invalid date '{value}'. Use YYYY-MM-DD.")
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    def selection(self, options):
+        return {name: options[name] for name in SELECTION_OPTIONS}
+
+    def load_checkpoint(self, options):
+        try:
+            with open(options['checkpoint']) as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            raise CommandError(f"No checkpoint found at {options['checkpoint']}.")
+        except ValueError as e:
+            raise CommandError(f"Unreadable checkpoint {options['checkpoint']}: {e}")
+        if checkpoint.get('selection') != self.selection(options):
+            raise CommandError(
+                f"Checkpoint {options['checkpoint']} was written for a different selection: {checkpoint.get('selection')}."
+            )
+        self.stdout.write(f"Resuming after entry ID {checkpoint['last_pk']}.")
+        return checkpoint['last_pk']
+
+    def save_checkpoint(self, options, last_pk):
+        # Write to a temporary file first so a crash never leaves a truncated checkpoint.
+        tmp_path = f"{options['checkpoint']}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'last_pk': last_pk,
+                'selection': self.selection(options),
+                'updated_at': timezone.now().isoformat(),
+            }, f)
+        os.replace(tmp_path, options['checkpoint'])
+
+    def report_estimate(self, queryset, task_types, after_pk, options):
+        from django.conf import settings
+        combined = options['dispatch'] == 'celery' and getattr(settings, 'AI_COMBINED_ENTRY_ANALYSIS', False)
+        estimate = estimate_reprocessing(
+            queryset, task_types=task_types, combined=combined, after_pk=after_pk, batch_size=options['batch_size'],
+            only_unprocessed=options['only_unprocessed'],
+        )
+        self.stdout.write(f"Entries matched: {estimate['entries']}")
+        self.stdout.write(f"Provider requests: {estimate['requests']}")
+        self.stdout.write(f"Estimated tokens: {estimate['tokens']}")
+        if options['price_per_1k_tokens'] is not None:
+            self.stdout.write(f"Estimated cost: {estimate['tokens'] / 1000 * options['price_per_1k_tokens']:.2f}")
+        self.stdout.write(f"Estimated wall time at the configured rate limits: {estimate['wall_time']}")
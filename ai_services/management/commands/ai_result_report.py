@@ -0,0 +1,41 @@
+# ai_services/management/commands/ai_result_report.py
+
+from celery import current_app
+from celery.backends.redis import RedisBackend
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_services.result_backend import result_memory_report, sweep_results
+
+
+class Command(BaseCommand):
+    help = "Reports the memory used by stored Celery task results in Redis, by task name."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help="Inspect at most this many results.")
+        parser.add_argument('--sweep', action='store_true',
+                            help="First run the result sweep, as the periodic maintenance task does.")
+
+    def handle(self, *args, **options):
+        backend = current_app.backend
+        if not isinstance(backend, RedisBackend):
+            raise CommandError(f"The result backend is {type(backend).__name__}; this report needs Redis.")
+
+        try:
+            if options['sweep']:
+                counts = sweep_results(backend)
+                self.stdout.write(f"Swept {counts['scanned']} results: {counts['expired']} given an expiry, "
+                                  f"{counts['deleted']} deleted.")
+            report = result_memory_report(backend, limit=options['limit'])
+        except Exception as e:
+            raise CommandError(f"Could not read the result backend: {e}")
+
+        if not report:
+            self.stdout.write("No stored task results.")
+            return
+        width = max(len(name) for name in report)
+        self.stdout.write(f"{'Task':<{width}}  {'Results':>8}  {'Bytes':>12}  {'No expiry':>9}")
+        for name, row in sorted(report.items(), key=lambda item: item[1]['bytes'], reverse=True):
+            self.stdout.write(f"{name:<{width}}  {row['keys']:>8}  {row['bytes']:>12}  {row['no_expiry']:>9}")
+        total_keys = sum(row['keys'] for row in report.values())
+        total_bytes = sum(row['bytes'] for row in report.values())
+        self.stdout.write(self.style.SUCCESS(f"{total_keys} results, {total_bytes} bytes in total."))
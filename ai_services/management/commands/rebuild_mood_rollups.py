@@ -0,0 +1,24 @@
+# ai_services/management/commands/rebuild_mood_rollups.py
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_services.mood_rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Regenerates the daily mood rollups read by the dashboard mood charts from the journal entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only rebuild the rollups of this username.")
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['user']:
+            try:
+                user_ids = [get_user_model().objects.get(username=options['user']).pk]
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist.")
+        rows = rebuild_rollups(user_ids)
+        scope = f"user '{options['user']}'" if user_ids else "all users"
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily mood rollups for {scope}."))
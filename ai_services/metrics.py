@@ -0,0 +1,72 @@
+# ai_services/metrics.py
+
+"""
+Lightweight process-independent counters for the AI pipeline.
+
+Counters live in the Django cache (Redis in production) so that every web and
+worker process increments the same value. They are exposed as JSON through
+`AIMetricsView` for dashboards and ad-hoc inspection.
+"""
+import logging
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+METRICS_CACHE_ALIAS = 'default'
+METRICS_KEY_PREFIX = 'ai_metrics:'
+
+# Counters reported by AIMetricsView. Modules incrementing new counters should
+# list them here so they show up (with 0) even before their first increment.
+EXPORTED_COUNTERS = [
+    'response_cache.hits',
+    'response_cache.misses',
+    'response_cache.stores',
+    'circuit_breaker.open',
+    'circuit_breaker.half_open',
+    'circuit_breaker.closed',
+    'circuit_breaker.short_circuited',
+    'tokens.prompt',
+    'tokens.completion',
+] + [
+    f'tokens.{task_name}.{kind}'
+    for task_name in ('quote_generation', 'mood_detection', 'tag_suggestion', 'entry_analysis',
+                      'collective_insights', 'period_summary', 'insights_reduce',
+                      'life_suggestions_generation')
+    for kind in ('prompt', 'completion', 'calls')
+]
+
+
+def _cache():
+    return caches[METRICS_CACHE_ALIAS]
+
+
+def incr_counter(name, amount=1):
+    """
+    Increments a named counter. Failures are logged and swallowed: metrics
+    must never break the task or request that records them.
+    """
+    key = f"{METRICS_KEY_PREFIX}{name}"
+    cache = _cache()
+    try:
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key, amount)
+    except Exception as e:
+        logger.warning(f"Could not increment AI metric '{name}': {e}")
+        return None
+
+
+def get_counters(names=None):
+    """Returns a {name: value} dict for the requested (or all exported) counters."""
+    names = list(names or EXPORTED_COUNTERS)
+    try:
+        values = _cache().get_many([f"{METRICS_KEY_PREFIX}{name}" for name in names])
+    except Exception as e:
+        logger.warning(f"Could not read AI metrics: {e}")
+        values = {}
+    return {name: int(values.get(f"{METRICS_KEY_PREFIX}{name}") or 0) for name in names}
+
+
+def reset_counters(names=None):
+    """Resets the requested (or all exported) counters to zero."""
+    _cache().delete_many([f"{METRICS_KEY_PREFIX}{name}" for name in (names or EXPORTED_COUNTERS)])
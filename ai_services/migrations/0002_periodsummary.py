@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_services', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriodSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('week', 'Week'), ('month', 'Month')], max_length=10)),
+                ('period_start', models.DateField(help_text='First day of the week (Monday) or month covered.')),
+                ('summary', models.JSONField(default=dict, help_text='Highlights, challenges and key themes of the window.')),
+                ('entry_count', models.PositiveIntegerField(default=0, help_text='Number of entries summarized.')),
+                ('ai_model', models.CharField(blank=True, help_text='AI model that produced the summary.', max_length=100)),
+                ('is_stale', models.BooleanField(default=False, help_text='True if an entry in the window changed since the summary was made.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(help_text='The user whose entries are summarized.', on_delete=django.db.models.deletion.CASCADE, related_name='period_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Period Summary',
+                'verbose_name_plural': 'Period Summaries',
+                'constraints': [models.UniqueConstraint(fields=('user', 'granularity', 'period_start'), name='unique_period_summary')],
+            },
+        ),
+    ]
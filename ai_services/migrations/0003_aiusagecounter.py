@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_services', '0002_periodsummary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIUsageCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(help_text="Day (in the site's time zone) the calls were made.")),
+                ('calls', models.PositiveIntegerField(default=0)),
+                ('prompt_tokens', models.PositiveBigIntegerField(default=0)),
+                ('completion_tokens', models.PositiveBigIntegerField(default=0)),
+                ('user', models.ForeignKey(help_text='The user the AI calls were made for.', on_delete=django.db.models.deletion.CASCADE, related_name='ai_usage_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'AI Usage Counter',
+                'verbose_name_plural': 'AI Usage Counters',
+                'indexes': [models.Index(fields=['day'], name='ai_usage_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'day'), name='unique_ai_usage_per_user_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+
+# journal.constants.MOOD_NUMERICAL at the time of this migration.
+MOOD_SCORES = {'happy': 2, 'excited': 2, 'calm': 1, 'neutral': 0, 'sad': -1, 'angry': -2}
+
+
+def backfill_rollups(apps, schema_editor):
+    # The grouped query of mood_rollups.rebuild_rollups, against the historical models.
+    JournalEntry = apps.get_model('journal', 'JournalEntry')
+    DailyMoodRollup = apps.get_model('ai_services', 'DailyMoodRollup')
+    score = Case(
+        *[When(mood=mood, then=Value(value)) for mood, value in MOOD_SCORES.items()],
+        output_field=IntegerField(),
+    )
+    rows = (
+        JournalEntry.objects.filter(mood__in=MOOD_SCORES).order_by()
+        .annotate(day=TruncDate('created_at')).values('user_id', 'day')
+        .annotate(
+            score_sum=Sum(score),
+            **{f'{mood}_count': Count('id', filter=Q(mood=mood)) for mood in MOOD_SCORES},
+        )
+    )
+    DailyMoodRollup.objects.bulk_create((DailyMoodRollup(**row) for row in rows.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_services', '0003_aiusagecounter'),
+        ('journal', '0014_journalentry_user_date_mood_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMoodRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('happy_count', models.PositiveIntegerField(default=0)),
+                ('excited_count', models.PositiveIntegerField(default=0)),
+                ('calm_count', models.PositiveIntegerField(default=0)),
+                ('neutral_count', models.PositiveIntegerField(default=0)),
+                ('sad_count', models.PositiveIntegerField(default=0)),
+                ('angry_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.IntegerField(default=0, help_text="Sum of the mood scores of the day's entries.")),
+                ('user', models.ForeignKey(help_text='The user whose entries are counted.', on_delete=django.db.models.deletion.CASCADE, related_name='daily_mood_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Daily Mood Rollup',
+                'verbose_name_plural': 'Daily Mood Rollups',
+                'constraints': [models.UniqueConstraint(fields=('user', 'day'), name='unique_daily_mood_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,232 @@
+# ai_services/mock_provider.py
+
+"""
+A local stand-in for the OpenRouter chat-completions API, for offline load
+testing of the AI pipeline (see `manage.py ai_mock_provider`).
+
+Responses are deterministic for a given prompt: the task is recognised from
+the prompt wording and a plausible quote, mood, tag list, combined analysis,
+insights or suggestions payload is derived from a hash of the prompt. Latency
+and failures (HTTP 429/500, timeouts, malformed JSON) are injected at
+configurable rates from a seeded random generator, so runs are reproducible.
+"""
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'exponential', 'lognormal')
+
+MOCK_QUOTES = [
+    "\"The only way out is through.\" - Robert Frost",
+    "\"What we think, we become.\" - Buddha",
+    "\"Well done is better than well said.\" - Benjamin Franklin",
+    "\"The unexamined life is not worth living.\" - Socrates",
+    "\"Act as if what you do makes a difference. It does.\" - William James",
+]
+
+
+def _pick(prompt, options, salt=''):
+    """Deterministically picks one of `options` from a hash of the prompt."""
+    digest = hashlib.sha256(f"{salt}:{prompt}".encode('utf-8')).digest()
+    return options[int.from_bytes(digest[:4], 'big') % len(options)]
+
+
+def _bracket_list(text):
+    """Parses a '[a, b, c]' list as written by the prompt builders."""
+    return [item.strip() for item in text.split(',') if item.strip()]
+
+
+def _find_list(prompt, pattern):
+    match = re.search(pattern, prompt, re.DOTALL)
+    return _bracket_list(match.group(1)) if match else []
+
+
+def _pick_tags(prompt, available_tags):
+    if not available_tags:
+        return []
+    count = 1 + int(hashlib.sha256(prompt.encode('utf-8')).hexdigest(), 16) % min(3, len(available_tags))
+    return sorted({_pick(prompt, available_tags, salt=f"tag{i}") for i in range(count)})
+
+
+def build_completion_content(prompt):
+    """Returns the deterministic message content the mock provider answers `prompt` with."""
+    if "Analyze the following journal entry and provide these fields" in prompt:
+        analysis = {}
+        if '"quote":' in prompt:
+            analysis['quote'] = _pick(prompt, MOCK_QUOTES)
+        moods = _find_list(prompt, r'"mood": the single.*?chosen from \[([^\]]*)\]')
+        if moods:
+            analysis['mood'] = _pick(prompt, moods, salt='mood')
+        tags = _find_list(prompt, r'ONLY tags from this list: \[([^\]]*)\]')
+        if tags:
+            analysis['tags'] = _pick_tags(prompt, tags)
+        return json.dumps(analysis)
+    if prompt.rstrip().endswith("INSPIRATIONAL QUOTE:"):
+        return _pick(prompt, MOCK_QUOTES)
+    if prompt.rstrip().endswith("PRIMARY MOOD:"):
+        moods = _find_list(prompt, r'best represents the entry\'s core feeling:\n\[([^\]]*)\]')
+        return _pick(prompt, moods or ['neutral'], salt='mood')
+    if prompt.rstrip().endswith("Relevant Tags:"):
+        return ", ".join(_pick_tags(prompt, _find_list(prompt, r'AVAILABLE TAGS:\n\[([^\]]*)\]')))
+    if "'highlights', 'challenges', and 'key_themes'" in prompt:
+        return json.dumps({
+            'highlights': [_pick(prompt, ["Finished a long-running project", "Spent time outdoors", "Reconnected with a friend"])],
+            'challenges': [_pick(prompt, ["Irregular sleep", "A stressful deadline", "Low energy midweek"], salt='c')],
+            'key_themes': [_pick(prompt, ["Work-life balance", "Growth", "Relationships"], salt='t')],
+        })
+    if '"suggestions"' in prompt:
+        return json.dumps({'suggestions': [
+            "Plan one more moment like your best day this week.",
+            "Try five focused minutes on the hardest task each morning.",
+            "What would make next week feel lighter?",
+        ]})
+    return "This is a mock response."
+
+
+class MockProviderConfig:
+    """Latency and failure injection settings of the mock provider."""
+
+    def __init__(self, latency=0.0, latency_distribution='fixed', latency_sigma=0.5, rate_429=0.0, rate_500=0.0,
+                 rate_timeout=0.0, timeout_seconds=120.0, rate_malformed=0.0, retry_after=1, seed=None):
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{latency_distribution}'.")
+        self.latency = latency
+        self.latency_distribution = latency_distribution
+        self.latency_sigma = latency_sigma
+        self.rate_429 = rate_429
+        self.rate_500 = rate_500
+        self.rate_timeout = rate_timeout
+        self.timeout_seconds = timeout_seconds
+        self.rate_malformed = rate_malformed
+        self.retry_after = retry_after
+        self.seed = seed
+
+
+class MockProviderServer(ThreadingHTTPServer):
+    """Threaded HTTP server carrying the injection config, a seeded RNG and outcome counters."""
+
+    daemon_threads = True
+
+    def __init__(self, server_address, config=None):
+        super().__init__(server_address, MockProviderHandler)
+        self.config = config or MockProviderConfig()
+        self.rng = random.Random(self.config.seed)
+        self.lock = threading.Lock()
+        self.outcomes = {}
+        self.latencies = []
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def draw(self):
+        """Returns (outcome, latency_seconds) for the next request."""
+        config = self.config
+        with self.lock:
+            roll = self.rng.random()
+            if config.latency_distribution == 'uniform':
+                latency = self.rng.uniform(0, 2 * config.latency)
+            elif config.latency_distribution == 'exponential':
+                latency = self.rng.expovariate(1 / config.latency) if config.latency else 0.0
+            elif config.latency_distribution == 'lognormal':
+                # Median equal to `latency`, with a long right tail controlled by sigma.
+                latency = config.latency * self.rng.lognormvariate(0, config.latency_sigma)
+            else:
+                latency = config.latency
+
+        for outcome, rate in (('429', config.rate_429), ('500', config.rate_500),
+                              ('timeout', config.rate_timeout), ('malformed', config.rate_malformed)):
+            if roll < rate:
+                return outcome, latency
+            roll -= rate
+        return 'ok', latency
+
+    def record(self, outcome, latency):
+        with self.lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            self.latencies.append(latency)
+
+    def summary(self):
+        """Request counts per outcome and injected latency percentiles."""
+        with self.lock:
+            latencies = sorted(self.latencies)
+            outcomes = dict(self.outcomes)
+        percentiles = {}
+        for p in (50, 95, 99):
+            if latencies:
+                percentiles[f'p{p}'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))], 3)
+        return {'requests': len(latencies), 'outcomes': outcomes, 'latency_seconds': percentiles}
+
+
+class MockProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.debug("Mock provider: " + format, *args)
+
+    def _send(self, status, body, headers=None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw_body = self.rfile.read(length)
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send(404, json.dumps({'error': {'message': f"Unknown path {self.path}"}}))
+            return
+        try:
+            payload = json.loads(raw_body)
+            prompt = payload['messages'][-1]['content']
+        except (ValueError, KeyError, IndexError, TypeError):
+            self._send(400, json.dumps({'error': {'message': "Invalid chat-completions request."}}))
+            return
+
+        outcome, latency = self.server.draw()
+        self.server.record(outcome, latency)
+        if outcome == 'timeout':
+            time.sleep(self.server.config.timeout_seconds)
+            self.close_connection = True
+            return
+        time.sleep(latency)
+
+        if outcome == '429':
+            self._send(429, json.dumps({'error': {'message': "Rate limit exceeded (mock)."}}),
+                       headers={'Retry-After': str(self.server.config.retry_after)})
+        elif outcome == '500':
+            self._send(500, json.dumps({'error': {'message': "Internal error (mock)."}}))
+        elif outcome == 'malformed':
+            self._send(200, '{"id": "mock-malformed", "choices": [{"message": ')
+        else:
+            content = build_completion_content(prompt)
+            prompt_tokens = len(prompt) // 4
+            completion_tokens = len(content) // 4
+            self._send(200, json.dumps({
+                'id': f"mock-{hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]}",
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': payload.get('model', 'mock'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'stop',
+                }],
+                'usage': {
+                    'prompt_tokens': prompt_tokens,
+                    'completion_tokens': completion_tokens,
+                    'total_tokens': prompt_tokens + completion_tokens,
+                },
+            }))
@@ -66,4 +66,111 @@ class JournalEntryAnalysis(models.Model):
         # ] # primary_key=True on OneToOneField already enforces uniqueness.
 
     def __str__(self):
-        return f"AI Analysis for Entry ID: {self.journal_entry_id}"
\ No newline at end of file
+        return f"AI Analysis for Entry ID: {self.journal_entry_id}"
+
+class PeriodSummary(models.Model):
+    """
+    A persisted AI summary (highlights, challenges, key themes) of one user's
+    journal entries in one calendar week or month. Period insights are built
+    by merging these rollups instead of re-sending the raw entries; a rollup
+    is marked stale when an entry in its window is created, edited or deleted.
+    """
+    GRANULARITY_WEEK = 'week'
+    GRANULARITY_MONTH = 'month'
+    GRANULARITY_CHOICES = [
+        (GRANULARITY_WEEK, 'Week'),
+        (GRANULARITY_MONTH, 'Month'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='period_summaries',
+        help_text="The user whose entries are summarized."
+    )
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES)
+    period_start = models.DateField(help_text="First day of the week (Monday) or month covered.")
+    summary = models.JSONField(default=dict, help_text="Highlights, challenges and key themes of the window.")
+    entry_count = models.PositiveIntegerField(default=0, help_text="Number of entries summarized.")
+    ai_model = models.CharField(max_length=100, blank=True, help_text="AI model that produced the summary.")
+    is_stale = models.BooleanField(default=False, help_text="True if an entry in the window changed since the summary was made.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Period Summary"
+        verbose_name_plural = "Period Summaries"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'granularity', 'period_start'], name='unique_period_summary'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_granularity_display()} summary from {self.period_start} for user ID {self.user_id}"
+
+
+class AIUsageCounter(models.Model):
+    """
+    AI provider usage of one user on one day: calls and prompt/completion
+    tokens, incremented after every provider call (see quotas.py). The daily
+    quotas are checked against these rows before new AI work is admitted.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='ai_usage_counters',
+        help_text="The user the AI calls were made for."
+    )
+    day = models.DateField(help_text="Day (in the site's time zone) the calls were made.")
+    calls = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveBigIntegerField(default=0)
+    completion_tokens = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "AI Usage Counter"
+        verbose_name_plural = "AI Usage Counters"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_ai_usage_per_user_day'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='ai_usage_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"AI usage of user ID {self.user_id} on {self.day}"
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+
+class DailyMoodRollup(models.Model):
+    """
+    Mood statistics of one user's journal entries on one day (in the site's
+    time zone): the number of entries per mood and the sum of their
+    MOOD_NUMERICAL scores. Kept up to date by mood_rollups.py whenever an
+    entry's mood changes; the dashboard mood charts read these rows instead
+    of the entries. Days without a mood have no row.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='daily_mood_rollups',
+        help_text="The user whose entries are counted."
+    )
+    day = models.DateField()
+    happy_count = models.PositiveIntegerField(default=0)
+    excited_count = models.PositiveIntegerField(default=0)
+    calm_count = models.PositiveIntegerField(default=0)
+    neutral_count = models.PositiveIntegerField(default=0)
+    sad_count = models.PositiveIntegerField(default=0)
+    angry_count = models.PositiveIntegerField(default=0)
+    score_sum = models.IntegerField(default=0, help_text="Sum of the mood scores of the day's entries.")
+
+    class Meta:
+        verbose_name = "Daily Mood Rollup"
+        verbose_name_plural = "Daily Mood Rollups"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_daily_mood_rollup'),
+        ]
+
+    def __str__(self):
+        return f"Mood rollup of user ID {self.user_id} on {self.day}"
@@ -0,0 +1,117 @@
+# ai_services/mood_rollups.py
+
+"""
+Maintenance of the per-user daily mood rollups (see models.DailyMoodRollup).
+
+A day's row is recomputed from the day's entries whenever one of them gains,
+changes or loses a mood: on entry save and delete (signals.py) and after the
+AI tasks write a detected mood with a queryset update, which sends no
+signals (idempotency.update_if_current, bulk._write_batch). Recomputing
+rather than incrementing keeps a row correct however often it is refreshed.
+`rebuild_rollups` (the rebuild_mood_rollups command) regenerates the table
+from scratch. Days are calendar days in the site's time zone.
+
+Every refresh also bumps the user's chart version (see chart_cache.py) once
+the transaction commits, so cached charts never outlive the rows they were
+built from.
+"""
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+
+from journal.constants import MOOD_NUMERICAL
+from .chart_cache import bump_chart_version
+from .models import DailyMoodRollup
+from .period_summaries import local_date
+
+logger = logging.getLogger(__name__)
+
+_ROLLUP_FIELDS = {field.name for field in DailyMoodRollup._meta.get_fields()}
+
+# Rollup count field of each scored mood the table has a column for.
+MOOD_COUNT_FIELDS = {mood: f'{mood}_count' for mood in MOOD_NUMERICAL if f'{mood}_count' in _ROLLUP_FIELDS}
+
+_UNCOUNTED_MOODS = sorted(set(MOOD_NUMERICAL) - set(MOOD_COUNT_FIELDS))
+if _UNCOUNTED_MOODS:
+    # A mood added to MOOD_NUMERICAL is only counted once DailyMoodRollup has a column (and migration) for it.
+    logger.warning(f"Moods left out of the daily mood rollups, which have no count field for them: {', '.join(_UNCOUNTED_MOODS)}")
+
+_MOOD_SCORE = Case(
+    *[When(mood=mood, then=Value(MOOD_NUMERICAL[mood])) for mood in MOOD_COUNT_FIELDS],
+    output_field=IntegerField(),
+)
+
+
+def _daily_rows(entries, *group_by):
+    """Groups scored-mood entries by `group_by` and local day, with the rollup's counts and score sum."""
+    return (
+        entries.filter(mood__in=MOOD_COUNT_FIELDS).order_by()
+        .annotate(day=TruncDate('created_at')).values(*group_by, 'day')
+        .annotate(
+            score_sum=Sum(_MOOD_SCORE),
+            **{field: Count('id', filter=Q(mood=mood)) for mood, field in MOOD_COUNT_FIELDS.items()},
+        )
+    )
+
+
+def refresh_days(user_id, days):
+    """Recomputes the user's rollups of `days` from their entries; days left without a mood lose their row."""
+    from journal.models import JournalEntry
+    days = set(days)
+    if not days:
+        return
+    entries = JournalEntry.objects.filter(user_id=user_id, created_at__date__in=days)
+    with transaction.atomic():
+        counted = set()
+        for row in _daily_rows(entries):
+            day = row.pop('day')
+            DailyMoodRollup.objects.update_or_create(user_id=user_id, day=day, defaults=row)
+            counted.add(day)
+        if days - counted:
+            DailyMoodRollup.objects.filter(user_id=user_id, day__in=days - counted).delete()
+        transaction.on_commit(lambda: bump_chart_version(user_id))
+
+
+def refresh_entry_day(user_id, created_at):
+    """Recomputes the rollup of the day an entry created at `created_at` belongs to."""
+    refresh_days(user_id, [local_date(created_at)])
+
+
+def refresh_entries(entry_ids):
+    """Recomputes the rollups of the days of the given entries, e.g. after a bulk mood update."""
+    from journal.models import JournalEntry
+    days_by_user = defaultdict(set)
+    for user_id, created_at in JournalEntry.objects.filter(pk__in=entry_ids).values_list('user_id', 'created_at'):
+        days_by_user[user_id].add(local_date(created_at))
+    for user_id, days in days_by_user.items():
+        refresh_days(user_id, days)
+
+
+def _bump_chart_versions(user_ids):
+    for user_id in user_ids:
+        bump_chart_version(user_id)
+
+
+def rebuild_rollups(user_ids=None, batch_size=1000):
+    """
+    Regenerates the rollups of the given users (default all) from their
+    entries with one grouped query. Returns the number of rows written.
+    """
+    from journal.models import JournalEntry
+    entries = JournalEntry.objects.all()
+    rollups = DailyMoodRollup.objects.all()
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+        rollups = rollups.filter(user_id__in=user_ids)
+    with transaction.atomic():
+        affected_user_ids = set(rollups.values_list('user_id', flat=True).distinct())
+        rollups.delete()
+        created = DailyMoodRollup.objects.bulk_create(
+            (DailyMoodRollup(**row) for row in _daily_rows(entries, 'user_id').iterator()), batch_size=batch_size,
+        )
+        affected_user_ids.update(rollup.user_id for rollup in created)
+        transaction.on_commit(lambda: _bump_chart_versions(affected_user_ids))
+    return len(created)
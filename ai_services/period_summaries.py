@@ -0,0 +1,62 @@
+# ai_services/period_summaries.py
+
+"""
+Calendar windows of the persisted period summaries (see models.PeriodSummary).
+
+Short insight periods are rolled up from weekly summaries and long ones from
+monthly summaries. Windows are computed in the site's time zone.
+"""
+import datetime
+
+from django.utils import timezone
+
+from .models import PeriodSummary
+
+# Periods spanning more days than this are built from monthly rather than weekly summaries.
+WEEKLY_ROLLUP_MAX_DAYS = 92
+
+
+def local_date(value):
+    return timezone.localtime(value).date()
+
+
+def window_start(day, granularity):
+    """Returns the Monday of `day`'s week, or the first of its month."""
+    if granularity == PeriodSummary.GRANULARITY_WEEK:
+        return day - datetime.timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def next_window_start(start, granularity):
+    if granularity == PeriodSummary.GRANULARITY_WEEK:
+        return start + datetime.timedelta(days=7)
+    return (start + datetime.timedelta(days=32)).replace(day=1)
+
+
+def window_bounds(start, granularity):
+    """Returns the aware [start, end) datetimes of the window beginning on `start`."""
+    def to_datetime(day):
+        return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    return to_datetime(start), to_datetime(next_window_start(start, granularity))
+
+
+def granularity_for_period(start_date, end_date):
+    """Chooses the rollup granularity for a period; `start_date` None means all time."""
+    if start_date is not None and (end_date - start_date).days <= WEEKLY_ROLLUP_MAX_DAYS:
+        return PeriodSummary.GRANULARITY_WEEK
+    return PeriodSummary.GRANULARITY_MONTH
+
+
+def windows_with_entries(entries_query, granularity):
+    """Returns the sorted start dates of the windows containing at least one of the entries."""
+    days = {local_date(created_at) for created_at in entries_query.values_list('created_at', flat=True).iterator()}
+    return sorted({window_start(day, granularity) for day in days})
+
+
+def mark_stale(user_id, created_at):
+    """Marks the weekly and monthly summaries covering an entry created at `created_at` as stale."""
+    day = local_date(created_at)
+    for granularity, _label in PeriodSummary.GRANULARITY_CHOICES:
+        PeriodSummary.objects.filter(
+            user_id=user_id, granularity=granularity, period_start=window_start(day, granularity), is_stale=False,
+        ).update(is_stale=True)
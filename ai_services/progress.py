@@ -0,0 +1,145 @@
+# ai_services/progress.py
+
+"""
+Push-based progress of the per-entry AI tasks (quote, mood, tags).
+
+When a task has written its result it publishes it on the entry's Redis
+pub/sub channel. `entry_progress_events` turns those messages into a
+Server-Sent Events stream for the progress modal: it starts with a snapshot
+of the entry's current state and sends an updated status object, in the same
+shape AIServiceStatusView returns, every time a task lands. If Redis is
+unreachable the stream sends a `fallback` event, and the browser polls the
+status view instead. Streams are only served under ASGI with
+AI_PROGRESS_SSE_ENABLED on; otherwise the view answers 204 at once, which
+also makes the browser poll.
+"""
+import json
+import logging
+import time
+
+from django.conf import settings
+
+from .redis_client import get_async_redis, get_redis
+from .task_status import OUTCOME_STATUSES, TASK_PARTS, all_done, part_status
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_CHANNEL = 'ai_progress:entry:{entry_id}'
+
+
+def publish_entry_progress(entry_id, **parts):
+    """
+    Announces finished task parts of an entry, e.g.
+    publish_entry_progress(7, mood={'mood': 'happy'}). Publishing is best
+    effort: listeners that miss it still see the result when they fall back
+    to polling.
+    """
+    try:
+        get_redis().publish(PROGRESS_CHANNEL.format(entry_id=entry_id), json.dumps(parts))
+    except Exception as e:
+        logger.warning(f"Could not publish AI progress for entry {entry_id}: {e}")
+
+
+def build_status(entry, profile, tag_names):
+    """
+    Returns the status object of the progress modal, computed from the
+    entry's recorded task outcomes alone (no result backend lookups).
+    """
+    enabled = {
+        'quote': profile.ai_enable_quotes,
+        'mood': profile.ai_enable_mood_detection,
+        'tags': profile.ai_enable_tag_suggestion,
+    }
+    statuses = {
+        f'{part}_status': part_status(enabled[part], getattr(entry, f'ai_{part}_processed'), getattr(entry, f'ai_{part}_status'))
+        for part in TASK_PARTS
+    }
+    status = {
+        'status': 'ok',
+        'entry_id': entry.id,
+        'task_statuses': statuses,
+        'ai_quote': entry.ai_quote if profile.ai_enable_quotes else "",
+        'mood': entry.mood,
+        'tags': list(tag_names),
+    }
+    status['all_done'] = all_done(statuses)
+    return status
+
+
+def apply_update(status, parts):
+    """Merges a published update into a status object."""
+    for part, fields in parts.items():
+        key = f'{part}_status'
+        if part not in TASK_PARTS or status['task_statuses'].get(key) == 'DISABLED_BY_USER':
+            continue
+        status['task_statuses'][key] = OUTCOME_STATUSES.get(fields.get('status'), 'SUCCESS')
+        if part == 'quote':
+            status['ai_quote'] = fields.get('ai_quote', status['ai_quote'])
+        elif part == 'mood':
+            status['mood'] = fields.get('mood', status['mood'])
+        elif part == 'tags':
+            status['tags'] = fields.get('tags', status['tags'])
+    status['all_done'] = all_done(status['task_statuses'])
+    return status
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def streaming_enabled(request):
+    """
+    True if the progress stream may be served: AI_PROGRESS_SSE_ENABLED is on
+    and the request came through ASGI. Under WSGI Django consumes an async
+    stream completely before sending it, so the client would get nothing
+    until the stream ends.
+    """
+    from django.core.handlers.asgi import ASGIRequest
+    return getattr(settings, 'AI_PROGRESS_SSE_ENABLED', False) and isinstance(request, ASGIRequest)
+
+
+async def entry_progress_events(entry_id, load_status):
+    """
+    Async generator of the SSE stream for one entry. `load_status` is an
+    async callable returning the current status object; it is called after
+    subscribing, so no update can fall between the snapshot and the stream.
+
+    The stream ends once every part is done, or after AI_PROGRESS_STREAM_TIMEOUT
+    seconds; a comment line is sent every AI_PROGRESS_HEARTBEAT seconds to keep
+    proxies from closing the idle connection.
+    """
+    timeout = getattr(settings, 'AI_PROGRESS_STREAM_TIMEOUT', 120)
+    heartbeat = getattr(settings, 'AI_PROGRESS_HEARTBEAT', 15)
+    client = get_async_redis()
+    pubsub = client.pubsub()
+    try:
+        try:
+            await pubsub.subscribe(PROGRESS_CHANNEL.format(entry_id=entry_id))
+        except Exception as e:
+            logger.warning(f"AI progress stream unavailable for entry {entry_id}, client will poll: {e}")
+            yield _sse('fallback', await load_status())
+            return
+
+        status = await load_status()
+        yield _sse('status', status)
+        deadline = time.monotonic() + timeout
+        while not status['all_done'] and time.monotonic() < deadline:
+            wait = min(heartbeat, max(0.0, deadline - time.monotonic()))
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=wait)
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            try:
+                parts = json.loads(message['data'])
+            except (TypeError, ValueError):
+                continue
+            yield _sse('status', apply_update(status, parts))
+        if not status['all_done']:
+            # Let the client check the task states (e.g. failures) through the status view.
+            yield _sse('fallback', status)
+    finally:
+        try:
+            await pubsub.aclose()
+            await client.aclose()
+        except Exception as e:
+            logger.debug(f"Error closing AI progress subscription for entry {entry_id}: {e}")
@@ -0,0 +1,106 @@
+# ai_services/quotas.py
+
+"""
+Per-user and global daily AI usage metering, and admission control.
+
+Every provider call adds its prompt and completion tokens to the calling
+user's AIUsageCounter row for the day (one row per user and day, updated in
+place). Before new AI work is started for a user (period insights, life
+suggestions, the per-entry tasks), `quota_exceeded` compares today's usage
+with AI_USER_DAILY_TOKEN_QUOTA and, across all users, with
+AI_GLOBAL_DAILY_TOKEN_QUOTA; callers answer HTTP 429 while either is used up.
+Quotas reset at midnight in the site's time zone. A quota of 0 is unlimited.
+"""
+import datetime
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+logger = logging.getLogger(__name__)
+
+
+def _enabled():
+    return getattr(settings, 'AI_QUOTA_ENABLED', True)
+
+
+def record_user_usage(user_id, prompt_tokens, completion_tokens):
+    """
+    Adds one provider call to the user's counter for today. Failures are
+    logged and swallowed, so metering never breaks the call it meters.
+    """
+    from .models import AIUsageCounter
+    day = timezone.localdate()
+    counters = AIUsageCounter.objects.filter(user_id=user_id, day=day)
+    increments = {
+        'calls': F('calls') + 1,
+        'prompt_tokens': F('prompt_tokens') + prompt_tokens,
+        'completion_tokens': F('completion_tokens') + completion_tokens,
+    }
+    try:
+        if counters.update(**increments):
+            return
+        try:
+            with transaction.atomic():
+                AIUsageCounter.objects.create(
+                    user_id=user_id, day=day, calls=1, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                )
+        except IntegrityError:
+            # Another call created today's row in the meantime.
+            counters.update(**increments)
+    except Exception as e:
+        logger.warning(f"Could not record AI usage of user ID {user_id}: {e}")
+
+
+def get_daily_usage(user_id, day=None):
+    """Tokens used on `day` (default today) by the user and by all users: (user_tokens, global_tokens)."""
+    from .models import AIUsageCounter
+    day = day or timezone.localdate()
+    tokens = F('prompt_tokens') + F('completion_tokens')
+    usage = AIUsageCounter.objects.filter(day=day).aggregate(
+        user=Sum(tokens, filter=Q(user_id=user_id)), total=Sum(tokens),
+    )
+    return usage['user'] or 0, usage['total'] or 0
+
+
+def seconds_until_reset():
+    now = timezone.localtime()
+    midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time.min, tzinfo=now.tzinfo)
+    return max(1, int((midnight - now).total_seconds()))
+
+
+def quota_exceeded(user_id):
+    """
+    Returns None if the user may start new AI work today, otherwise
+    {'scope': 'user' or 'global', 'limit': tokens, 'used': tokens}.
+    """
+    user_limit = getattr(settings, 'AI_USER_DAILY_TOKEN_QUOTA', 0)
+    global_limit = getattr(settings, 'AI_GLOBAL_DAILY_TOKEN_QUOTA', 0)
+    if not _enabled() or not (user_limit or global_limit):
+        return None
+    user_used, global_used = get_daily_usage(user_id)
+    if user_limit and user_used >= user_limit:
+        return {'scope': 'user', 'limit': user_limit, 'used': user_used}
+    if global_limit and global_used >= global_limit:
+        return {'scope': 'global', 'limit': global_limit, 'used': global_used}
+    return None
+
+
+def quota_exceeded_message(exceeded):
+    if exceeded['scope'] == 'user':
+        return _("You have reached today's limit for AI features. Please try again tomorrow.")
+    return _("AI features are temporarily unavailable because of high demand. Please try again later.")
+
+
+def quota_exceeded_response(exceeded, **extra):
+    """The HTTP 429 answer to a request refused by `quota_exceeded`."""
+    logger.info(f"AI request refused: {exceeded['scope']} daily token quota of {exceeded['limit']} used up ({exceeded['used']}).")
+    response = JsonResponse(
+        {'status': 'error', 'message': quota_exceeded_message(exceeded), 'quota': exceeded['scope'], **extra}, status=429,
+    )
+    response['Retry-After'] = str(seconds_until_reset())
+    return response
@@ -0,0 +1,201 @@
+# ai_services/rate_limit.py
+
+"""
+Distributed admission control for AI provider calls.
+
+Every worker process shares, per model, two Redis token buckets (requests per
+second and tokens per minute) and a max-in-flight semaphore. Callers block
+until capacity is available instead of sending the request, being answered
+with HTTP 429 and going into a Celery retry.
+"""
+import logging
+import random
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .redis_client import get_redis
+from .retry import RetryableAIError
+from .tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMITS = {
+    'requests_per_second': 5,
+    'tokens_per_minute': 100000,
+    'max_in_flight': 20,
+}
+
+# Atomically takes `requested` units from both buckets, or nothing at all.
+# KEYS: request bucket, token bucket
+# ARGV: now_ms, req_capacity, req_refill_per_ms, tok_capacity, tok_refill_per_ms, tokens_requested
+# Returns 0 when admitted, otherwise the number of milliseconds to wait.
+_TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local function refill(key, capacity, rate)
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1])
+    local ts = tonumber(state[2])
+    if tokens == nil then
+        tokens = capacity
+        ts = now
+    end
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    return tokens
+end
+
+local req_capacity, req_rate = tonumber(ARGV[2]), tonumber(ARGV[3])
+local tok_capacity, tok_rate = tonumber(ARGV[4]), tonumber(ARGV[5])
+local tok_requested = math.min(tonumber(ARGV[6]), tok_capacity)
+
+local req_tokens = refill(KEYS[1], req_capacity, req_rate)
+local tok_tokens = refill(KEYS[2], tok_capacity, tok_rate)
+
+local wait = 0
+if req_tokens < 1 then
+    wait = math.max(wait, math.ceil((1 - req_tokens) / req_rate))
+end
+if tok_tokens < tok_requested then
+    wait = math.max(wait, math.ceil((tok_requested - tok_tokens) / tok_rate))
+end
+
+if wait == 0 then
+    req_tokens = req_tokens - 1
+    tok_tokens = tok_tokens - tok_requested
+end
+
+redis.call('HSET', KEYS[1], 'tokens', req_tokens, 'ts', now)
+redis.call('HSET', KEYS[2], 'tokens', tok_tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(req_capacity / req_rate) + 1000)
+redis.call('PEXPIRE', KEYS[2], math.ceil(tok_capacity / tok_rate) + 1000)
+return wait
+"""
+
+# Takes an in-flight slot. Expired leases (crashed workers) are dropped first.
+# KEYS: semaphore zset. ARGV: now_ms, lease_expiry_ms, max_in_flight, lease_id
+_SEMAPHORE_ACQUIRE_LUA = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[4])
+    redis.call('PEXPIRE', KEYS[1], math.max(0, tonumber(ARGV[2]) - tonumber(ARGV[1])) + 1000)
+    return 1
+end
+return 0
+"""
+
+
+class RateLimitTimeout(RetryableAIError):
+    """Raised when provider capacity could not be acquired within the maximum wait."""
+
+
+def get_limits(model):
+    """
+    Returns the effective limits for `model`: the 'default' entry of
+    AI_RATE_LIMITS overlaid with the model-specific entry, if any.
+    """
+    configured = getattr(settings, 'AI_RATE_LIMITS', {})
+    limits = dict(DEFAULT_LIMITS)
+    limits.update(configured.get('default', {}))
+    limits.update(configured.get(model, {}))
+    return limits
+
+
+def estimate_tokens(prompt_text, max_tokens):
+    """Upper bound of the tokens a call uses: the prompt plus the full completion allowance."""
+    return count_tokens(prompt_text) + max_tokens
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def _sleep(seconds):
+    # Jitter spreads waiters out so they do not all retry on the same tick.
+    # time.sleep yields to other greenlets once gevent has patched the process.
+    time.sleep(seconds * random.uniform(0.8, 1.2))
+
+
+def _wait_for_bucket(client, model, limits, tokens, deadline):
+    keys = [f"ai_rl:{model}:requests", f"ai_rl:{model}:tokens"]
+    # Below one request per second the bucket must still hold one whole request.
+    args = [
+        None,
+        max(1, limits['requests_per_second']), limits['requests_per_second'] / 1000.0,
+        limits['tokens_per_minute'], limits['tokens_per_minute'] / 60000.0,
+        tokens,
+    ]
+    while True:
+        args[0] = _now_ms()
+        wait_ms = int(client.eval(_TOKEN_BUCKET_LUA, len(keys), *keys, *args))
+        if wait_ms <= 0:
+            return
+        if time.monotonic() + wait_ms / 1000.0 > deadline:
+            raise RateLimitTimeout(f"Rate limit for {model} not available within the maximum wait.")
+        _sleep(wait_ms / 1000.0)
+
+
+def _acquire_slot(client, model, limits, deadline):
+    key = f"ai_rl:{model}:inflight"
+    lease_id = uuid.uuid4().hex
+    lease_ms = int(getattr(settings, 'AI_RATE_LIMIT_LEASE_SECONDS', 180) * 1000)
+    while True:
+        now = _now_ms()
+        if client.eval(_SEMAPHORE_ACQUIRE_LUA, 1, key, now, now + lease_ms, limits['max_in_flight'], lease_id):
+            return key, lease_id
+        if time.monotonic() + 0.25 > deadline:
+            raise RateLimitTimeout(f"No in-flight slot for {model} became free within the maximum wait.")
+        _sleep(0.25)
+
+
+def acquire_capacity(model, estimated_tokens):
+    """
+    Blocks until a request of `estimated_tokens` may be sent to `model` and
+    takes an in-flight slot. The slot is taken after the rate limit wait, so
+    no slot is held while sleeping. Returns the slot to pass to
+    release_capacity(), or None when the limiter is disabled or Redis is
+    unreachable (fail open).
+
+    Raises RateLimitTimeout after AI_RATE_LIMIT_MAX_WAIT seconds.
+    """
+    if not getattr(settings, 'AI_RATE_LIMIT_ENABLED', True):
+        return None
+
+    limits = get_limits(model)
+    deadline = time.monotonic() + getattr(settings, 'AI_RATE_LIMIT_MAX_WAIT', 120)
+    try:
+        client = get_redis()
+        _wait_for_bucket(client, model, limits, estimated_tokens, deadline)
+        slot = _acquire_slot(client, model, limits, deadline)
+    except RateLimitTimeout:
+        raise
+    except Exception as e:
+        logger.warning(f"AI rate limiter unavailable, proceeding without it: {e}")
+        return None
+    return slot
+
+
+def release_capacity(slot):
+    """Frees an in-flight slot taken by acquire_capacity()."""
+    if not slot:
+        return
+    key, lease_id = slot
+    try:
+        get_redis().zrem(key, lease_id)
+    except Exception as e:
+        # The lease expires on its own; only log.
+        logger.warning(f"Could not release AI in-flight slot {lease_id}: {e}")
+
+
+@contextmanager
+def provider_capacity(model, estimated_tokens):
+    """
+    Context manager form of acquire_capacity(): holds the in-flight slot for
+    the duration of the block.
+    """
+    slot = acquire_capacity(model, estimated_tokens)
+    try:
+        yield
+    finally:
+        release_capacity(slot)
@@ -0,0 +1,60 @@
+# ai_services/redis_client.py
+
+"""
+Shared Redis connection for AI coordination state (rate limits, circuit
+breaker, locks). One client, and therefore one connection pool, is kept per
+process and rebuilt after fork. Async code (the progress streams) shares one
+redis.asyncio connection pool per process and event loop.
+"""
+import os
+import threading
+
+import redis
+from django.conf import settings
+
+_client_lock = threading.Lock()
+_client = None
+_client_pid = None
+_async_pool = None
+_async_pool_owner = None
+
+
+def get_redis():
+    """Returns the process-wide Redis client for AI_REDIS_URL."""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            _client = redis.Redis.from_url(
+                getattr(settings, 'AI_REDIS_URL', 'redis://localhost:6379/0'),
+                socket_connect_timeout=getattr(settings, 'AI_REDIS_SOCKET_TIMEOUT', 1.0),
+                socket_timeout=getattr(settings, 'AI_REDIS_SOCKET_TIMEOUT', 1.0),
+                health_check_interval=30,
+            )
+            _client_pid = pid
+    return _client
+
+
+def get_async_redis():
+    """
+    Returns a redis.asyncio client for AI_REDIS_URL on the process's shared
+    async connection pool. Must be called from a running event loop; closing
+    the client leaves the pool open.
+    """
+    import asyncio
+    import redis.asyncio
+
+    global _async_pool, _async_pool_owner
+    # Async connections belong to the loop they were opened on.
+    owner = (os.getpid(), id(asyncio.get_running_loop()))
+    with _client_lock:
+        if _async_pool is None or _async_pool_owner != owner:
+            _async_pool = redis.asyncio.ConnectionPool.from_url(
+                getattr(settings, 'AI_REDIS_URL', 'redis://localhost:6379/0'),
+                socket_connect_timeout=getattr(settings, 'AI_REDIS_SOCKET_TIMEOUT', 1.0),
+            )
+            _async_pool_owner = owner
+        return redis.asyncio.Redis(connection_pool=_async_pool)
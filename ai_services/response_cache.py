@@ -0,0 +1,98 @@
+# ai_services/response_cache.py
+
+"""
+Content-hash keyed cache of AI provider responses.
+
+Entries are keyed on (task type, model, prompt version, normalized content
+hash), so re-analysing text that was already sent to the provider — an edit
+that round-trips back to earlier content, or near-identical template entries —
+is answered from the cache instead of making another provider call.
+"""
+import hashlib
+import logging
+import re
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import incr_counter
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_ALIAS = 'ai_responses'
+CACHE_KEY_VERSION = 1
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_content(text):
+    """
+    Normalizes text before hashing: Unicode NFKC, collapsed whitespace and
+    stripped ends, so formatting-only differences map to the same key.
+    """
+    text = unicodedata.normalize('NFKC', text or '')
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def content_hash(text):
+    return hashlib.sha256(normalize_content(text).encode('utf-8')).hexdigest()
+
+
+def make_cache_key(task_type, model, content, prompt_version, context=''):
+    """
+    Builds the cache key for a response. `context` covers any other prompt
+    input that changes the answer (e.g. the list of available tags).
+    """
+    digest = content_hash(f"{content}\x1f{context}" if context else content)
+    return f"ai_resp:v{CACHE_KEY_VERSION}:{task_type}:{model}:p{prompt_version}:{digest}"
+
+
+def _cache():
+    return caches[RESPONSE_CACHE_ALIAS]
+
+
+def is_enabled():
+    return getattr(settings, 'AI_RESPONSE_CACHE_ENABLED', True)
+
+
+def get_cached_response(key):
+    """Returns the cached response for `key`, or None, recording a hit or miss."""
+    if not is_enabled():
+        return None
+    try:
+        value = _cache().get(key)
+    except Exception as e:
+        logger.warning(f"AI response cache lookup failed for {key}: {e}")
+        return None
+    incr_counter('response_cache.hits' if value is not None else 'response_cache.misses')
+    return value
+
+
+def set_cached_response(key, value):
+    """
+    Stores a successful response. Responses larger than
+    AI_RESPONSE_CACHE_MAX_VALUE_BYTES are not cached.
+    """
+    if not is_enabled() or not value:
+        return False
+    max_bytes = getattr(settings, 'AI_RESPONSE_CACHE_MAX_VALUE_BYTES', 16 * 1024)
+    if len(value.encode('utf-8')) > max_bytes:
+        logger.debug(f"Not caching oversized AI response for {key}.")
+        return False
+    try:
+        _cache().set(key, value, timeout=getattr(settings, 'AI_RESPONSE_CACHE_TTL', 60 * 60 * 24 * 7))
+    except Exception as e:
+        logger.warning(f"AI response cache store failed for {key}: {e}")
+        return False
+    incr_counter('response_cache.stores')
+    return True
+
+
+def get_cache_stats():
+    """Returns hit/miss counters and the resulting hit ratio."""
+    from .metrics import get_counters
+    counters = get_counters(['response_cache.hits', 'response_cache.misses', 'response_cache.stores'])
+    lookups = counters['response_cache.hits'] + counters['response_cache.misses']
+    counters['response_cache.hit_ratio'] = round(counters['response_cache.hits'] / lookups, 4) if lookups else 0.0
+    return counters
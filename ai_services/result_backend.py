@@ -0,0 +1,164 @@
+# ai_services/result_backend.py
+
+"""
+Celery result backend policy.
+
+The per-entry AI tasks record their outcome on the entry and run with
+`ignore_result`, so only the tasks whose return value is read (period
+insights, life suggestions and their chord parts) store results. Those are
+polled once by the dashboard and then memoized in the result cache (see
+result_cache.py), so they are kept for the task's `result_ttl` seconds rather
+than the backend-wide CELERY_RESULT_EXPIRES.
+
+CompactRedisBackend is the Redis backend with three additions: results of
+tasks with a `result_ttl` expire after it, payloads of at least
+AI_RESULT_COMPRESSION_MIN_BYTES are zlib-compressed, and every result records
+the task name, so `sweep_results` and `result_memory_report` (the
+ai_result_report command) can tell results apart without enabling
+`result_extended`.
+"""
+import logging
+import zlib
+
+from celery import states
+from celery.backends.redis import RedisBackend
+from kombu.utils.encoding import str_to_bytes
+
+logger = logging.getLogger(__name__)
+
+# Compressed payloads start with this marker; JSON payloads never do.
+COMPRESSED_PREFIX = b'zlib:'
+TASK_META_PATTERN = 'celery-task-meta-*'
+UNNAMED = '(unnamed)'
+
+
+def _compression_min_bytes():
+    from django.conf import settings
+    return getattr(settings, 'AI_RESULT_COMPRESSION_MIN_BYTES', 1024)
+
+
+class CompactRedisBackend(RedisBackend):
+    """Redis result backend with per-task result TTLs and compression of large payloads."""
+
+    def encode(self, data):
+        payload = super().encode(data)
+        min_bytes = _compression_min_bytes()
+        if min_bytes and len(payload) >= min_bytes:
+            return COMPRESSED_PREFIX + zlib.compress(str_to_bytes(payload))
+        return payload
+
+    def decode(self, payload):
+        if isinstance(payload, bytes) and payload.startswith(COMPRESSED_PREFIX):
+            payload = zlib.decompress(payload[len(COMPRESSED_PREFIX):])
+        return super().decode(payload)
+
+    def _get_result_meta(self, result, state, traceback, request, format_date=True, encode=False):
+        meta = super()._get_result_meta(result, state, traceback, request, format_date=format_date, encode=encode)
+        if request is not None and not meta.get('name'):
+            meta['name'] = getattr(request, 'task', None)
+        return meta
+
+    def _store_result(self, task_id, result, state, traceback=None, request=None, **kwargs):
+        result = super()._store_result(task_id, result, state, traceback=traceback, request=request, **kwargs)
+        ttl = self.result_ttl(getattr(request, 'task', None))
+        if ttl and state in states.READY_STATES:
+            self.client.expire(self.get_key_for_task(task_id), ttl)
+        return result
+
+    def result_ttl(self, task_name):
+        """The task's own result TTL, if shorter than the backend-wide expiry."""
+        task = self.app.tasks.get(task_name) if task_name else None
+        ttl = getattr(task, 'result_ttl', None)
+        if ttl and (not self.expires or ttl < self.expires):
+            return ttl
+        return None
+
+
+def _task_name(backend, value):
+    try:
+        return backend.decode(value).get('name') or UNNAMED
+    except Exception:
+        return UNNAMED
+
+
+def sweep_results(backend, batch_size=500):
+    """
+    Bounds the lifetime of every stored task result. Results without an
+    expiry (stored before one was configured, or by other clients) are
+    deleted if their task ignores results, otherwise given the task's
+    result TTL or the backend-wide expiry. Returns counts of the keys
+    scanned, expired and deleted.
+    """
+    client = backend.client
+    counts = {'scanned': 0, 'expired': 0, 'deleted': 0}
+    batch = []
+
+    def sweep_batch(keys):
+        pipe = client.pipeline()
+        for key in keys:
+            pipe.ttl(key)
+        # -1: the key exists without an expiry.
+        unbounded = [key for key, ttl in zip(keys, pipe.execute()) if ttl == -1]
+        if not unbounded:
+            return
+        pipe = client.pipeline()
+        for key, value in zip(unbounded, client.mget(unbounded)):
+            name = _task_name(backend, value) if value else UNNAMED
+            task = backend.app.tasks.get(name)
+            if task is not None and task.ignore_result:
+                pipe.delete(key)
+                counts['deleted'] += 1
+            elif backend.result_ttl(name) or backend.expires:
+                pipe.expire(key, backend.result_ttl(name) or backend.expires)
+                counts['expired'] += 1
+        pipe.execute()
+
+    for key in client.scan_iter(match=TASK_META_PATTERN, count=batch_size):
+        counts['scanned'] += 1
+        batch.append(key)
+        if len(batch) >= batch_size:
+            sweep_batch(batch)
+            batch = []
+    if batch:
+        sweep_batch(batch)
+    logger.info(f"Result backend sweep: {counts['scanned']} results scanned, {counts['expired']} given an expiry, "
+                f"{counts['deleted']} deleted.")
+    return counts
+
+
+def result_memory_report(backend, batch_size=500, limit=None):
+    """
+    Memory used by stored task results, by task name: {name: {'keys': n,
+    'bytes': n, 'no_expiry': n}}. Sizes are Redis MEMORY USAGE figures.
+    At most `limit` keys are inspected.
+    """
+    client = backend.client
+    report = {}
+    batch = []
+
+    def measure(keys):
+        pipe = client.pipeline()
+        for key in keys:
+            pipe.memory_usage(key)
+            pipe.ttl(key)
+        sizes = pipe.execute()
+        for key, value, size, ttl in zip(keys, client.mget(keys), sizes[0::2], sizes[1::2]):
+            if value is None:
+                continue
+            row = report.setdefault(_task_name(backend, value), {'keys': 0, 'bytes': 0, 'no_expiry': 0})
+            row['keys'] += 1
+            row['bytes'] += size or 0
+            row['no_expiry'] += ttl == -1
+
+    inspected = 0
+    for key in client.scan_iter(match=TASK_META_PATTERN, count=batch_size):
+        batch.append(key)
+        inspected += 1
+        if len(batch) >= batch_size or (limit and inspected >= limit):
+            measure(batch)
+            batch = []
+        if limit and inspected >= limit:
+            break
+    if batch:
+        measure(batch)
+    return report
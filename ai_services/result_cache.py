@@ -0,0 +1,121 @@
+# ai_services/result_cache.py
+
+"""
+Memoized insights and suggestions results.
+
+Results are keyed on the user, the request (period, or the insights the
+suggestions are built from) and the user's "journal version", a per-user
+number bumped on every entry write. A repeated request over unchanged entries
+is therefore answered from the cache without starting a new AI task, and any
+entry change makes the old results unreachable without explicit deletes.
+
+The journal versions and the mapping from a running task to the key of its
+result are kept in the shared AI Redis (AI_REDIS_URL): an entry saved through
+one web process must invalidate the results every process serves, and the
+poll that stores a result may reach another process than the request that
+started the task. Without Redis, results are not memoized.
+"""
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .redis_client import get_redis
+from .response_cache import RESPONSE_CACHE_ALIAS
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_VERSION_KEY = 'ai_journal_version:{user_id}'
+PENDING_TASK_KEY = 'ai_result_pending:{task_id}'
+# A pending task's result is stored once it is polled; unpolled mappings expire after this.
+PENDING_TASK_TTL = 60 * 60
+
+
+def _cache():
+    return caches[RESPONSE_CACHE_ALIAS]
+
+
+def _result_ttl():
+    return getattr(settings, 'AI_RESULT_CACHE_TTL', 60 * 60 * 24)
+
+
+def get_journal_version(user_id):
+    """
+    Returns the user's current journal version, or None if Redis is
+    unavailable. A missing version (first use or expiry) is initialised from
+    the clock, so it can never match a version that results were stored
+    under before.
+    """
+    key = JOURNAL_VERSION_KEY.format(user_id=user_id)
+    try:
+        client = get_redis()
+        client.set(key, time.time_ns(), nx=True, ex=_result_ttl())
+        version = client.get(key)
+    except Exception as e:
+        logger.warning(f"Could not read journal version for user ID {user_id}: {e}")
+        return None
+    return int(version) if version is not None else None
+
+
+def bump_journal_version(user_id):
+    """Invalidates every memoized result of the user."""
+    key = JOURNAL_VERSION_KEY.format(user_id=user_id)
+    try:
+        client = get_redis()
+        if not client.set(key, time.time_ns(), nx=True, ex=_result_ttl()):
+            client.incr(key)
+    except Exception as e:
+        logger.warning(f"Could not bump journal version for user ID {user_id}: {e}")
+
+
+def insights_result_key(user_id, time_period):
+    version = get_journal_version(user_id)
+    return None if version is None else f"ai_result:v1:insights:{user_id}:{time_period}:{version}"
+
+
+def suggestions_result_key(user_id, insights_data):
+    version = get_journal_version(user_id)
+    if version is None:
+        return None
+    # Only the fields the suggestions are generated from; markers such as 'status' or 'cached' are ignored.
+    relevant = {field: insights_data.get(field) for field in ('highlights', 'challenges')}
+    digest = hashlib.sha256(json.dumps(relevant, sort_keys=True).encode('utf-8')).hexdigest()
+    return f"ai_result:v1:suggestions:{user_id}:{digest}:{version}"
+
+
+def get_cached_result(key):
+    if not key:
+        return None
+    try:
+        return _cache().get(key)
+    except Exception as e:
+        logger.warning(f"AI result cache read failed: {e}")
+        return None
+
+
+def remember_pending_task(task_id, key):
+    """Records that the result of `task_id` should be stored under `key` once it succeeds."""
+    if not key:
+        return
+    try:
+        get_redis().set(PENDING_TASK_KEY.format(task_id=task_id), key, ex=PENDING_TASK_TTL)
+    except Exception as e:
+        logger.warning(f"Could not record pending AI task {task_id}: {e}")
+
+
+def store_task_result(task_id, result):
+    """Stores a successful task result under the key recorded when the task was started."""
+    if not isinstance(result, dict) or 'error' in result:
+        return
+    pending_key = PENDING_TASK_KEY.format(task_id=task_id)
+    try:
+        client = get_redis()
+        key = client.get(pending_key)
+        if key:
+            _cache().set(key.decode('utf-8'), result, timeout=_result_ttl())
+            client.delete(pending_key)
+    except Exception as e:
+        logger.warning(f"Could not store result of AI task {task_id}: {e}")
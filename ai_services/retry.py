@@ -0,0 +1,76 @@
+# ai_services/retry.py
+
+"""
+Shared retry policy for AI tasks: only transient provider failures are
+retried, using exponential backoff with full jitter and honoring the
+provider's Retry-After header when it sends one.
+"""
+import datetime
+import logging
+import random
+
+from django.conf import settings
+from django.utils.http import parse_http_date_safe
+
+logger = logging.getLogger(__name__)
+
+
+class RetryableAIError(Exception):
+    """
+    A transient provider failure (timeout, connection error, HTTP 429 or 5xx)
+    worth retrying. `retry_after` is the provider-requested delay in seconds.
+    """
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_retryable_status(status_code):
+    return status_code == 429 or status_code >= 500
+
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header (delay in seconds or an HTTP date) into a
+    number of seconds, or None if it is missing or malformed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    timestamp = parse_http_date_safe(value)
+    if timestamp is None:
+        return None
+    now = datetime.datetime.now(datetime.timezone.utc).timestamp()
+    return max(0, int(timestamp - now))
+
+
+def compute_backoff(attempt, retry_after=None):
+    """
+    Returns the delay in seconds before retry number `attempt` (0-based).
+
+    Uses "full jitter": a uniform random delay between 0 and the capped
+    exponential bound, so retries from many tasks do not arrive in waves.
+    A provider-supplied Retry-After is treated as a minimum.
+    """
+    base = getattr(settings, 'AI_RETRY_BACKOFF_BASE', 10)
+    cap = getattr(settings, 'AI_RETRY_BACKOFF_MAX', 600)
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return max(1, int(round(delay)))
+
+
+def retry_or_give_up(task, exc, entry_id, task_label):
+    """
+    Schedules a retry of `task` with backoff if it has attempts left, by
+    raising Celery's Retry exception. Otherwise logs and returns so that the
+    caller stores its fallback result.
+    """
+    if task.request.retries < task.max_retries:
+        countdown = compute_backoff(task.request.retries, exc.retry_after)
+        logger.warning(f"Retrying {task_label} for entry {entry_id} in {countdown}s "
+                       f"(attempt {task.request.retries + 1}/{task.max_retries}): {exc}")
+        raise task.retry(exc=exc, countdown=countdown)
+    logger.error(f"Giving up on {task_label} for entry {entry_id} after {task.max_retries} retries: {exc}. Using fallback.")
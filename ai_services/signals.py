@@ -0,0 +1,41 @@
+# ai_services/signals.py
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from journal.models import JournalEntry
+from .mood_rollups import refresh_entry_day
+from .period_summaries import mark_stale
+from .result_cache import bump_journal_version
+
+
+@receiver(post_save, sender=JournalEntry)
+def invalidate_period_summaries_on_save(sender, instance, update_fields=None, **kwargs):
+    """
+    Marks the summaries of the entry's week and month stale and invalidates
+    the user's memoized insights. Saves that only touch AI or bookkeeping
+    fields (not the content) leave both valid.
+    """
+    if update_fields is not None and not {'content', 'title', 'created_at'} & set(update_fields):
+        return
+    mark_stale(instance.user_id, instance.created_at)
+    bump_journal_version(instance.user_id)
+
+
+@receiver(post_delete, sender=JournalEntry)
+def invalidate_period_summaries_on_delete(sender, instance, **kwargs):
+    mark_stale(instance.user_id, instance.created_at)
+    bump_journal_version(instance.user_id)
+
+
+@receiver(post_save, sender=JournalEntry)
+def refresh_mood_rollup_on_save(sender, instance, update_fields=None, **kwargs):
+    """Recomputes the user's mood rollup of the entry's day when its mood may have changed."""
+    if update_fields is not None and not {'mood', 'created_at'} & set(update_fields):
+        return
+    refresh_entry_day(instance.user_id, instance.created_at)
+
+
+@receiver(post_delete, sender=JournalEntry)
+def refresh_mood_rollup_on_delete(sender, instance, **kwargs):
+    refresh_entry_day(instance.user_id, instance.created_at)
@@ -0,0 +1,27 @@
+# ai_services/task_status.py
+
+"""
+Per-task AI status of journal entries, as reported to the progress modal and
+the entry badges. Tasks record their terminal outcome in the entry row
+(`ai_*_status`), so statuses come from the database: DISABLED_BY_USER when
+the user turned the feature off, SUCCESS/FALLBACK/FAILURE for a recorded
+outcome, SUCCESS for parts marked processed without a task (e.g. a mood the
+user chose), otherwise PENDING. The entry tasks store no result of their
+own, so the Celery result backend is never consulted.
+"""
+TASK_PARTS = ('quote', 'mood', 'tags')
+OUTCOME_STATUSES = {'success': 'SUCCESS', 'fallback': 'FALLBACK', 'failure': 'FAILURE'}
+FINAL_STATUSES = ('SUCCESS', 'FALLBACK', 'FAILURE', 'DISABLED_BY_USER')
+
+
+def part_status(enabled, processed, outcome='pending'):
+    """Status of one part (quote, mood or tags) of an entry."""
+    if not enabled:
+        return 'DISABLED_BY_USER'
+    if outcome in OUTCOME_STATUSES:
+        return OUTCOME_STATUSES[outcome]
+    return 'SUCCESS' if processed else 'PENDING'
+
+
+def all_done(task_statuses):
+    return all(task_statuses[f'{part}_status'] in FINAL_STATUSES for part in TASK_PARTS)
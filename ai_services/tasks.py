@@ -4,12 +4,27 @@ import json
 import logging
 import datetime
 import re
-from celery import shared_task
+import time
+from celery import Task, shared_task
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import Length
 from django.utils import timezone
 from django.utils.translation import gettext as _
 from dotenv import load_dotenv
 
+from .http_client import get_http_session, get_request_timeout
+from .response_cache import make_cache_key, get_cached_response, set_cached_response
+from .rate_limit import provider_capacity, estimate_tokens
+from .retry import RetryableAIError, is_retryable_status, parse_retry_after, retry_or_give_up
+from .tokens import CHARS_PER_TOKEN, count_tokens, fit_sections, get_token_budget, record_usage, truncate_to_tokens, usage_from_response
+from . import circuit_breaker
+from .idempotency import is_current, release_entry_task, update_if_current
+from .progress import publish_entry_progress
+from .models import PeriodSummary
+from .period_summaries import granularity_for_period, window_bounds, windows_with_entries
+
 # Load environment variables
 env_path = os.path.join(settings.BASE_DIR, '.env')
 if os.path.exists(env_path):
@@ -18,19 +33,23 @@ if os.path.exists(env_path):
 logger = logging.getLogger(__name__)
 
 # Constants
-OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_API_BASE_URL = getattr(settings, 'OPENROUTER_API_BASE_URL', "https://openrouter.ai/api/v1")
+OPENROUTER_API_URL = f"{OPENROUTER_API_BASE_URL.rstrip('/')}/chat/completions"
 AI_MODEL_FOR_ALL_TASKS = getattr(settings, 'AI_MODEL_FOR_JOURNAL_ANALYSIS', "openai/gpt-3.5-turbo")
-
-def call_openrouter_api(prompt_text, task_name, max_tokens=250, temperature=0.6, response_format=None, entry_id=None):
-    """
-    A robust helper function to make API calls to the OpenRouter service.
-    Handles authentication, request formatting, and error logging.
-    """
-    api_key = os.getenv('OPENROUTER_API_KEY')
-    if not api_key:
-        logger.error(f"FATAL: OPENROUTER_API_KEY not found. Aborting {task_name} for entry ID {entry_id}.")
-        return None
-
+# Result TTL of tasks whose result is polled once and then memoized (see result_backend.py).
+POLL_RESULT_TTL = getattr(settings, 'AI_POLL_RESULT_TTL', 60 * 60)
+
+# Bump a task's version whenever its prompt wording changes, so cached
+# responses produced by the old prompt are no longer served.
+PROMPT_VERSIONS = {
+    'quote_generation': 2,
+    'mood_detection': 2,
+    'tag_suggestion': 2,
+    'entry_analysis': 2,
+}
+
+def build_openrouter_request(api_key, prompt_text, max_tokens, temperature, response_format=None):
+    """Returns the (payload, headers) pair for a chat-completions request."""
     payload = {
         "model": AI_MODEL_FOR_ALL_TASKS,
         "messages": [{"role": "user", "content": prompt_text}],
@@ -46,203 +65,687 @@ def call_openrouter_api(prompt_text, task_name, max_tokens=250, temperature=0.6,
         "HTTP-Referer": getattr(settings, 'YOUR_SITE_URL', 'http://localhost:8000'),
         "X-Title": getattr(settings, 'YOUR_SITE_NAME', 'LifeLedger'),
     }
+    return payload, headers
+
+
+def extract_response_content(response_data, response_format=None):
+    """Returns the stripped message content of a chat-completions response, or None."""
+    if response_data.get("choices") and len(response_data["choices"]) > 0:
+        message = response_data["choices"][0].get("message", {})
+        content = message.get("content")
+        if content:
+            # If JSON format was requested, try to strip markdown fences
+            if response_format and response_format.get("type") == "json_object":
+                return content.strip().lstrip("```json").rstrip("```").strip()
+            return content.strip()
+    return None
+
+
+def call_openrouter_api(prompt_text, task_name, max_tokens=250, temperature=0.6, response_format=None, entry_id=None,
+                        raise_on_retryable=False, user_id=None):
+    """
+    A robust helper function to make API calls to the OpenRouter service.
+    Handles authentication, request formatting, and error logging.
+
+    While the provider circuit breaker is open, returns None immediately so
+    callers fall back without waiting on a degraded provider. Otherwise each
+    call first waits for shared provider capacity (see rate_limit.py).
+
+    Failures return None, except that with `raise_on_retryable=True` transient
+    ones (timeouts, connection errors, no rate-limit capacity, HTTP 429/5xx)
+    raise RetryableAIError so the calling task can retry with backoff.
+
+    Token usage is metered against `user_id`'s daily quota (see quotas.py).
+    """
+    api_key = os.getenv('OPENROUTER_API_KEY')
+    if not api_key:
+        logger.error(f"FATAL: OPENROUTER_API_KEY not found. Aborting {task_name} for entry ID {entry_id}.")
+        return None
+
+    payload, headers = build_openrouter_request(api_key, prompt_text, max_tokens, temperature, response_format)
 
     log_identifier = f"entry ID {entry_id}" if entry_id else "a general request"
+    permit = circuit_breaker.allow_request()
+    if not permit:
+        logger.warning(f"Circuit breaker open; skipping {task_name} request for {log_identifier}.")
+        return None
+
     try:
         logger.info(f"Requesting {task_name} from OpenRouter for {log_identifier}. Model: {payload['model']}.")
-        response = requests.post(OPENROUTER_API_URL, headers=headers, data=json.dumps(payload), timeout=90)
+        with provider_capacity(payload['model'], estimate_tokens(prompt_text, max_tokens)):
+            started_at = time.monotonic()
+            try:
+                response = get_http_session().post(
+                    OPENROUTER_API_URL, headers=headers, data=json.dumps(payload), timeout=get_request_timeout()
+                )
+            except requests.exceptions.RequestException:
+                circuit_breaker.record_result(False, time.monotonic() - started_at, permit=permit)
+                raise
+            # Throttling and server errors count against the provider; other
+            # client errors are our own fault and say nothing about its health.
+            circuit_breaker.record_result(
+                response.status_code < 500 and response.status_code != 429, time.monotonic() - started_at, permit=permit
+            )
         response.raise_for_status()
         
         response_data = response.json()
         logger.debug(f"OpenRouter Raw Response for {task_name} ({log_identifier}): {json.dumps(response_data, indent=2)}")
 
-        if response_data.get("choices") and len(response_data["choices"]) > 0:
-            message = response_data["choices"][0].get("message", {})
-            content = message.get("content")
-            if content:
-                # If JSON format was requested, try to strip markdown fences
-                if response_format and response_format.get("type") == "json_object":
-                    return content.strip().lstrip("```json").rstrip("```").strip()
-                return content.strip()
+        content = extract_response_content(response_data, response_format)
+        prompt_tokens, completion_tokens = usage_from_response(response_data, prompt_text, content)
+        record_usage(task_name, prompt_tokens, completion_tokens, user_id=user_id)
+        logger.info(f"{task_name} ({log_identifier}) used {prompt_tokens} prompt and {completion_tokens} completion tokens.")
+        if content:
+            return content
         
         error_detail = response_data.get("error", {}).get("message", "No 'choices' or 'content' in API response.")
         logger.warning(f"Unexpected OpenRouter response for {task_name} ({log_identifier}): {error_detail}")
         return None
         
-    except requests.exceptions.Timeout:
-        logger.error(f"Timeout during OpenRouter API request for {task_name} ({log_identifier}).")
+    except RetryableAIError as e:
+        logger.warning(f"No provider capacity for {task_name} ({log_identifier}): {e}")
+        if raise_on_retryable:
+            raise
+    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+        logger.error(f"Timeout or connection error during OpenRouter API request for {task_name} ({log_identifier}): {e}")
+        if raise_on_retryable:
+            raise RetryableAIError(f"{type(e).__name__} calling OpenRouter") from e
     except requests.exceptions.HTTPError as http_err:
         error_text = http_err.response.text[:200] if hasattr(http_err.response, 'text') else "Unknown HTTP Error"
-        logger.error(f"OpenRouter API HTTPError for {task_name} ({log_identifier}): {http_err.response.status_code} - {error_text}")
+        status_code = http_err.response.status_code
+        logger.error(f"OpenRouter API HTTPError for {task_name} ({log_identifier}): {status_code} - {error_text}")
+        if raise_on_retryable and is_retryable_status(status_code):
+            raise RetryableAIError(
+                f"OpenRouter returned HTTP {status_code}",
+                retry_after=parse_retry_after(http_err.response.headers.get('Retry-After')),
+            ) from http_err
     except Exception as e:
         logger.error(f"Unexpected error calling OpenRouter API for {task_name} ({log_identifier}): {e}", exc_info=True)
+    finally:
+        # A probe that never reached the provider (e.g. no rate limit capacity) reported no outcome.
+        circuit_breaker.release_probe(permit)
     
     return None
 
-@shared_task(bind=True, max_retries=3, default_retry_delay=60 * 2, acks_late=True)
-def generate_quote_for_entry_task(self, journal_entry_id):
+def call_openrouter_api_cached(prompt_text, task_name, cache_content, cache_context='', **kwargs):
+    """
+    Wraps call_openrouter_api with the content-hash response cache.
+    `cache_content` is the entry text the prompt was built from; `cache_context`
+    holds any other prompt input that affects the answer. Only successful
+    responses are cached.
+    """
+    cache_key = make_cache_key(
+        task_name, AI_MODEL_FOR_ALL_TASKS, cache_content, PROMPT_VERSIONS.get(task_name, 1), cache_context
+    )
+    cached_response = get_cached_response(cache_key)
+    if cached_response is not None:
+        logger.info(f"Serving {task_name} for entry ID {kwargs.get('entry_id')} from the AI response cache.")
+        return cached_response
+
+    ai_response = call_openrouter_api(prompt_text, task_name, **kwargs)
+    if ai_response:
+        set_cached_response(cache_key, ai_response)
+    return ai_response
+
+
+# --- Per-entry prompt builders and response parsers ---
+# Shared by the individual entry tasks and the combined analyze_entry_task so
+# that both paths send the same instructions and validate results identically.
+
+def build_quote_prompt(content):
+    content_snippet = truncate_to_tokens(content, get_token_budget('quote_generation'))
+    return (
+        f"Analyze the following journal entry. Provide ONE single, short (1-2 sentences) quote from a well-known figure "
+        f"(e.g., author, philosopher, historical figure) that is highly relevant to the core themes. "
+        f"Format the response exactly as: \"Quote text.\" - Author's Name. "
+        f"If the entry is too short or vague, provide a general inspiring quote about personal growth.\n\n"
+        f"JOURNAL ENTRY:\n\"\"\"\n{content_snippet}\n\"\"\"\n\n"
+        f"INSPIRATIONAL QUOTE:"
+    )
+
+
+def parse_quote_response(ai_response):
+    """Returns the cleaned quote text, or None if the response is empty."""
+    if not ai_response:
+        return None
+    quote = ai_response.strip('" ')
+    return quote or None
+
+
+def get_valid_moods():
+    from journal.constants import MOOD_CHOICES
+    return [choice[0] for choice in MOOD_CHOICES]
+
+
+def build_mood_prompt(content):
+    content_snippet = truncate_to_tokens(content, get_token_budget('mood_detection'))
+    mood_options_str = ", ".join(get_valid_moods())
+    return (
+        f"You are an expert in sentiment analysis with a high degree of emotional intelligence. Your task is to identify the single, *underlying* primary emotion from a journal entry. "
+        f"The user might express frustration and happiness in the same sentence (e.g., 'I hate this bug, but I'm so happy I finally fixed it'). Your job is to determine the dominant, concluding emotion. "
+        f"Look for sarcasm, irony, and mixed signals. Prioritize the final feeling over initial complaints.\n\n"
+        f"From the list below, choose exactly ONE primary mood that best represents the entry's core feeling:\n"
+        f"[{mood_options_str}]\n\n"
+        f"JOURNAL ENTRY:\n\"\"\"\n{content_snippet}\n\"\"\"\n\n"
+        f"Your response MUST be a single word from the list, in lowercase. Do not add any explanation or punctuation.\n"
+        f"PRIMARY MOOD:"
+    )
+
+
+def parse_mood_response(ai_response):
+    """Returns a valid mood key from the AI response, or None if it is missing or unknown."""
+    if not ai_response or not ai_response.strip():
+        return None
+    potential_mood = ai_response.lower().strip().split()[0].strip('".')
+    return potential_mood if potential_mood in get_valid_moods() else None
+
+
+def build_tags_prompt(content, available_tags):
+    content_snippet = truncate_to_tokens(content, get_token_budget('tag_suggestion'))
+    tag_options_str = ", ".join(available_tags)
+    return (
+        f"You are a content classification expert. Your task is to analyze a journal entry and select the most relevant topics from a predefined list. "
+        f"From the list of available tags below, select up to 3 that best describe the main subjects of the entry. "
+        f"Your response must be a single, comma-separated list of words, using ONLY tags from the provided list. Do not create new tags or add any commentary.\n\n"
+        f"AVAILABLE TAGS:\n[{tag_options_str}]\n\n"
+        f"JOURNAL ENTRY:\n\"\"\"\n{content_snippet}\n\"\"\"\n\n"
+        f"Relevant Tags:"
+    )
+
+
+def parse_tags_response(raw_tags, available_tags):
+    """
+    Validates suggested tag names against the predefined tags.
+    `raw_tags` may be the comma-separated AI response or an already-split list.
+    Returns the set of canonical tag names that matched.
+    """
+    if not raw_tags:
+        return set()
+    if isinstance(raw_tags, str):
+        raw_tags = raw_tags.split(',')
+    cleaned = [str(tag).strip(' ".,') for tag in raw_tags if str(tag).strip()]
+    available_tags_map = {name.lower(): name for name in available_tags}
+    return {available_tags_map[t.lower()] for t in cleaned if t.lower() in available_tags_map}
+
+
+def _apply_tags(entry, valid_tag_names):
+    """Sets the validated tags on the entry, falling back to the 'General' tag. Returns the applied tag names."""
+    from journal.models import Tag
+    tags_to_add = list(Tag.objects.filter(name__in=valid_tag_names)) if valid_tag_names else []
+    if tags_to_add:
+        entry.tags.set(tags_to_add)
+        logger.info(f"Successfully applied tags {[t.name for t in tags_to_add]} to entry {entry.id}")
+    else:
+        logger.warning(f"No valid tags were identified by AI. Applying 'General' fallback for entry {entry.id}.")
+        general_tag, _created = Tag.objects.get_or_create(name__iexact='General', defaults={'name': 'General', 'emoji': '🗒️'})
+        entry.tags.set([general_tag])
+        tags_to_add = [general_tag]
+    return sorted(tag.name for tag in tags_to_add)
+
+
+def build_combined_analysis_prompt(content, include_quote=True, include_mood=True, available_tags=None):
+    """
+    Builds a single prompt asking for every requested enrichment at once.
+    The entry content is sent only once, truncated to the largest token budget
+    of the tasks it replaces.
+    """
+    budget = max(
+        get_token_budget('entry_analysis'),
+        get_token_budget('quote_generation') if include_quote else 0,
+        get_token_budget('mood_detection') if include_mood else 0,
+        get_token_budget('tag_suggestion') if available_tags else 0,
+    )
+    content_snippet = truncate_to_tokens(content, budget)
+
+    instructions = []
+    schema_fields = []
+    if include_quote:
+        instructions.append(
+            "\"quote\": ONE single, short (1-2 sentences) quote from a well-known figure (e.g., author, philosopher, "
+            "historical figure) that is highly relevant to the core themes, formatted exactly as: \\\"Quote text.\\\" - Author's Name. "
+            "If the entry is too short or vague, use a general inspiring quote about personal growth."
+        )
+        schema_fields.append('"quote": "..."')
+    if include_mood:
+        instructions.append(
+            f"\"mood\": the single, *underlying* primary emotion of the entry, chosen from [{', '.join(get_valid_moods())}], in lowercase. "
+            "Look for sarcasm, irony, and mixed signals, and prioritize the final feeling over initial complaints."
+        )
+        schema_fields.append('"mood": "..."')
+    if available_tags:
+        instructions.append(
+            f"\"tags\": up to 3 tags that best describe the main subjects of the entry, using ONLY tags from this list: "
+            f"[{', '.join(available_tags)}]. Do not create new tags."
+        )
+        schema_fields.append('"tags": ["..."]')
+
+    instructions_str = "\n".join(f"- {line}" for line in instructions)
+    return (
+        "You are an insightful journaling assistant with a high degree of emotional intelligence. "
+        "Analyze the following journal entry and provide these fields:\n"
+        f"{instructions_str}\n\n"
+        f"JOURNAL ENTRY:\n\"\"\"\n{content_snippet}\n\"\"\"\n\n"
+        f"Respond ONLY with a valid JSON object in the format {{{', '.join(schema_fields)}}}. "
+        "Do NOT add any introductory text, markdown, or explanations outside of the JSON."
+    )
+
+
+def parse_json_object(ai_response_str):
+    """Extracts and decodes the first JSON object found in an AI response string."""
+    json_match = re.search(r'\{.*\}', ai_response_str or '', re.DOTALL)
+    if not json_match:
+        raise ValueError("No valid JSON object found in AI response.")
+    return json.loads(json_match.group(0))
+
+
+def _outcome_fields(part, outcome):
+    """Columns recording the terminal outcome ('success', 'fallback' or 'failure') of an entry task."""
+    return {f'ai_{part}_status': outcome, f'ai_{part}_completed_at': timezone.now()}
+
+
+class EntryAITask(Task):
+    """
+    Base of the per-entry tasks. Failures are handled inside the tasks with
+    fallback results; if a task still raises, its parts are recorded as
+    'failure' so that status checks do not need the result backend.
+    """
+    entry_parts = ()
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        if not args:
+            return
+        parts = self.entry_parts or [part for part in ('quote', 'mood', 'tags') if kwargs.get(f'include_{part}', True)]
+        updates = {}
+        for part in parts:
+            updates.update(_outcome_fields(part, 'failure'))
+        try:
+            update_if_current(args[0], kwargs.get('content_hash'), **updates)
+        except Exception as e:
+            logger.error(f"Could not record the failure of task {task_id} for entry {args[0]}: {e}")
+        publish_entry_progress(args[0], **{part: {'status': 'failure'} for part in parts})
+
+
+@shared_task(bind=True, base=EntryAITask, entry_parts=('quote',), ignore_result=True, max_retries=3, acks_late=True)
+def generate_quote_for_entry_task(self, journal_entry_id, content_hash=None):
     """
     Celery task to generate an insightful and relevant quote for a specific journal entry.
+    `content_hash` identifies the content the task was queued for; results for
+    superseded content are discarded.
     """
     from journal.models import JournalEntry
     logger.info(f"Starting quote generation task for Entry ID: {journal_entry_id}")
     generated_quote_text = _("Could not generate a quote at this time.")
+    outcome = 'fallback'
     
     try:
         entry = JournalEntry.objects.get(pk=journal_entry_id)
-        content_snippet = (entry.content[:1000] + '...') if len(entry.content) > 1000 else entry.content
+        if not is_current(entry, content_hash):
+            logger.info(f"Skipping superseded quote generation task for entry {entry.id}: its content changed.")
+            release_entry_task(journal_entry_id, self.name, content_hash, self.request.id)
+            return
+        prompt = build_quote_prompt(entry.content)
         
-        prompt = (
-            f"Analyze the following journal entry. Provide ONE single, short (1-2 sentences) quote from a well-known figure "
-            f"(e.g., author, philosopher, historical figure) that is highly relevant to the core themes. "
-            f"Format the response exactly as: \"Quote text.\" - Author's Name. "
-            f"If the entry is too short or vague, provide a general inspiring quote about personal growth.\n\n"
-            f"JOURNAL ENTRY:\n\"\"\"\n{content_snippet}\n\"\"\"\n\n"
-            f"INSPIRATIONAL QUOTE:"
+        ai_response = call_openrouter_api_cached(
+            prompt, "quote_generation", entry.content, max_tokens=120, temperature=0.7, entry_id=entry.id, user_id=entry.user_id,
+            raise_on_retryable=True
         )
         
-        ai_response = call_openrouter_api(prompt, "quote_generation", max_tokens=120, temperature=0.7, entry_id=entry.id)
-        
-        if ai_response:
-            generated_quote_text = ai_response.strip('" ')
+        quote = parse_quote_response(ai_response)
+        if quote:
+            generated_quote_text = quote
+            outcome = 'success'
             logger.info(f"Successfully generated quote for entry {entry.id}: \"{generated_quote_text}\"")
         else:
             logger.warning(f"AI service did not return valid content for quote generation (entry {entry.id}).")
 
     except JournalEntry.DoesNotExist:
         logger.error(f"JournalEntry {journal_entry_id} not found for quote generation task.")
+        return
+    except RetryableAIError as exc:
+        retry_or_give_up(self, exc, journal_entry_id, "quote generation")
     except Exception as exc: 
-        logger.error(f"Retrying quote task for entry {journal_entry_id} due to unexpected error: {exc}", exc_info=True)
-        self.retry(exc=exc)
-    finally:
-        JournalEntry.objects.filter(pk=journal_entry_id).update(
-            ai_quote=generated_quote_text,
-            ai_quote_processed=True
-        )
-        logger.info(f"Quote generation task completed and status saved for entry ID: {journal_entry_id}")
-
-@shared_task(bind=True, max_retries=3, default_retry_delay=45, acks_late=True)
-def detect_mood_for_entry_task(self, journal_entry_id):
+        logger.error(f"Unexpected error in quote task for entry {journal_entry_id}: {exc}. Using fallback.", exc_info=True)
+
+    # Reached only when no retry is scheduled, so the result is final.
+    if update_if_current(
+        journal_entry_id, content_hash,
+        ai_quote=generated_quote_text,
+        ai_quote_processed=True,
+        ai_model=AI_MODEL_FOR_ALL_TASKS,
+        **_outcome_fields('quote', outcome),
+    ):
+        publish_entry_progress(journal_entry_id, quote={'ai_quote': generated_quote_text, 'status': outcome})
+    release_entry_task(journal_entry_id, self.name, content_hash, self.request.id)
+    logger.info(f"Quote generation task completed and status saved for entry ID: {journal_entry_id}")
+
+@shared_task(bind=True, base=EntryAITask, entry_parts=('mood',), ignore_result=True, max_retries=3, acks_late=True)
+def detect_mood_for_entry_task(self, journal_entry_id, content_hash=None):
     """
     Celery task to detect and set the primary mood of a journal entry using AI.
     This task is designed to understand nuance and sarcasm.
     """
     from journal.models import JournalEntry
-    from journal.constants import MOOD_CHOICES
     
     logger.info(f"Starting nuanced mood detection task for Entry ID: {journal_entry_id}")
+    detected_mood = 'neutral'  # Default fallback
+    outcome = 'fallback'
     
     try:
         entry = JournalEntry.objects.get(pk=journal_entry_id)
-        content_snippet = (entry.content[:1500] + '...') if len(entry.content) > 1500 else entry.content
-        valid_moods = [choice[0] for choice in MOOD_CHOICES]
-        mood_options_str = ", ".join(valid_moods)
-        
-        # --- REFINED PROMPT ---
-        prompt = (
-            f"You are an expert in sentiment analysis with a high degree of emotional intelligence. Your task is to identify the single, *underlying* primary emotion from a journal entry. "
-            f"The user might express frustration and happiness in the same sentence (e.g., 'I hate this bug, but I'm so happy I finally fixed it'). Your job is to determine the dominant, concluding emotion. "
-            f"Look for sarcasm, irony, and mixed signals. Prioritize the final feeling over initial complaints.\n\n"
-            f"From the list below, choose exactly ONE primary mood that best represents the entry's core feeling:\n"
-            f"[{mood_options_str}]\n\n"
-            f"JOURNAL ENTRY:\n\"\"\"\n{content_snippet}\n\"\"\"\n\n"
-            f"Your response MUST be a single word from the list, in lowercase. Do not add any explanation or punctuation.\n"
-            f"PRIMARY MOOD:"
-        )
+        if not is_current(entry, content_hash):
+            logger.info(f"Skipping superseded mood detection task for entry {entry.id}: its content changed.")
+            release_entry_task(journal_entry_id, self.name, content_hash, self.request.id)
+            return
+        prompt = build_mood_prompt(entry.content)
         
         # Increased temperature for more nuanced interpretation
-        ai_response = call_openrouter_api(prompt, "mood_detection", max_tokens=10, temperature=0.4, entry_id=entry.id)
+        ai_response = call_openrouter_api_cached(
+            prompt, "mood_detection", entry.content, cache_context=",".join(get_valid_moods()), max_tokens=10, temperature=0.4, entry_id=entry.id, user_id=entry.user_id,
+            raise_on_retryable=True
+        )
         
-        detected_mood = 'neutral'  # Default fallback
-        if ai_response:
-            potential_mood = ai_response.lower().strip().split()[0].strip('".')
-            if potential_mood in valid_moods:
-                detected_mood = potential_mood
-                logger.info(f"AI successfully detected mood as '{detected_mood}' for entry {entry.id}")
-            else:
-                logger.warning(f"AI returned an invalid mood ('{ai_response}'). Falling back to neutral for entry {entry.id}.")
+        parsed_mood = parse_mood_response(ai_response)
+        if parsed_mood:
+            detected_mood = parsed_mood
+            outcome = 'success'
+            logger.info(f"AI successfully detected mood as '{detected_mood}' for entry {entry.id}")
+        elif ai_response:
+            logger.warning(f"AI returned an invalid mood ('{ai_response}'). Falling back to neutral for entry {entry.id}.")
         else:
             logger.warning(f"AI did not return content for mood detection. Falling back to neutral for entry {entry.id}.")
-        
-        entry.mood = detected_mood
-        entry.save(update_fields=['mood'])
 
     except JournalEntry.DoesNotExist:
         logger.error(f"JournalEntry ID {journal_entry_id} not found for mood detection.")
+        return
+    except RetryableAIError as exc:
+        retry_or_give_up(self, exc, journal_entry_id, "mood detection")
     except Exception as e:
-        logger.error(f"Retrying mood task for entry {journal_entry_id} due to error: {e}", exc_info=True)
-        self.retry(exc=e)
-    finally:
-        JournalEntry.objects.filter(pk=journal_entry_id).update(ai_mood_processed=True)
-        logger.info(f"Mood detection task completed and status saved for entry ID: {journal_entry_id}")
+        logger.error(f"Unexpected error in mood task for entry {journal_entry_id}: {e}. Using fallback.", exc_info=True)
 
+    # Reached only when no retry is scheduled, so the result is final.
+    if update_if_current(journal_entry_id, content_hash, mood=detected_mood, ai_mood_processed=True,
+                         ai_model=AI_MODEL_FOR_ALL_TASKS, **_outcome_fields('mood', outcome)):
+        publish_entry_progress(journal_entry_id, mood={'mood': detected_mood, 'status': outcome})
+    release_entry_task(journal_entry_id, self.name, content_hash, self.request.id)
+    logger.info(f"Mood detection task completed and status saved for entry ID: {journal_entry_id}")
 
-@shared_task(bind=True, max_retries=3, default_retry_delay=50, acks_late=True)
-def suggest_tags_for_entry_task(self, journal_entry_id):
+
+@shared_task(bind=True, base=EntryAITask, entry_parts=('tags',), ignore_result=True, max_retries=3, acks_late=True)
+def suggest_tags_for_entry_task(self, journal_entry_id, content_hash=None):
     """
     Celery task to suggest and apply relevant tags for a journal entry from a predefined list.
     This task expects to be called only when tag suggestions are explicitly required.
     """
     from journal.models import JournalEntry, Tag
     logger.info(f"Starting tag suggestion task for Entry ID: {journal_entry_id}")
+    entry = None
+    available_tags = []
+    valid_tag_names = set()
     
     try:
         entry = JournalEntry.objects.get(pk=journal_entry_id)
+        if not is_current(entry, content_hash):
+            logger.info(f"Skipping superseded tag suggestion task for entry {entry.id}: its content changed.")
+            release_entry_task(journal_entry_id, self.name, content_hash, self.request.id)
+            return
         available_tags = list(Tag.objects.values_list('name', flat=True))
 
         if not available_tags:
             logger.warning(f"No predefined tags found. Cannot suggest tags for entry {entry.id}.")
         else:
-            tag_options_str = ", ".join(available_tags)
-            content_snippet = (entry.content[:2000] + '...') if len(entry.content) > 2000 else entry.content
+            prompt = build_tags_prompt(entry.content, available_tags)
             
-            prompt = (
-                f"You are a content classification expert. Your task is to analyze a journal entry and select the most relevant topics from a predefined list. "
-                f"From the list of available tags below, select up to 3 that best describe the main subjects of the entry. "
-                f"Your response must be a single, comma-separated list of words, using ONLY tags from the provided list. Do not create new tags or add any commentary.\n\n"
-                f"AVAILABLE TAGS:\n[{tag_options_str}]\n\n"
-                f"JOURNAL ENTRY:\n\"\"\"\n{content_snippet}\n\"\"\"\n\n"
-                f"Relevant Tags:"
+            ai_response = call_openrouter_api_cached(
+                prompt, "tag_suggestion", entry.content, cache_context=",".join(sorted(available_tags)),
+                max_tokens=50, temperature=0.3, entry_id=entry.id, user_id=entry.user_id, raise_on_retryable=True
             )
             
-            ai_response = call_openrouter_api(prompt, "tag_suggestion", max_tokens=50, temperature=0.3, entry_id=entry.id)
-            
-            tags_to_add_qs = None
-            if ai_response:
-                available_tags_map = {name.lower(): name for name in available_tags}
-                raw_tags = [tag.strip(' ".,') for tag in ai_response.split(',') if tag.strip()]
-                
-                valid_tag_names = {available_tags_map[t.lower()] for t in raw_tags if t.lower() in available_tags_map}
-                
-                logger.info(f"AI suggested: {raw_tags}. Validated against existing tags: {list(valid_tag_names)}")
-                
-                if valid_tag_names:
-                    tags_to_add_qs = Tag.objects.filter(name__in=valid_tag_names)
-            
-            if tags_to_add_qs:
-                entry.tags.set(tags_to_add_qs)
-                logger.info(f"Successfully applied tags {[t.name for t in tags_to_add_qs]} to entry {entry.id}")
-            else:
-                logger.warning(f"No valid tags were identified by AI. Applying 'General' fallback for entry {entry.id}.")
-                general_tag, _ = Tag.objects.get_or_create(name__iexact='General', defaults={'name': 'General', 'emoji': '🗒️'})
-                entry.tags.set([general_tag])
+            valid_tag_names = parse_tags_response(ai_response, available_tags)
+            logger.info(f"AI suggested: {ai_response!r}. Validated against existing tags: {list(valid_tag_names)}")
 
     except JournalEntry.DoesNotExist:
         logger.error(f"JournalEntry ID {journal_entry_id} not found for tag suggestion.")
+        return
+    except RetryableAIError as exc:
+        retry_or_give_up(self, exc, journal_entry_id, "tag suggestion")
     except Exception as e:
-        logger.error(f"Retrying tag task for entry {journal_entry_id} due to error: {e}", exc_info=True)
-        self.retry(exc=e)
-    finally:
-        JournalEntry.objects.filter(pk=journal_entry_id).update(ai_tags_processed=True)
-        logger.info(f"Tag suggestion task completed and status saved for entry ID: {journal_entry_id}")
+        logger.error(f"Unexpected error in tag task for entry {journal_entry_id}: {e}. Using fallback.", exc_info=True)
+
+    # Reached only when no retry is scheduled, so the result is final. The tags are
+    # only set if the conditional update shows the content is unchanged.
+    outcome = 'success' if valid_tag_names else 'fallback'
+    tag_update = {'status': outcome}
+    with transaction.atomic():
+        written = update_if_current(journal_entry_id, content_hash, ai_tags_processed=True, ai_model=AI_MODEL_FOR_ALL_TASKS,
+                                    **_outcome_fields('tags', outcome))
+        if written and entry is not None and available_tags:
+            tag_update['tags'] = _apply_tags(entry, valid_tag_names)
+    if written:
+        publish_entry_progress(journal_entry_id, tags=tag_update)
+    release_entry_task(journal_entry_id, self.name, content_hash, self.request.id)
+    logger.info(f"Tag suggestion task completed and status saved for entry ID: {journal_entry_id}")
+
+
+@shared_task(bind=True, base=EntryAITask, ignore_result=True, max_retries=3, acks_late=True)
+def analyze_entry_task(self, journal_entry_id, include_quote=True, include_mood=True, include_tags=True, content_hash=None):
+    """
+    Celery task that generates the quote, mood and tags of a journal entry in a
+    single structured AI call, replacing the three individual entry tasks.
+
+    Only the requested parts are asked for. Results and the matching
+    `ai_*_processed` flags are written back in one UPDATE, conditional on the
+    content being unchanged since dispatch (tags, being a many-to-many
+    relation, are set separately in the same transaction).
+    """
+    from journal.models import JournalEntry, Tag
+    logger.info(f"Starting combined analysis task for Entry ID: {journal_entry_id} "
+                f"(quote={include_quote}, mood={include_mood}, tags={include_tags})")
+
+    updates = {}
+    if include_quote:
+        updates.update(ai_quote=_("Could not generate a quote at this time."), ai_quote_processed=True)
+    if include_mood:
+        updates.update(mood='neutral', ai_mood_processed=True)
+    if include_tags:
+        updates.update(ai_tags_processed=True)
+    outcomes = {part: 'fallback' for part, included in
+                (('quote', include_quote), ('mood', include_mood), ('tags', include_tags)) if included}
+
+    entry = None
+    available_tags = []
+    valid_tag_names = set()
+
+    try:
+        entry = JournalEntry.objects.get(pk=journal_entry_id)
+        if not is_current(entry, content_hash):
+            logger.info(f"Skipping superseded combined analysis task for entry {entry.id}: its content changed.")
+            release_entry_task(journal_entry_id, self.name, content_hash, self.request.id)
+            return
+        available_tags = list(Tag.objects.values_list('name', flat=True)) if include_tags else []
+        if include_tags and not available_tags:
+            logger.warning(f"No predefined tags found. Cannot suggest tags for entry {entry.id}.")
+
+        if include_quote or include_mood or available_tags:
+            prompt = build_combined_analysis_prompt(
+                entry.content, include_quote=include_quote, include_mood=include_mood, available_tags=available_tags
+            )
+            moods = ','.join(get_valid_moods()) if include_mood else ''
+            cache_context = f"quote={include_quote};mood={include_mood}:{moods};tags={','.join(sorted(available_tags))}"
+            ai_response_str = call_openrouter_api_cached(
+                prompt, "entry_analysis", entry.content, cache_context=cache_context,
+                max_tokens=200, temperature=0.5, response_format={"type": "json_object"}, entry_id=entry.id, user_id=entry.user_id,
+                raise_on_retryable=True
+            )
+
+            analysis = {}
+            if ai_response_str:
+                try:
+                    analysis = parse_json_object(ai_response_str)
+                except (json.JSONDecodeError, ValueError) as e:
+                    logger.warning(f"Failed to parse combined analysis JSON for entry {entry.id}: {e}. Using fallbacks.")
+            else:
+                logger.warning(f"AI did not return content for combined analysis (entry {entry.id}). Using fallbacks.")
+
+            if include_quote:
+                quote = parse_quote_response(str(analysis.get('quote') or ''))
+                if quote:
+                    updates['ai_quote'] = quote
+                    outcomes['quote'] = 'success'
+            if include_mood:
+                detected_mood = parse_mood_response(str(analysis.get('mood') or ''))
+                if detected_mood:
+                    updates['mood'] = detected_mood
+                    outcomes['mood'] = 'success'
+                else:
+                    logger.warning(f"AI returned no valid mood ({analysis.get('mood')!r}). Falling back to neutral for entry {entry.id}.")
+            if available_tags:
+                valid_tag_names = parse_tags_response(analysis.get('tags'), available_tags)
+                if valid_tag_names:
+                    outcomes['tags'] = 'success'
+
+        logger.info(f"Combined analysis produced for entry {entry.id}: {updates}")
+
+    except JournalEntry.DoesNotExist:
+        logger.error(f"JournalEntry ID {journal_entry_id} not found for combined analysis.")
+        return
+    except RetryableAIError as exc:
+        retry_or_give_up(self, exc, journal_entry_id, "combined analysis")
+    except Exception as e:
+        logger.error(f"Unexpected error in combined analysis for entry {journal_entry_id}: {e}. Using fallbacks.", exc_info=True)
+
+    # Reached only when no retry is scheduled, so the results are final.
+    for part, outcome in outcomes.items():
+        updates.update(_outcome_fields(part, outcome))
+    tag_update = {'status': outcomes.get('tags')}
+    with transaction.atomic():
+        written = not updates or update_if_current(journal_entry_id, content_hash, ai_model=AI_MODEL_FOR_ALL_TASKS, **updates)
+        if written and entry is not None and available_tags:
+            tag_update['tags'] = _apply_tags(entry, valid_tag_names)
+    if written and updates:
+        parts = {}
+        if include_quote:
+            parts['quote'] = {'ai_quote': updates['ai_quote'], 'status': outcomes['quote']}
+        if include_mood:
+            parts['mood'] = {'mood': updates['mood'], 'status': outcomes['mood']}
+        if include_tags:
+            parts['tags'] = tag_update
+        publish_entry_progress(journal_entry_id, **parts)
+    release_entry_task(journal_entry_id, self.name, content_hash, self.request.id)
+    logger.info(f"Combined analysis task completed and status saved for entry ID: {journal_entry_id}")
+
+
+# --- Period insights ---
+# A period whose entries fit in the 'collective_insights' token budget is
+# analysed in one call. Longer periods are built from persisted weekly or
+# monthly summaries (models.PeriodSummary): missing or stale ones are
+# summarized in parallel (a Celery chord) and all of them are then merged
+# into the final insights.
+
+INSIGHTS_KEYS = ('highlights', 'challenges', 'key_themes')
+
+
+def build_insights_prompt(entries_text):
+    return (
+        "You are an insightful life coach. Analyze this collection of journal entries. "
+        "Summarize the key points into three categories: 'highlights', 'challenges', and 'key_themes'. "
+        "List 2-4 points for each. If a category is empty, return an empty list for it. "
+        "Respond ONLY with a valid JSON object.\n\n"
+        f"Journal Entries:\n\"\"\"\n{entries_text}\n\"\"\""
+    )
+
+
+def build_insights_reduce_prompt(summaries_text):
+    return (
+        "You are an insightful life coach. Below are summaries of consecutive parts of one person's journal, "
+        "each with 'highlights', 'challenges', and 'key_themes'. Merge them into one overall summary with the same "
+        "three categories, keeping the most significant and recurring points. "
+        "List 2-4 points for each. If a category is empty, return an empty list for it. "
+        "Respond ONLY with a valid JSON object.\n\n"
+        f"Partial Summaries:\n\"\"\"\n{summaries_text}\n\"\"\""
+    )
+
+
+def parse_insights_response(ai_response_str):
+    """Returns the insights dict from an AI response, raising ValueError if it is unusable."""
+    insights_data = parse_json_object(ai_response_str)
+    if not all(k in insights_data for k in INSIGHTS_KEYS):
+        raise ValueError("AI response is missing required keys for insights.")
+    return insights_data
+
+
+def _format_insights_entries(entries, max_tokens):
+    """
+    Formats (created_at, content) pairs for an insights prompt, fitted into
+    `max_tokens`. Entries whose date header no longer fits are left out.
+    """
+    headers, contents = [], []
+    header_tokens = 0
+    for created_at, content in entries:
+        header = f"\n--- Entry from {timezone.localtime(created_at):%Y-%m-%d} ---\n"
+        cost = count_tokens(header) + 1
+        if header_tokens + cost > max_tokens:
+            logger.warning(f"Insights prompt budget of {max_tokens} tokens reached; later entries are left out.")
+            break
+        header_tokens += cost
+        headers.append(header)
+        contents.append(content)
+    # The date headers are kept whole, so only the remaining budget is shared by the contents.
+    sections = fit_sections(contents, max_tokens - header_tokens)
+    return "".join(f"{header}{section}\n" for header, section in zip(headers, sections))
+
+
+def _chunk_entries_by_budget(entries, max_tokens):
+    """
+    Splits (created_at, content) pairs, oldest first, into consecutive chunks
+    whose formatted prompt text fits in `max_tokens`. An entry too long on
+    its own gets a chunk to itself and is truncated when formatted.
+    """
+    chunks, current, current_tokens = [], [], 0
+    for created_at, content in entries:
+        cost = count_tokens(f"\n--- Entry from {timezone.localtime(created_at):%Y-%m-%d} ---\n{content}\n")
+        if current and current_tokens + cost > max_tokens:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append((created_at, content))
+        current_tokens += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _merge_insights_summaries(summaries, user_id):
+    """Reduces partial insights summaries into the final insights dict."""
+    if len(summaries) == 1:
+        return summaries[0]
+    sections = fit_sections(
+        [f"--- Part {i} ---\n{json.dumps(summary)}\n" for i, summary in enumerate(summaries, start=1)],
+        get_token_budget('insights_reduce'),
+    )
+    ai_response_str = call_openrouter_api(
+        build_insights_reduce_prompt("".join(sections)), "insights_reduce", max_tokens=1000, temperature=0.5,
+        response_format={"type": "json_object"}, entry_id=user_id, user_id=user_id
+    )
+    if not ai_response_str:
+        logger.error(f"Failed to get AI response for merging insights summaries (User ID: {user_id}).")
+        return {'error': 'AI service did not respond.'}
+    try:
+        return parse_insights_response(ai_response_str)
+    except (json.JSONDecodeError, ValueError) as e:
+        logger.error(f"Failed to parse merged insights JSON from AI (User ID: {user_id}): {e}", exc_info=True)
+        return {'error': 'Failed to process AI response.'}
 
 
-@shared_task(bind=True, name='ai_services.tasks.generate_insights_for_period_task')
+@shared_task(bind=True, result_ttl=POLL_RESULT_TTL, name='ai_services.tasks.generate_insights_for_period_task')
 def generate_insights_for_period_task(self, user_id, time_period):
     """
     Analyzes a user's journal entries over a specified period to extract
     key highlights, challenges, and recurring themes.
+
+    Periods too long for a single prompt are merged from weekly or monthly
+    PeriodSummary rollups; only missing or stale ones are (re)generated, in a
+    chord of summarize_period_window_task.
     """
+    from celery import chord
     from django.contrib.auth import get_user_model
     from journal.models import JournalEntry
     User = get_user_model()
@@ -263,54 +766,140 @@ def generate_insights_for_period_task(self, user_id, time_period):
         start_date = end_date - datetime.timedelta(days=30)
     elif time_period == 'last_90_days':
         start_date = end_date - datetime.timedelta(days=90)
+    elif time_period == 'last_365_days':
+        start_date = end_date - datetime.timedelta(days=365)
     
     entries_query = JournalEntry.objects.filter(user=user)
     if start_date:
         entries_query = entries_query.filter(created_at__gte=start_date)
     
-    entries = entries_query.order_by('created_at').only('created_at', 'content')
-    
-    if not entries.exists():
+    if not entries_query.exists():
         logger.warning(f"No entries found for user {user.username} in period {time_period}.")
         return {'highlights': [], 'challenges': [], 'key_themes': []}
 
-    combined_content = ""
-    for entry in entries:
-        combined_content += f"\n--- Entry from {entry.created_at.strftime('%Y-%m-%d')} ---\n{entry.content}\n"
-    
-    prompt = (
-        "You are an insightful life coach. Analyze this collection of journal entries. "
-        "Summarize the key points into three categories: 'highlights', 'challenges', and 'key_themes'. "
-        "List 2-4 points for each. If a category is empty, return an empty list for it. "
-        "Respond ONLY with a valid JSON object.\n\n"
-        f"Journal Entries:\n\"\"\"\n{combined_content}\n\"\"\""
+    # Content length in characters, summed by the database, decides the path without reading the corpus.
+    total_chars = entries_query.aggregate(total=Sum(Length('content')))['total'] or 0
+    if total_chars // CHARS_PER_TOKEN <= get_token_budget('collective_insights'):
+        entries_text = _format_insights_entries(
+            entries_query.order_by('created_at').values_list('created_at', 'content'),
+            get_token_budget('collective_insights'),
+        )
+        ai_response_str = call_openrouter_api(
+            build_insights_prompt(entries_text), "collective_insights", max_tokens=1000, temperature=0.5,
+            response_format={"type": "json_object"}, entry_id=user_id, user_id=user_id
+        )
+        if not ai_response_str:
+            logger.error(f"Failed to get AI response for collective insights (User: {user.username}).")
+            return {'error': 'AI service did not respond.'}
+        try:
+            insights_data = parse_insights_response(ai_response_str)
+            logger.info(f"Successfully generated insights for user {user.username}.")
+            return insights_data
+        except (json.JSONDecodeError, ValueError) as e:
+            logger.error(f"Failed to parse insights JSON from AI (User: {user.username}): {e}", exc_info=True)
+            return {'error': 'Failed to process AI response.'}
+
+    # Roll up from persisted summaries; windows at the edges of the period are summarized whole.
+    granularity = granularity_for_period(start_date, end_date)
+    window_starts = windows_with_entries(entries_query, granularity)
+    stored = dict(PeriodSummary.objects.filter(
+        user=user, granularity=granularity, period_start__in=window_starts, is_stale=False,
+        ai_model=AI_MODEL_FOR_ALL_TASKS,
+    ).values_list('period_start', 'summary'))
+    stored_summaries = [stored.get(start) for start in window_starts]
+    pending_starts = [start for start in window_starts if start not in stored]
+    logger.info(f"Insights for user {user.username} ({time_period}): {len(window_starts)} {granularity} summaries, "
+                f"{len(pending_starts)} to (re)generate.")
+
+    if not pending_starts:
+        return merge_insights_summaries_task.run([], user_id, stored_summaries)
+    return self.replace(chord(
+        [summarize_period_window_task.s(user_id, granularity, start.isoformat()) for start in pending_starts],
+        merge_insights_summaries_task.s(user_id, stored_summaries),
+    ))
+
+
+@shared_task(bind=True, max_retries=3, acks_late=True, result_ttl=POLL_RESULT_TTL, name='ai_services.tasks.summarize_period_window_task')
+def summarize_period_window_task(self, user_id, granularity, period_start):
+    """
+    Summarizes a user's entries of one calendar week or month (starting on the
+    ISO date `period_start`) and persists the result as a PeriodSummary.
+    A window too long for the 'period_summary' budget is summarized in
+    token-bounded chunks whose summaries are then merged.
+    Returns the summary, or None if none could be made.
+
+    The summary is only persisted if the window's entries did not change
+    while it was being made; otherwise it is returned for this run but the
+    window stays stale.
+    """
+    from journal.models import JournalEntry
+    start = datetime.date.fromisoformat(period_start)
+    window_from, window_to = window_bounds(start, granularity)
+    window_entries = JournalEntry.objects.filter(user_id=user_id, created_at__gte=window_from, created_at__lt=window_to)
+    rows = list(window_entries.order_by('created_at').values_list('created_at', 'content', 'updated_at'))
+    if not rows:
+        PeriodSummary.objects.filter(user_id=user_id, granularity=granularity, period_start=start).delete()
+        return None
+    snapshot = {'count': len(rows), 'last_updated': max(updated_at for _created_at, _content, updated_at in rows)}
+    chunks = _chunk_entries_by_budget(
+        [(created_at, content) for created_at, content, _updated_at in rows], get_token_budget('period_summary'),
     )
 
-    ai_response_str = call_openrouter_api(prompt, "collective_insights", max_tokens=1000, temperature=0.5, response_format={"type": "json_object"}, entry_id=user_id)
+    try:
+        chunk_summaries = []
+        for chunk in chunks:
+            ai_response_str = call_openrouter_api(
+                build_insights_prompt(_format_insights_entries(chunk, get_token_budget('period_summary'))),
+                "period_summary", max_tokens=600, temperature=0.5, response_format={"type": "json_object"},
+                entry_id=user_id, user_id=user_id, raise_on_retryable=True
+            )
+            if not ai_response_str:
+                return None
+            chunk_summaries.append(parse_insights_response(ai_response_str))
+    except RetryableAIError as exc:
+        retry_or_give_up(self, exc, user_id, f"{granularity} summary from {period_start}")
+        return None
+    except (json.JSONDecodeError, ValueError) as e:
+        logger.warning(f"Could not parse {granularity} summary from {period_start} (User ID: {user_id}): {e}")
+        return None
 
-    if not ai_response_str:
-        logger.error(f"Failed to get AI response for collective insights (User: {user.username}).")
-        return {'error': 'AI service did not respond.'}
+    summary = _merge_insights_summaries(chunk_summaries, user_id)
+    if 'error' in summary:
+        return None
 
-    try:
-        json_match = re.search(r'\{.*\}', ai_response_str, re.DOTALL)
-        if not json_match:
-            raise ValueError("No valid JSON object found in AI response for insights.")
-        
-        insights_data = json.loads(json_match.group(0))
-        
-        if not all(k in insights_data for k in ['highlights', 'challenges', 'key_themes']):
-            raise ValueError("AI response is missing required keys for insights.")
-        
-        logger.info(f"Successfully generated insights for user {user.username}.")
-        return insights_data
+    with transaction.atomic():
+        current = window_entries.aggregate(count=Count('id'), last_updated=Max('updated_at'))
+        if current != snapshot:
+            logger.info(f"Not persisting {granularity} summary from {period_start} (User ID: {user_id}): "
+                        f"its entries changed while it was being made.")
+            return summary
+        PeriodSummary.objects.update_or_create(
+            user_id=user_id, granularity=granularity, period_start=start,
+            defaults={'summary': summary, 'entry_count': len(rows), 'ai_model': AI_MODEL_FOR_ALL_TASKS, 'is_stale': False},
+        )
+    return summary
 
-    except (json.JSONDecodeError, ValueError) as e:
-        logger.error(f"Failed to parse insights JSON from AI (User: {user.username}): {e}", exc_info=True)
-        return {'error': 'Failed to process AI response.'}
+
+@shared_task(bind=True, result_ttl=POLL_RESULT_TTL, name='ai_services.tasks.merge_insights_summaries_task')
+def merge_insights_summaries_task(self, new_summaries, user_id, stored_summaries):
+    """
+    Reduce step of the period insights. `stored_summaries` has one item per
+    window in date order, None where the window was summarized in this run;
+    `new_summaries` (the chord results) fill those gaps in order.
+    """
+    new_summaries = iter(new_summaries)
+    summaries = [s if s is not None else next(new_summaries, None) for s in stored_summaries]
+    summaries = [s for s in summaries if s]
+    if not summaries:
+        logger.error(f"No period summary could be made (User ID: {user_id}).")
+        return {'error': 'AI service did not respond.'}
+    insights_data = _merge_insights_summaries(summaries, user_id)
+    if 'error' not in insights_data:
+        logger.info(f"Successfully generated insights from {len(summaries)} period summaries (User ID: {user_id}).")
+    return insights_data
 
 
-@shared_task(bind=True, name='ai_services.tasks.generate_life_suggestions_task')
+@shared_task(bind=True, result_ttl=POLL_RESULT_TTL, name='ai_services.tasks.generate_life_suggestions_task')
 def generate_life_suggestions_task(self, user_id, insights_data):
     """
     Takes a summary of insights and generates actionable, empathetic suggestions for the user.
@@ -334,6 +923,9 @@ def generate_life_suggestions_task(self, user_id, insights_data):
 
     highlights_str = "- " + "\n- ".join(highlights) if highlights else _("None provided.")
     challenges_str = "- " + "\n- ".join(challenges) if challenges else _("None provided.")
+    highlights_str, challenges_str = fit_sections(
+        [highlights_str, challenges_str], get_token_budget('life_suggestions_generation')
+    )
 
     prompt_text = (
         "You are an empathetic and action-oriented AI life coach. Your client has shared the following summary from their journal. "
@@ -354,7 +946,7 @@ def generate_life_suggestions_task(self, user_id, insights_data):
     
     ai_response_str = call_openrouter_api(
         prompt_text, "life_suggestions_generation", max_tokens=500,
-        temperature=0.7, response_format={"type": "json_object"}, entry_id=user_id
+        temperature=0.7, response_format={"type": "json_object"}, entry_id=user_id, user_id=user_id
     )
 
     if not ai_response_str:
@@ -378,3 +970,17 @@ def generate_life_suggestions_task(self, user_id, insights_data):
         logger.error(f"Failed to parse or validate JSON response from AI for suggestions (User: {user.username}): {e}", exc_info=True)
         logger.debug(f"Raw AI response for suggestions was: {ai_response_str}")
         return {'error': _('Failed to process AI suggestions.')}
+
+
+@shared_task(bind=True, ignore_result=True, name='ai_services.tasks.sweep_task_results_task')
+def sweep_task_results_task(self):
+    """
+    Periodic (celery beat) maintenance task: gives stored task results without
+    an expiry one, or deletes them if their task no longer stores results.
+    """
+    from celery.backends.redis import RedisBackend
+    from .result_backend import sweep_results
+    if not isinstance(self.backend, RedisBackend):
+        logger.info("Result backend sweep skipped: the result backend is not Redis.")
+        return
+    sweep_results(self.backend)
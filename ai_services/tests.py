@@ -1,3 +1,1469 @@
-from django.test import TestCase
+# ai_services/tests.py
 
-# Create your tests here.
+import datetime
+import io
+import json
+import requests
+from unittest import mock, skipUnless
+
+from django.core.cache import caches
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import http_client, timeseries
+from .metrics import get_counters, reset_counters
+from .response_cache import make_cache_key, RESPONSE_CACHE_ALIAS
+
+
+class HTTPClientTests(TestCase):
+    def tearDown(self):
+        http_client.close_http_session()
+
+    def test_session_is_reused_within_process(self):
+        first = http_client.get_http_session()
+        second = http_client.get_http_session()
+        self.assertIs(first, second)
+
+    def test_session_is_rebuilt_after_fork(self):
+        first = http_client.get_http_session()
+        with mock.patch('ai_services.http_client.os.getpid', return_value=-1):
+            second = http_client.get_http_session()
+        self.assertIsNot(first, second)
+
+    @override_settings(AI_HTTP_POOL_SIZE=25)
+    def test_adapter_uses_configured_pool_size(self):
+        adapter = http_client.get_http_session().get_adapter('https://openrouter.ai')
+        self.assertEqual(adapter._pool_maxsize, 25)
+        self.assertEqual(adapter.max_retries.total, 0)
+
+    @override_settings(AI_HTTP_CONNECT_TIMEOUT=3.0, AI_HTTP_READ_TIMEOUT=30.0)
+    def test_request_timeout_is_split_per_phase(self):
+        self.assertEqual(http_client.get_request_timeout(), (3.0, 30.0))
+
+
+class CombinedEntryAnalysisTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth import get_user_model
+        from journal.models import JournalEntry, Tag
+        cls.user = get_user_model().objects.create_user(username='combined_user', email='combined@example.com', password='password123')
+        Tag.objects.get_or_create(name='Work', defaults={'emoji': '💼'})
+        Tag.objects.get_or_create(name='General', defaults={'emoji': '🗒️'})
+        cls.entry = JournalEntry.objects.create(user=cls.user, content="Finally shipped the release at work today.")
+
+    def setUp(self):
+        caches[RESPONSE_CACHE_ALIAS].clear()
+
+    def _run(self, ai_response, **kwargs):
+        from .tasks import analyze_entry_task
+        with mock.patch('ai_services.tasks.call_openrouter_api', return_value=ai_response) as api_mock:
+            analyze_entry_task.apply(args=[self.entry.id], kwargs=kwargs)
+        self.entry.refresh_from_db()
+        return api_mock
+
+    def test_single_call_writes_all_results(self):
+        api_mock = self._run('{"quote": "Done is better than perfect. - Sheryl Sandberg", "mood": "Happy", "tags": ["work", "Unknown"]}')
+        self.assertEqual(api_mock.call_count, 1)
+        self.assertEqual(self.entry.ai_quote, 'Done is better than perfect. - Sheryl Sandberg')
+        self.assertEqual(self.entry.mood, 'happy')
+        self.assertEqual([t.name for t in self.entry.tags.all()], ['Work'])
+        self.assertTrue(self.entry.ai_quote_processed)
+        self.assertTrue(self.entry.ai_mood_processed)
+        self.assertTrue(self.entry.ai_tags_processed)
+
+    def test_invalid_response_uses_fallbacks(self):
+        self._run('not json at all')
+        self.assertEqual(self.entry.mood, 'neutral')
+        self.assertEqual([t.name for t in self.entry.tags.all()], ['General'])
+        self.assertTrue(self.entry.ai_quote)
+
+    def test_only_requested_parts_are_written(self):
+        self.entry.mood = 'sad'
+        self.entry.save(update_fields=['mood'])
+        api_mock = self._run('{"quote": "Keep going. - Anonymous"}', include_mood=False, include_tags=False)
+        prompt = api_mock.call_args[0][0]
+        self.assertNotIn('"mood"', prompt)
+        self.assertNotIn('"tags"', prompt)
+        self.assertEqual(self.entry.mood, 'sad')
+        self.assertFalse(self.entry.ai_mood_processed)
+        self.assertEqual(self.entry.ai_quote, 'Keep going. - Anonymous')
+
+
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth import get_user_model
+        from journal.models import JournalEntry
+        User = get_user_model()
+        cls.user = User.objects.create_user(username='cache_user', email='cache@example.com', password='password123')
+        cls.staff = User.objects.create_user(username='cache_staff', email='staff@example.com', password='password123', is_staff=True)
+        cls.entry = JournalEntry.objects.create(user=cls.user, content="Gratitude:  my family,\n my health.")
+        cls.twin_entry = JournalEntry.objects.create(user=cls.user, content="Gratitude: my family, my health.")
+
+    def setUp(self):
+        caches[RESPONSE_CACHE_ALIAS].clear()
+        reset_counters()
+
+    def test_cache_key_ignores_whitespace_differences(self):
+        key_a = make_cache_key('mood_detection', 'model', self.entry.content, 1)
+        key_b = make_cache_key('mood_detection', 'model', self.twin_entry.content, 1)
+        self.assertEqual(key_a, key_b)
+        self.assertNotEqual(key_a, make_cache_key('mood_detection', 'model', self.entry.content, 2))
+        self.assertNotEqual(key_a, make_cache_key('quote_generation', 'model', self.entry.content, 1))
+
+    def test_repeated_content_is_served_from_cache(self):
+        from .tasks import detect_mood_for_entry_task
+        with mock.patch('ai_services.tasks.call_openrouter_api', return_value='calm') as api_mock:
+            detect_mood_for_entry_task.apply(args=[self.entry.id])
+            detect_mood_for_entry_task.apply(args=[self.twin_entry.id])
+        self.assertEqual(api_mock.call_count, 1)
+        self.twin_entry.refresh_from_db()
+        self.assertEqual(self.twin_entry.mood, 'calm')
+        counters = get_counters()
+        self.assertEqual(counters['response_cache.hits'], 1)
+        self.assertEqual(counters['response_cache.misses'], 1)
+
+    def test_changed_mood_list_misses_the_cache(self):
+        from .tasks import detect_mood_for_entry_task, get_valid_moods
+        moods = get_valid_moods()
+        with mock.patch('ai_services.tasks.call_openrouter_api', return_value='calm') as api_mock:
+            detect_mood_for_entry_task.apply(args=[self.entry.id])
+            with mock.patch('ai_services.tasks.get_valid_moods', return_value=moods + ['hopeful']):
+                detect_mood_for_entry_task.apply(args=[self.entry.id])
+            detect_mood_for_entry_task.apply(args=[self.entry.id])
+        self.assertEqual(api_mock.call_count, 2)
+
+    def test_failed_responses_are_not_cached(self):
+        from .tasks import detect_mood_for_entry_task
+        with mock.patch('ai_services.tasks.call_openrouter_api', return_value=None) as api_mock:
+            detect_mood_for_entry_task.apply(args=[self.entry.id])
+            detect_mood_for_entry_task.apply(args=[self.entry.id])
+        self.assertEqual(api_mock.call_count, 2)
+
+    def test_metrics_view_is_staff_only(self):
+        self.client.login(username='cache_user', password='password123')
+        self.assertEqual(self.client.get(reverse('ai_services:ai_metrics')).status_code, 403)
+        self.client.login(username='cache_staff', password='password123')
+        response = self.client.get(reverse('ai_services:ai_metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('response_cache.hit_ratio', response.json()['response_cache'])
+
+
+class RateLimitTests(TestCase):
+    @override_settings(AI_RATE_LIMITS={
+        'default': {'requests_per_second': 3, 'tokens_per_minute': 1000, 'max_in_flight': 4},
+        'openai/gpt-4o': {'max_in_flight': 2},
+    })
+    def test_model_limits_overlay_defaults(self):
+        from .rate_limit import get_limits
+        self.assertEqual(get_limits('openai/gpt-4o'), {'requests_per_second': 3, 'tokens_per_minute': 1000, 'max_in_flight': 2})
+        self.assertEqual(get_limits('other/model')['max_in_flight'], 4)
+
+    def test_limiter_fails_open_when_redis_is_unavailable(self):
+        from .rate_limit import provider_capacity
+        broken_client = mock.Mock()
+        broken_client.eval.side_effect = ConnectionError("redis down")
+        entered = False
+        with mock.patch('ai_services.rate_limit.get_redis', return_value=broken_client):
+            with provider_capacity('openai/gpt-3.5-turbo', 100):
+                entered = True
+        self.assertTrue(entered)
+
+    @override_settings(AI_RATE_LIMIT_MAX_WAIT=0)
+    def test_timeout_when_no_capacity(self):
+        from .rate_limit import provider_capacity, RateLimitTimeout
+        full_client = mock.Mock()
+        full_client.eval.return_value = 0  # Semaphore is full.
+        with mock.patch('ai_services.rate_limit.get_redis', return_value=full_client):
+            with self.assertRaises(RateLimitTimeout):
+                with provider_capacity('openai/gpt-3.5-turbo', 100):
+                    pass
+
+
+    @override_settings(AI_RATE_LIMITS={'default': {'requests_per_second': 0.2}})
+    def test_bucket_is_waited_on_before_taking_a_slot(self):
+        from .rate_limit import _SEMAPHORE_ACQUIRE_LUA, _TOKEN_BUCKET_LUA, acquire_capacity
+        client = mock.Mock()
+        client.eval.side_effect = [1500, 0, 1]  # Wait 1.5 s for the bucket, then admitted, then a free slot.
+        with mock.patch('ai_services.rate_limit.get_redis', return_value=client), \
+             mock.patch('ai_services.rate_limit._sleep') as sleep:
+            slot = acquire_capacity('openai/gpt-3.5-turbo', 100)
+        scripts = [call.args[0] for call in client.eval.call_args_list]
+        self.assertEqual(scripts, [_TOKEN_BUCKET_LUA, _TOKEN_BUCKET_LUA, _SEMAPHORE_ACQUIRE_LUA])
+        sleep.assert_called_once_with(1.5)
+        self.assertIsNotNone(slot)
+        # A bucket below one request per second still holds one request.
+        self.assertEqual(client.eval.call_args_list[0].args[5], 1)
+
+
+@mock.patch.dict('os.environ', {'OPENROUTER_API_KEY': 'test-key'})
+@override_settings(AI_RATE_LIMIT_ENABLED=False)
+class CircuitBreakerIntegrationTests(TestCase):
+    def test_open_breaker_short_circuits_without_http_call(self):
+        from .tasks import call_openrouter_api
+        with mock.patch('ai_services.circuit_breaker.allow_request', return_value=False), \
+             mock.patch('ai_services.tasks.get_http_session') as session_mock:
+            self.assertIsNone(call_openrouter_api("prompt", "mood_detection"))
+        session_mock.assert_not_called()
+
+    def test_server_errors_are_recorded_as_failures(self):
+        from .tasks import call_openrouter_api
+        response = mock.Mock(status_code=503, text='unavailable')
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError(response=response)
+        with mock.patch('ai_services.circuit_breaker.allow_request', return_value=True), \
+             mock.patch('ai_services.circuit_breaker.record_result') as record_mock, \
+             mock.patch('ai_services.tasks.get_http_session') as session_mock:
+            session_mock.return_value.post.return_value = response
+            self.assertIsNone(call_openrouter_api("prompt", "mood_detection"))
+        self.assertFalse(record_mock.call_args[0][0])
+
+    def test_successful_calls_are_recorded(self):
+        from .tasks import call_openrouter_api
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'choices': [{'message': {'content': 'happy'}}]}
+        with mock.patch('ai_services.circuit_breaker.allow_request', return_value=True), \
+             mock.patch('ai_services.circuit_breaker.record_result') as record_mock, \
+             mock.patch('ai_services.tasks.get_http_session') as session_mock:
+            session_mock.return_value.post.return_value = response
+            self.assertEqual(call_openrouter_api("prompt", "mood_detection"), 'happy')
+        self.assertTrue(record_mock.call_args[0][0])
+
+    def test_probe_without_rate_limit_capacity_is_released(self):
+        from .rate_limit import RateLimitTimeout
+        from .tasks import call_openrouter_api
+        with mock.patch('ai_services.circuit_breaker.allow_request', return_value='probe-1'), \
+             mock.patch('ai_services.circuit_breaker.release_probe') as release_mock, \
+             mock.patch('ai_services.tasks.provider_capacity', side_effect=RateLimitTimeout("busy")), \
+             mock.patch('ai_services.tasks.get_http_session') as session_mock:
+            self.assertIsNone(call_openrouter_api("prompt", "mood_detection"))
+        session_mock.return_value.post.assert_not_called()
+        release_mock.assert_called_once_with('probe-1')
+
+
+try:
+    import fakeredis
+except ImportError:  # The breaker's Lua scripts are only exercised where fakeredis is installed.
+    fakeredis = None
+
+
+@skipUnless(fakeredis is not None, "fakeredis is not installed")
+@override_settings(AI_CIRCUIT_BREAKER_COOLDOWN=30, AI_CIRCUIT_BREAKER_HALF_OPEN_PROBES=1)
+class CircuitBreakerProbeTests(TestCase):
+    def setUp(self):
+        from . import circuit_breaker
+        self.breaker = circuit_breaker
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch('ai_services.circuit_breaker.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Opened more than a cooldown ago: the next call is the half-open probe.
+        self.redis.hset('ai_cb:openrouter:state', mapping={'state': 'open', 'changed_at': 0})
+
+    def test_only_the_probe_outcome_counts_while_half_open(self):
+        probe = self.breaker.allow_request()
+        self.assertIsInstance(probe, str)
+        self.assertEqual(self.breaker.get_state(), 'half_open')
+        self.assertFalse(self.breaker.allow_request())
+
+        # A late failure of a call let through while the breaker was closed.
+        self.breaker.record_result(False, 0.1)
+        self.assertEqual(self.breaker.get_state(), 'half_open')
+
+        self.breaker.record_result(True, 0.1, permit=probe)
+        self.assertEqual(self.breaker.get_state(), 'closed')
+        self.assertIs(self.breaker.allow_request(), True)
+
+    def test_released_probe_is_replaced_without_another_cooldown(self):
+        probe = self.breaker.allow_request()
+        self.assertFalse(self.breaker.allow_request())
+        self.breaker.release_probe(probe)
+        second_probe = self.breaker.allow_request()
+        self.assertIsInstance(second_probe, str)
+        self.assertNotEqual(second_probe, probe)
+
+        # Releasing after the outcome was recorded changes nothing.
+        self.breaker.record_result(False, 0.1, permit=second_probe)
+        self.breaker.release_probe(second_probe)
+        self.assertEqual(self.breaker.get_state(), 'open')
+        self.assertFalse(self.breaker.allow_request())
+
+
+class RetryPolicyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth import get_user_model
+        from journal.models import JournalEntry
+        cls.user = get_user_model().objects.create_user(username='retry_user', email='retry@example.com', password='password123')
+        cls.entry = JournalEntry.objects.create(user=cls.user, content="A long day with a happy ending.")
+
+    def setUp(self):
+        caches[RESPONSE_CACHE_ALIAS].clear()
+
+    @override_settings(AI_RETRY_BACKOFF_BASE=10, AI_RETRY_BACKOFF_MAX=60)
+    def test_backoff_is_jittered_capped_and_honors_retry_after(self):
+        from .retry import compute_backoff
+        for attempt in range(8):
+            self.assertLessEqual(compute_backoff(attempt), 60)
+        self.assertGreaterEqual(compute_backoff(0, retry_after=30), 30)
+        self.assertEqual(compute_backoff(0, retry_after=3600), 60)
+
+    def test_parse_retry_after(self):
+        from django.utils.http import http_date
+        import time
+        from .retry import parse_retry_after
+        self.assertEqual(parse_retry_after('12'), 12)
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertAlmostEqual(parse_retry_after(http_date(time.time() + 120)), 120, delta=2)
+
+    @mock.patch.dict('os.environ', {'OPENROUTER_API_KEY': 'test-key'})
+    @override_settings(AI_RATE_LIMIT_ENABLED=False, AI_CIRCUIT_BREAKER_ENABLED=False)
+    def test_only_retryable_statuses_raise(self):
+        from .tasks import call_openrouter_api
+        from .retry import RetryableAIError
+        for status_code, retryable in ((429, True), (503, True), (400, False)):
+            response = mock.Mock(status_code=status_code, text='error', headers={'Retry-After': '7'})
+            response.raise_for_status.side_effect = requests.exceptions.HTTPError(response=response)
+            with mock.patch('ai_services.tasks.get_http_session') as session_mock:
+                session_mock.return_value.post.return_value = response
+                if retryable:
+                    with self.assertRaises(RetryableAIError) as ctx:
+                        call_openrouter_api("prompt", "mood_detection", raise_on_retryable=True)
+                    self.assertEqual(ctx.exception.retry_after, 7)
+                else:
+                    self.assertIsNone(call_openrouter_api("prompt", "mood_detection", raise_on_retryable=True))
+
+    def test_retry_does_not_mark_entry_processed(self):
+        from celery.exceptions import Retry
+        from .tasks import detect_mood_for_entry_task
+        from .retry import RetryableAIError
+        with mock.patch('ai_services.tasks.call_openrouter_api', side_effect=RetryableAIError("HTTP 429")), \
+             mock.patch.object(detect_mood_for_entry_task, 'retry', side_effect=Retry()) as retry_mock:
+            with self.assertRaises(Retry):
+                detect_mood_for_entry_task.run(self.entry.id)
+        self.assertIsNotNone(retry_mock.call_args.kwargs['countdown'])
+        self.entry.refresh_from_db()
+        self.assertFalse(self.entry.ai_mood_processed)
+
+    def test_fallback_is_written_once_retries_are_exhausted(self):
+        from .tasks import detect_mood_for_entry_task
+        from .retry import RetryableAIError
+        with mock.patch('ai_services.tasks.call_openrouter_api', side_effect=RetryableAIError("timeout")) as api_mock:
+            detect_mood_for_entry_task.apply(args=[self.entry.id])
+        self.assertEqual(api_mock.call_count, detect_mood_for_entry_task.max_retries + 1)
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.mood, 'neutral')
+        self.assertTrue(self.entry.ai_mood_processed)
+
+
+class BulkReprocessTests(TransactionTestCase):
+    # The bulk driver reaches the database from sync_to_async worker threads,
+    # which cannot see data inside a TestCase transaction.
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from journal.models import JournalEntry, Tag
+        caches[RESPONSE_CACHE_ALIAS].clear()
+        self.user = get_user_model().objects.create_user(username='bulk_user', email='bulk@example.com', password='password123')
+        Tag.objects.get_or_create(name='Work', defaults={'emoji': '💼'})
+        Tag.objects.get_or_create(name='General', defaults={'emoji': '🗒️'})
+        self.entries = [
+            JournalEntry.objects.create(user=self.user, content=f"Entry number {i} about work.")
+            for i in range(5)
+        ]
+        self.manual_mood_entry = JournalEntry.objects.create(user=self.user, content="Chose my own mood.", mood='sad')
+
+    def _reprocess(self, responses, **kwargs):
+        from .bulk import reprocess_entries
+        from journal.models import JournalEntry
+
+        async def fake_complete(client, prompt_text, task_name, **_kwargs):
+            return responses.get(task_name)
+
+        with mock.patch('ai_services.bulk.AsyncOpenRouterClient.complete', new=fake_complete), \
+             mock.patch('ai_services.bulk.AsyncOpenRouterClient.aclose', new=mock.AsyncMock()):
+            return reprocess_entries(JournalEntry.objects.filter(user=self.user), batch_size=2, concurrency=4, **kwargs)
+
+    def test_writes_results_for_all_batches(self):
+        progress = self._reprocess({'mood_detection': 'happy', 'tag_suggestion': 'Work'})
+        self.assertEqual(progress.processed, 6)
+        for entry in self.entries:
+            entry.refresh_from_db()
+            self.assertEqual(entry.mood, 'happy')
+            self.assertTrue(entry.ai_mood_processed)
+            self.assertEqual([t.name for t in entry.tags.all()], ['Work'])
+            self.assertTrue(entry.ai_tags_processed)
+
+    def test_user_chosen_mood_is_kept(self):
+        self._reprocess({'mood_detection': 'happy'}, task_types=['mood'])
+        self.manual_mood_entry.refresh_from_db()
+        self.assertEqual(self.manual_mood_entry.mood, 'sad')
+
+    def test_unparseable_responses_are_recorded_as_fallback(self):
+        self._reprocess({'mood_detection': 'not a mood at all', 'tag_suggestion': 'Work'}, task_types=['mood'])
+        entry = self.entries[0]
+        entry.refresh_from_db()
+        self.assertEqual(entry.mood, 'neutral')
+        self.assertEqual(entry.ai_mood_status, 'fallback')
+
+    def test_parsed_responses_are_recorded_as_success(self):
+        self._reprocess({'mood_detection': 'happy'}, task_types=['mood'])
+        entry = self.entries[0]
+        entry.refresh_from_db()
+        self.assertEqual(entry.ai_mood_status, 'success')
+
+    def test_only_unprocessed_reruns_only_missing_parts(self):
+        from journal.models import JournalEntry
+        JournalEntry.objects.filter(pk=self.entries[0].pk).update(ai_mood_processed=True, mood='calm', ai_mood_task_id='earlier-task')
+        calls = []
+
+        async def fake_complete(client, prompt_text, task_name, **_kwargs):
+            calls.append(task_name)
+            return {'mood_detection': 'happy', 'tag_suggestion': 'Work'}[task_name]
+
+        from .bulk import reprocess_entries
+        with mock.patch('ai_services.bulk.AsyncOpenRouterClient.complete', new=fake_complete), \
+             mock.patch('ai_services.bulk.AsyncOpenRouterClient.aclose', new=mock.AsyncMock()):
+            reprocess_entries(JournalEntry.objects.filter(pk=self.entries[0].pk), only_unprocessed=True)
+        self.assertEqual(calls, ['tag_suggestion'])
+        self.entries[0].refresh_from_db()
+        self.assertEqual(self.entries[0].mood, 'calm')
+        self.assertTrue(self.entries[0].ai_tags_processed)
+
+    def test_failed_calls_leave_entries_unprocessed(self):
+        progress = self._reprocess({}, task_types=['mood'])
+        self.assertEqual(progress.failed, 5)
+        self.entries[0].refresh_from_db()
+        self.assertIsNone(self.entries[0].mood)
+        self.assertFalse(self.entries[0].ai_mood_processed)
+
+
+class AIReprocessCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth import get_user_model
+        from journal.models import JournalEntry, Tag
+        cls.user = get_user_model().objects.create_user(username='reprocess_user', email='reprocess@example.com', password='password123')
+        Tag.objects.get_or_create(name='General', defaults={'emoji': '🗒️'})
+        cls.entries = [
+            JournalEntry.objects.create(user=cls.user, content=f"A quiet day number {i}.")
+            for i in range(4)
+        ]
+
+    def setUp(self):
+        import tempfile
+        caches[RESPONSE_CACHE_ALIAS].clear()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.checkpoint = f"{tmp_dir.name}/checkpoint.json"
+
+    def _call(self, *args):
+        from io import StringIO
+        from celery import current_app
+        from django.core.management import call_command
+        out = StringIO()
+        # The app reads its config through the CELERY_ settings namespace.
+        previous_eager = current_app.conf['CELERY_TASK_ALWAYS_EAGER']
+        current_app.conf['CELERY_TASK_ALWAYS_EAGER'] = True
+        try:
+            with mock.patch('ai_services.tasks.call_openrouter_api', return_value='happy') as api_mock:
+                call_command('ai_reprocess', '--user', 'reprocess_user', '--tasks', 'mood', '--batch-size', '2',
+                             '--checkpoint', self.checkpoint, *args, stdout=out)
+        finally:
+            current_app.conf['CELERY_TASK_ALWAYS_EAGER'] = previous_eager
+        return out.getvalue(), api_mock
+
+    def test_dry_run_estimates_without_calling_provider(self):
+        output, api_mock = self._call('--dry-run', '--price-per-1k-tokens', '0.5')
+        api_mock.assert_not_called()
+        self.assertIn("Entries matched: 4", output)
+        self.assertIn("Provider requests: 4", output)
+        self.assertIn("Estimated cost:", output)
+        self.entries[0].refresh_from_db()
+        self.assertFalse(self.entries[0].ai_mood_processed)
+
+    @override_settings(AI_COMBINED_ENTRY_ANALYSIS=False)
+    def test_celery_dispatch_processes_entries_and_clears_checkpoint(self):
+        import os
+        from .tasks import AI_MODEL_FOR_ALL_TASKS
+        _output, api_mock = self._call()
+        self.assertEqual(api_mock.call_count, 4)
+        for entry in self.entries:
+            entry.refresh_from_db()
+            self.assertEqual(entry.mood, 'happy')
+            self.assertEqual(entry.ai_model, AI_MODEL_FOR_ALL_TASKS)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    @override_settings(AI_COMBINED_ENTRY_ANALYSIS=False)
+    def test_resume_continues_after_checkpoint(self):
+        from django.core.management.base import CommandError
+        from .management.commands.ai_reprocess import Command
+        options = {'checkpoint': self.checkpoint, 'tasks': 'mood', 'user': 'reprocess_user', 'since': None,
+                   'until': None, 'only_unprocessed': False, 'model': None, 'outdated_model': False}
+        Command().save_checkpoint(options, self.entries[1].pk)
+
+        _output, api_mock = self._call('--resume')
+        self.assertEqual(api_mock.call_count, 2)
+        self.entries[0].refresh_from_db()
+        self.assertFalse(self.entries[0].ai_mood_processed)
+
+        Command().save_checkpoint(options, self.entries[1].pk)
+        with self.assertRaises(CommandError):
+            self._call('--resume', '--only-unprocessed')
+
+
+class MockProviderTests(TestCase):
+    def _serve(self, **config):
+        import threading
+        from .mock_provider import MockProviderConfig, MockProviderServer
+        server = MockProviderServer(('127.0.0.1', 0), MockProviderConfig(seed=1, **config))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def _post(self, server, prompt):
+        return requests.post(f"{server.base_url}/chat/completions", json={
+            'model': 'mock', 'messages': [{'role': 'user', 'content': prompt}],
+        }, timeout=5)
+
+    def test_payloads_are_deterministic_and_parseable(self):
+        from .mock_provider import build_completion_content
+        from .tasks import (
+            build_mood_prompt, build_tags_prompt, build_combined_analysis_prompt,
+            parse_mood_response, parse_tags_response, parse_json_object,
+        )
+        mood_prompt = build_mood_prompt("Long day, but it ended well.")
+        self.assertEqual(build_completion_content(mood_prompt), build_completion_content(mood_prompt))
+        self.assertIsNotNone(parse_mood_response(build_completion_content(mood_prompt)))
+        self.assertTrue(parse_tags_response(build_completion_content(build_tags_prompt("Work day.", ['Work', 'Health'])), ['Work', 'Health']))
+        analysis = parse_json_object(build_completion_content(
+            build_combined_analysis_prompt("Work day.", available_tags=['Work', 'Health'])
+        ))
+        self.assertEqual(set(analysis), {'quote', 'mood', 'tags'})
+
+    def test_serves_chat_completions(self):
+        from .tasks import build_mood_prompt, extract_response_content, parse_mood_response
+        server = self._serve()
+        response = self._post(server, build_mood_prompt("A calm evening."))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(parse_mood_response(extract_response_content(response.json())))
+
+    def test_injects_rate_limit_errors(self):
+        server = self._serve(rate_429=1.0, retry_after=3)
+        response = self._post(server, "Hello")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '3')
+        self.assertEqual(server.summary()['outcomes'], {'429': 1})
+
+
+@mock.patch('ai_services.tokens.get_encoder', return_value=None)
+class TokenBudgetTests(TestCase):
+    def test_truncate_to_tokens(self, _encoder):
+        from .tokens import count_tokens, truncate_to_tokens
+        self.assertEqual(truncate_to_tokens("short", 10), "short")
+        truncated = truncate_to_tokens("x" * 1000, 50)
+        self.assertTrue(truncated.endswith('...'))
+        self.assertLessEqual(count_tokens(truncated), 50)
+
+    def test_fit_sections_keeps_short_sections_whole(self, _encoder):
+        from .tokens import count_tokens, fit_sections
+        sections = ["a" * 40, "b" * 4000, "c" * 4000]
+        fitted = fit_sections(sections, 300)
+        self.assertEqual(fitted[0], sections[0])
+        self.assertLessEqual(sum(count_tokens(s) for s in fitted), 300)
+        self.assertEqual(count_tokens(fitted[1]), count_tokens(fitted[2]))
+
+    @override_settings(AI_PROMPT_TOKEN_BUDGETS={'collective_insights': 500, 'period_summary': 500, 'insights_reduce': 500})
+    def test_insights_prompts_are_bounded_by_budget(self, _encoder):
+        from django.contrib.auth import get_user_model
+        from journal.models import JournalEntry
+        from .tasks import generate_insights_for_period_task
+        from .tokens import count_tokens
+        user = get_user_model().objects.create_user(username='tokens_user', email='tokens@example.com', password='password123')
+        for _i in range(20):
+            JournalEntry.objects.create(user=user, content="A very long day. " * 200)
+        with mock.patch('ai_services.tasks.call_openrouter_api', return_value=None) as api_mock, \
+             mock.patch.object(generate_insights_for_period_task, 'replace', side_effect=lambda sig: sig.apply().get()):
+            generate_insights_for_period_task.apply(args=[user.id, 'all_time'])
+        for call in api_mock.call_args_list:
+            self.assertLess(count_tokens(call.args[0]), 500 + 200)
+
+    def test_entries_whose_header_does_not_fit_are_left_out(self, _encoder):
+        from .tasks import _format_insights_entries
+        from .tokens import count_tokens
+        now = timezone.now()
+        text = _format_insights_entries([(now, "A very long day. " * 50)] * 30, 100)
+        self.assertLessEqual(count_tokens(text), 100)
+        self.assertGreater(text.count('--- Entry from'), 0)
+        self.assertLess(text.count('--- Entry from'), 30)
+
+    @mock.patch.dict('os.environ', {'OPENROUTER_API_KEY': 'test-key'})
+    @override_settings(AI_RATE_LIMIT_ENABLED=False, AI_CIRCUIT_BREAKER_ENABLED=False)
+    def test_usage_is_recorded_per_task(self, _encoder):
+        from .tasks import call_openrouter_api
+        reset_counters()
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {
+            'choices': [{'message': {'content': 'happy'}}],
+            'usage': {'prompt_tokens': 120, 'completion_tokens': 2},
+        }
+        with mock.patch('ai_services.tasks.get_http_session') as session_mock:
+            session_mock.return_value.post.return_value = response
+            self.assertEqual(call_openrouter_api("prompt", "mood_detection"), 'happy')
+        counters = get_counters()
+        self.assertEqual(counters['tokens.mood_detection.prompt'], 120)
+        self.assertEqual(counters['tokens.mood_detection.completion'], 2)
+        self.assertEqual(counters['tokens.mood_detection.calls'], 1)
+        self.assertEqual(counters['tokens.prompt'], 120)
+
+
+@mock.patch('ai_services.tokens.get_encoder', return_value=None)
+@override_settings(AI_PROMPT_TOKEN_BUDGETS={'collective_insights': 300})
+class PeriodSummaryRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        import datetime
+        from django.contrib.auth import get_user_model
+        from django.utils import timezone
+        from journal.models import JournalEntry
+        cls.user = get_user_model().objects.create_user(username='insights_user', email='insights@example.com', password='password123')
+        # Two entries in each of three months, together too long for a single prompt.
+        for month in (1, 2, 3):
+            for day in (5, 20):
+                entry = JournalEntry.objects.create(user=cls.user, content=f"Month {month} day {day}. " + "Busy. " * 150)
+                JournalEntry.objects.filter(pk=entry.pk).update(
+                    created_at=timezone.make_aware(datetime.datetime(2025, month, day, 12))
+                )
+
+    def _fake_api(self, prompt_text, task_name, **kwargs):
+        import json
+        if task_name == 'insights_reduce':
+            return json.dumps({'highlights': ['merged'], 'challenges': [], 'key_themes': []})
+        return json.dumps({'highlights': [task_name], 'challenges': [], 'key_themes': []})
+
+    def _run(self, time_period='all_time'):
+        from .tasks import generate_insights_for_period_task
+        # Task.replace freezes the chord against the (Redis) result backend; run it eagerly instead.
+        with mock.patch('ai_services.tasks.call_openrouter_api', side_effect=self._fake_api) as api_mock, \
+             mock.patch.object(generate_insights_for_period_task, 'replace', side_effect=lambda sig: sig.apply().get()):
+            result = generate_insights_for_period_task.apply(args=[self.user.id, time_period]).get()
+        return result, [call.args[1] for call in api_mock.call_args_list]
+
+    def test_long_period_is_merged_from_monthly_summaries(self, _encoder):
+        from .models import PeriodSummary
+        result, task_names = self._run()
+        self.assertEqual(result['highlights'], ['merged'])
+        self.assertEqual(task_names.count('period_summary'), 3)
+        self.assertEqual(task_names[-1], 'insights_reduce')
+        self.assertEqual(PeriodSummary.objects.filter(user=self.user, granularity='month', is_stale=False).count(), 3)
+
+    def test_rerun_only_regenerates_touched_windows(self, _encoder):
+        from journal.models import JournalEntry
+        self._run()
+        entry = JournalEntry.objects.filter(user=self.user, created_at__month=2).first()
+        entry.content += " Edited."
+        entry.save()
+        _result, task_names = self._run()
+        self.assertEqual(task_names, ['period_summary', 'insights_reduce'])
+
+    def test_ai_only_saves_keep_summaries_valid(self, _encoder):
+        from journal.models import JournalEntry
+        from .models import PeriodSummary
+        self._run()
+        entry = JournalEntry.objects.filter(user=self.user).first()
+        entry.save(update_fields=['ai_mood_processed'])
+        self.assertFalse(PeriodSummary.objects.filter(user=self.user, is_stale=True).exists())
+        entry.delete()
+        self.assertTrue(PeriodSummary.objects.filter(user=self.user, is_stale=True).exists())
+
+    @override_settings(AI_PROMPT_TOKEN_BUDGETS={'collective_insights': 300, 'period_summary': 300})
+    def test_oversized_window_is_summarized_in_chunks(self, _encoder):
+        result, task_names = self._run()
+        self.assertEqual(result['highlights'], ['merged'])
+        # Each month's two entries no longer fit one prompt: two chunks and a merge per month.
+        self.assertEqual(task_names.count('period_summary'), 6)
+        self.assertEqual(task_names.count('insights_reduce'), 4)
+
+    def test_summary_is_not_persisted_if_entries_changed_meanwhile(self, _encoder):
+        import json
+        from journal.models import JournalEntry
+        from .models import PeriodSummary
+        from .tasks import summarize_period_window_task
+
+        def edit_during_call(prompt_text, task_name, **kwargs):
+            entry = JournalEntry.objects.filter(user=self.user, created_at__month=1).first()
+            entry.content += " Edited meanwhile."
+            entry.save()
+            return json.dumps({'highlights': ['old'], 'challenges': [], 'key_themes': []})
+
+        with mock.patch('ai_services.tasks.call_openrouter_api', side_effect=edit_during_call):
+            summary = summarize_period_window_task.apply(args=[self.user.id, 'month', '2025-01-01']).get()
+        self.assertEqual(summary['highlights'], ['old'])
+        self.assertFalse(PeriodSummary.objects.filter(user=self.user, period_start=datetime.date(2025, 1, 1)).exists())
+
+    def test_window_boundaries(self, _encoder):
+        import datetime
+        from .period_summaries import granularity_for_period, next_window_start, window_start
+        self.assertEqual(window_start(datetime.date(2025, 3, 13), 'week'), datetime.date(2025, 3, 10))
+        self.assertEqual(window_start(datetime.date(2025, 3, 13), 'month'), datetime.date(2025, 3, 1))
+        self.assertEqual(next_window_start(datetime.date(2025, 12, 1), 'month'), datetime.date(2026, 1, 1))
+        now = datetime.datetime(2025, 6, 1)
+        self.assertEqual(granularity_for_period(now - datetime.timedelta(days=30), now), 'week')
+        self.assertEqual(granularity_for_period(None, now), 'month')
+
+
+@skipUnless(fakeredis is not None, "fakeredis is not installed")
+class ResultMemoizationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth import get_user_model
+        from journal.models import JournalEntry
+        cls.user = get_user_model().objects.create_user(username='memo_user', email='memo@example.com', password='password123')
+        cls.entry = JournalEntry.objects.create(user=cls.user, content="A calm and productive week.")
+
+    def setUp(self):
+        caches[RESPONSE_CACHE_ALIAS].clear()
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch('ai_services.result_cache.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.login(username='memo_user', password='password123')
+        self.insights = {'highlights': ['Calm week'], 'challenges': [], 'key_themes': ['Focus']}
+
+    def _start_and_poll(self, data=None):
+        with mock.patch('ai_services.views.generate_insights_for_period_task.delay') as delay_mock, \
+             mock.patch('ai_services.views.AsyncResult') as result_mock:
+            delay_mock.return_value.id = 'task-1'
+            response = self.client.post(reverse('ai_services:start_insights_analysis'), data or {'time_period': 'last_7_days'})
+            if response.json()['status'] == 'processing':
+                result_mock.return_value.ready.return_value = True
+                result_mock.return_value.successful.return_value = True
+                result_mock.return_value.get.return_value = dict(self.insights)
+                self.client.get(reverse('ai_services:get_insights_result'), {'task_id': 'task-1'})
+        return response.json(), delay_mock
+
+    def test_repeated_request_is_served_from_cache(self):
+        first, delay_mock = self._start_and_poll()
+        self.assertEqual(first['status'], 'processing')
+        self.assertEqual(delay_mock.call_count, 1)
+
+        second, delay_mock = self._start_and_poll()
+        delay_mock.assert_not_called()
+        self.assertEqual(second['status'], 'SUCCESS')
+        self.assertTrue(second['cached'])
+        self.assertEqual(second['highlights'], ['Calm week'])
+
+    def test_entry_change_and_force_refresh_bypass_cache(self):
+        self._start_and_poll()
+        self.entry.content += " Edited."
+        self.entry.save()
+        response, delay_mock = self._start_and_poll()
+        self.assertEqual(response['status'], 'processing')
+
+        response, delay_mock = self._start_and_poll({'time_period': 'last_7_days', 'force_refresh': 'true'})
+        self.assertEqual(delay_mock.call_count, 1)
+
+    def test_version_bumped_by_another_process_invalidates_results(self):
+        from .result_cache import JOURNAL_VERSION_KEY
+        self._start_and_poll()
+        # Another web process saved an entry: only the shared version changes.
+        self.redis.incr(JOURNAL_VERSION_KEY.format(user_id=self.user.id))
+        response, delay_mock = self._start_and_poll()
+        self.assertEqual(response['status'], 'processing')
+
+    def test_results_are_not_memoized_without_redis(self):
+        self.redis.get = mock.Mock(side_effect=ConnectionError("Redis is down"))
+        self._start_and_poll()
+        response, delay_mock = self._start_and_poll()
+        self.assertEqual(response['status'], 'processing')
+        self.assertEqual(delay_mock.call_count, 1)
+
+    def test_ai_only_saves_keep_cached_results(self):
+        self._start_and_poll()
+        self.entry.save(update_fields=['ai_mood_processed'])
+        response, delay_mock = self._start_and_poll()
+        delay_mock.assert_not_called()
+
+    def test_suggestions_ignore_response_markers(self):
+        import json
+        url = reverse('ai_services:start_suggestions_analysis')
+        with mock.patch('ai_services.views.generate_life_suggestions_task.delay') as delay_mock, \
+             mock.patch('ai_services.views.AsyncResult') as result_mock:
+            delay_mock.return_value.id = 'task-2'
+            self.client.post(url, json.dumps(self.insights), content_type='application/json')
+            result_mock.return_value.ready.return_value = True
+            result_mock.return_value.successful.return_value = True
+            result_mock.return_value.get.return_value = {'suggestions': ['Take a walk.']}
+            self.client.get(reverse('ai_services:get_suggestions_result'), {'task_id': 'task-2'})
+
+            response = self.client.post(url, json.dumps({**self.insights, 'status': 'SUCCESS', 'cached': True}),
+                                        content_type='application/json')
+        self.assertEqual(delay_mock.call_count, 1)
+        self.assertEqual(response.json()['suggestions'], ['Take a walk.'])
+
+
+class EntryTaskDeduplicationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth import get_user_model
+        from journal.models import JournalEntry
+        cls.user = get_user_model().objects.create_user(username='dedup_user', email='dedup@example.com', password='password123')
+        cls.entry = JournalEntry.objects.create(user=cls.user, content="Went for a long run before work.")
+
+    def setUp(self):
+        caches[RESPONSE_CACHE_ALIAS].clear()
+
+    def test_duplicate_dispatch_reuses_in_flight_task(self):
+        from .idempotency import dispatch_entry_task
+        from .tasks import generate_quote_for_entry_task
+        redis_mock = mock.Mock()
+        redis_mock.get.return_value = None
+        redis_mock.set.return_value = True
+        with mock.patch('ai_services.idempotency.get_redis', return_value=redis_mock), \
+             mock.patch.object(generate_quote_for_entry_task, 'apply_async') as apply_mock:
+            with self.captureOnCommitCallbacks(execute=True):
+                first_id = dispatch_entry_task(generate_quote_for_entry_task, self.entry)
+            redis_mock.get.return_value = first_id.encode('utf-8')
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                second_id = dispatch_entry_task(generate_quote_for_entry_task, self.entry)
+        self.assertEqual(second_id, first_id)
+        self.assertEqual(callbacks, [])
+        apply_mock.assert_called_once()
+        self.assertEqual(apply_mock.call_args.kwargs['task_id'], first_id)
+        self.assertEqual(apply_mock.call_args.kwargs['kwargs'], {'content_hash': self.entry.content_hash})
+
+    def test_rolled_back_dispatch_leaves_no_claim(self):
+        from .idempotency import dispatch_entry_task
+        from .tasks import generate_quote_for_entry_task
+        redis_mock = mock.Mock()
+        redis_mock.get.return_value = None
+        with mock.patch('ai_services.idempotency.get_redis', return_value=redis_mock), \
+             mock.patch.object(generate_quote_for_entry_task, 'apply_async') as apply_mock:
+            # Callbacks captured but not executed: the transaction never commits.
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                dispatch_entry_task(generate_quote_for_entry_task, self.entry)
+        self.assertEqual(len(callbacks), 1)
+        redis_mock.set.assert_not_called()
+        apply_mock.assert_not_called()
+
+    def test_dispatch_losing_the_claim_on_commit_records_the_winner(self):
+        from journal.models import JournalEntry
+        from .idempotency import dispatch_entry_task
+        from .tasks import generate_quote_for_entry_task
+        redis_mock = mock.Mock()
+        redis_mock.get.side_effect = [None, b'concurrent-task']
+        redis_mock.set.return_value = False
+        with mock.patch('ai_services.idempotency.get_redis', return_value=redis_mock), \
+             mock.patch.object(generate_quote_for_entry_task, 'apply_async') as apply_mock, \
+             self.captureOnCommitCallbacks(execute=True):
+            task_id = dispatch_entry_task(generate_quote_for_entry_task, self.entry)
+            JournalEntry.objects.filter(pk=self.entry.pk).update(ai_quote_task_id=task_id)
+        redis_mock.set.assert_called_once()
+        apply_mock.assert_not_called()
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.ai_quote_task_id, 'concurrent-task')
+
+    @override_settings(AI_TASK_DEDUP_ENABLED=False)
+    def test_task_for_changed_content_is_skipped(self):
+        from .tasks import detect_mood_for_entry_task
+        stale_hash = self.entry.content_hash
+        self.entry.content = "Actually, I slept in."
+        self.entry.save()
+        with mock.patch('ai_services.tasks.call_openrouter_api') as api_mock:
+            detect_mood_for_entry_task.apply(args=[self.entry.id], kwargs={'content_hash': stale_hash})
+        api_mock.assert_not_called()
+        self.entry.refresh_from_db()
+        self.assertFalse(self.entry.ai_mood_processed)
+
+    @override_settings(AI_TASK_DEDUP_ENABLED=False)
+    def test_results_superseded_during_the_call_are_discarded(self):
+        from journal.models import JournalEntry
+        from .tasks import analyze_entry_task
+
+        def edit_while_calling(*args, **kwargs):
+            entry = JournalEntry.objects.get(pk=self.entry.pk)
+            entry.content += " Edited."
+            entry.save()
+            return '{"quote": "Keep going. - Anonymous", "mood": "happy", "tags": []}'
+
+        with mock.patch('ai_services.tasks.call_openrouter_api', side_effect=edit_while_calling):
+            analyze_entry_task.apply(args=[self.entry.id], kwargs={'content_hash': self.entry.content_hash})
+        self.entry.refresh_from_db()
+        self.assertIsNone(self.entry.ai_quote)
+        self.assertFalse(self.entry.ai_mood_processed)
+        self.assertFalse(self.entry.tags.exists())
+
+
+class CeleryRoutingTests(TestCase):
+    def _route(self, task_name, **options):
+        from LifeLedger.celery import app
+        route = app.amqp.router.route(options, task_name)
+        return route['queue'].name, route.get('priority')
+
+    def test_entry_and_insights_tasks_use_separate_queues(self):
+        self.assertEqual(self._route('ai_services.tasks.detect_mood_for_entry_task'), ('ai_interactive', 0))
+        self.assertEqual(self._route('ai_services.tasks.analyze_entry_task'), ('ai_interactive', 0))
+        self.assertEqual(self._route('ai_services.tasks.generate_insights_for_period_task'), ('ai_batch', 6))
+        self.assertEqual(self._route('ai_services.tasks.summarize_period_window_task'), ('ai_batch', 6))
+
+    def test_bulk_reprocessing_runs_on_the_batch_queue(self):
+        from django.contrib.auth import get_user_model
+        from journal.models import JournalEntry
+        from .bulk import dispatch_celery_batches
+        user = get_user_model().objects.create_user(username='routing_user', email='routing@example.com', password='password123')
+        JournalEntry.objects.create(user=user, content="Quiet day.")
+        with mock.patch('celery.group.apply_async') as apply_mock:
+            apply_mock.return_value.results = []
+            dispatch_celery_batches(JournalEntry.objects.filter(user=user), task_types=('mood',))
+        self.assertEqual(apply_mock.call_args.kwargs, {'ignore_result': False, 'queue': 'ai_batch', 'priority': 6})
+
+
+class _FakePubSub:
+    def __init__(self, messages, fail=False):
+        self.messages = list(messages)
+        self.fail = fail
+
+    async def subscribe(self, channel):
+        if self.fail:
+            raise ConnectionError("Redis is down")
+        self.channel = channel
+
+    async def get_message(self, ignore_subscribe_messages=True, timeout=None):
+        return {'data': self.messages.pop(0)} if self.messages else None
+
+    async def aclose(self):
+        pass
+
+
+@override_settings(AI_PROGRESS_SSE_ENABLED=True)
+class ProgressStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth import get_user_model
+        from journal.models import JournalEntry
+        cls.user = get_user_model().objects.create_user(username='stream_user', email='stream@example.com', password='password123')
+        cls.entry = JournalEntry.objects.create(user=cls.user, content="Long walk by the river.", ai_quote_processed=True,
+                                                ai_quote="Keep going. - Anonymous")
+
+    async def _stream(self, pubsub):
+        client = mock.Mock(pubsub=mock.Mock(return_value=pubsub), aclose=mock.AsyncMock())
+        await self.async_client.aforce_login(self.user)
+        with mock.patch('ai_services.progress.get_async_redis', return_value=client):
+            response = await self.async_client.get(reverse('journal:ai_service_events', args=[self.entry.id]))
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            body = b''.join([chunk async for chunk in response.streaming_content]).decode('utf-8')
+        events = []
+        for block in body.strip().split('\n\n'):
+            lines = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+            if lines:
+                events.append((lines['event'], json.loads(lines['data'])))
+        return events
+
+    async def test_updates_are_pushed_until_all_done(self):
+        pubsub = _FakePubSub([json.dumps({'mood': {'mood': 'happy'}}),
+                              json.dumps({'tags': {'tags': ['Nature']}})])
+        events = await self._stream(pubsub)
+        self.assertEqual(pubsub.channel, f'ai_progress:entry:{self.entry.id}')
+        self.assertEqual([name for name, _data in events], ['status', 'status', 'status'])
+        first, last = events[0][1], events[-1][1]
+        self.assertEqual(first['task_statuses'], {'quote_status': 'SUCCESS', 'mood_status': 'PENDING', 'tags_status': 'PENDING'})
+        self.assertTrue(last['all_done'])
+        self.assertEqual((last['mood'], last['tags']), ('happy', ['Nature']))
+
+    async def test_unavailable_redis_tells_client_to_poll(self):
+        events = await self._stream(_FakePubSub([], fail=True))
+        self.assertEqual([name for name, _data in events], ['fallback'])
+        self.assertFalse(events[0][1]['all_done'])
+
+    async def test_streams_share_one_async_connection_pool(self):
+        from .redis_client import get_async_redis
+        first, second = get_async_redis(), get_async_redis()
+        self.assertIs(first.connection_pool, second.connection_pool)
+
+    def test_wsgi_requests_are_told_to_poll(self):
+        self.client.force_login(self.user)
+        with mock.patch('ai_services.progress.get_async_redis') as redis_mock:
+            response = self.client.get(reverse('journal:ai_service_events', args=[self.entry.id]))
+        self.assertEqual(response.status_code, 204)
+        redis_mock.assert_not_called()
+
+    @override_settings(AI_PROGRESS_SSE_ENABLED=False)
+    async def test_disabled_streaming_tells_client_to_poll(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('journal:ai_service_events', args=[self.entry.id]))
+        self.assertEqual(response.status_code, 204)
+
+    async def test_other_users_entry_is_not_streamed(self):
+        from django.contrib.auth import get_user_model
+        other = await get_user_model().objects.acreate_user(username='other_stream', email='o@example.com', password='password123')
+        await self.async_client.aforce_login(other)
+        response = await self.async_client.get(reverse('journal:ai_service_events', args=[self.entry.id]))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(AI_TASK_DEDUP_ENABLED=False)
+    def test_tasks_publish_written_results(self):
+        from .tasks import detect_mood_for_entry_task
+        with mock.patch('ai_services.tasks.call_openrouter_api', return_value='happy'), \
+             mock.patch('ai_services.tasks.publish_entry_progress') as publish_mock:
+            detect_mood_for_entry_task.apply(args=[self.entry.id])
+        publish_mock.assert_called_once_with(self.entry.id, mood={'mood': 'happy', 'status': 'success'})
+
+
+class TaskOutcomeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth import get_user_model
+        from journal.models import JournalEntry
+        cls.user = get_user_model().objects.create_user(username='outcome_user', email='outcome@example.com', password='password123')
+        cls.entry = JournalEntry.objects.create(user=cls.user, content="Quiet evening with a book.")
+
+    def _mood_outcome(self, ai_response):
+        from .tasks import detect_mood_for_entry_task
+        caches[RESPONSE_CACHE_ALIAS].clear()
+        with mock.patch('ai_services.tasks.call_openrouter_api', return_value=ai_response), \
+             mock.patch('ai_services.tasks.publish_entry_progress'):
+            detect_mood_for_entry_task.apply(args=[self.entry.id])
+        self.entry.refresh_from_db()
+        return self.entry.ai_mood_status
+
+    def test_tasks_record_success_or_fallback(self):
+        self.assertEqual(self._mood_outcome('calm'), 'success')
+        self.assertIsNotNone(self.entry.ai_mood_completed_at)
+        self.assertEqual(self._mood_outcome('not-a-mood'), 'fallback')
+
+    def test_unhandled_failure_is_recorded(self):
+        from .tasks import generate_quote_for_entry_task
+        with mock.patch('ai_services.tasks.publish_entry_progress') as publish_mock:
+            generate_quote_for_entry_task.on_failure(RuntimeError('boom'), 'failed-task', [self.entry.id], {}, None)
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.ai_quote_status, 'failure')
+        publish_mock.assert_called_once_with(self.entry.id, quote={'status': 'failure'})
+
+
+class _FakeResultRedis:
+    """Just enough of a Redis client for the result sweep and report: {key: [value, ttl]}."""
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.expire = mock.Mock(side_effect=self._expire)
+
+    def _expire(self, key, ttl):
+        self.keys[key][1] = ttl
+
+    def scan_iter(self, match=None, count=None):
+        return iter(list(self.keys))
+
+    def mget(self, keys):
+        return [self.keys[key][0] if key in self.keys else None for key in keys]
+
+    def pipeline(self):
+        client, calls = self, []
+
+        class Pipeline:
+            def __getattr__(self, command):
+                return lambda *args: calls.append((command, args))
+
+            def execute(self):
+                results = {
+                    'ttl': lambda key: client.keys[key][1],
+                    'memory_usage': lambda key: len(client.keys[key][0]) + 50,
+                    'expire': client._expire,
+                    'delete': lambda key: client.keys.pop(key, None),
+                }
+                return [results[command](*args) for command, args in calls]
+        return Pipeline()
+
+
+@override_settings(AI_RESULT_COMPRESSION_MIN_BYTES=1024)
+class ResultBackendTests(TestCase):
+    def setUp(self):
+        from celery import current_app
+        from .result_backend import CompactRedisBackend
+        self.backend = CompactRedisBackend(app=current_app, url='redis://localhost:6379/0', expires=86400)
+
+    def _meta(self, task_name, result='ok'):
+        from celery import states
+        request = mock.Mock(task=task_name, group=None, parent_id=None, children=[])
+        return self.backend.encode(self.backend._get_result_meta(result, states.SUCCESS, None, request))
+
+    def test_large_payloads_are_compressed(self):
+        from .result_backend import COMPRESSED_PREFIX
+        large = {'highlights': ['A long walk by the river.'] * 200}
+        payload = self.backend.encode(large)
+        self.assertTrue(payload.startswith(COMPRESSED_PREFIX))
+        self.assertLess(len(payload), 1024)
+        self.assertEqual(self.backend.decode(payload), large)
+        self.assertFalse(str(self.backend.encode({'small': True})).startswith('zlib:'))
+
+    def test_result_policy_per_task(self):
+        from .tasks import detect_mood_for_entry_task, generate_insights_for_period_task
+        self.assertTrue(detect_mood_for_entry_task.ignore_result)
+        self.assertEqual(self.backend.result_ttl(generate_insights_for_period_task.name), 3600)
+        self.assertIsNone(self.backend.result_ttl(detect_mood_for_entry_task.name))
+        self.assertEqual(self.backend.decode(self._meta(generate_insights_for_period_task.name))['name'],
+                         generate_insights_for_period_task.name)
+
+    def test_sweep_bounds_unexpiring_results(self):
+        from .result_backend import sweep_results
+        client = _FakeResultRedis({
+            'celery-task-meta-mood': [self._meta('ai_services.tasks.detect_mood_for_entry_task'), -1],
+            'celery-task-meta-insights': [self._meta('ai_services.tasks.generate_insights_for_period_task'), -1],
+            'celery-task-meta-fresh': [self._meta('ai_services.tasks.generate_insights_for_period_task'), 100],
+        })
+        self.backend.__dict__['client'] = client
+        counts = sweep_results(self.backend)
+        self.assertEqual(counts, {'scanned': 3, 'expired': 1, 'deleted': 1})
+        self.assertNotIn('celery-task-meta-mood', client.keys)
+        self.assertEqual(client.keys['celery-task-meta-insights'][1], 3600)
+        self.assertEqual(client.keys['celery-task-meta-fresh'][1], 100)
+
+    def test_memory_report_by_task_name(self):
+        from .result_backend import result_memory_report
+        insights = 'ai_services.tasks.generate_insights_for_period_task'
+        client = _FakeResultRedis({
+            'celery-task-meta-a': [self._meta(insights), -1],
+            'celery-task-meta-b': [self._meta(insights), 100],
+            'celery-task-meta-c': [b'{"status": "SUCCESS", "result": null}', 100],
+        })
+        self.backend.__dict__['client'] = client
+        report = result_memory_report(self.backend)
+        self.assertEqual(report[insights]['keys'], 2)
+        self.assertEqual(report[insights]['no_expiry'], 1)
+        self.assertEqual(report['(unnamed)']['keys'], 1)
+        self.assertGreater(report[insights]['bytes'], 0)
+
+
+@override_settings(AI_QUOTA_ENABLED=True, AI_USER_DAILY_TOKEN_QUOTA=1000, AI_GLOBAL_DAILY_TOKEN_QUOTA=5000)
+class UsageQuotaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth import get_user_model
+        User = get_user_model()
+        cls.user = User.objects.create_user(username='quota_user', email='quota@example.com', password='password123')
+        cls.other_user = User.objects.create_user(username='quota_other', email='quota_other@example.com', password='password123')
+
+    def setUp(self):
+        caches[RESPONSE_CACHE_ALIAS].clear()
+        self.client.login(username='quota_user', password='password123')
+
+    def _start_insights(self):
+        with mock.patch('ai_services.views.generate_insights_for_period_task.delay') as delay_mock:
+            delay_mock.return_value.id = 'task-1'
+            response = self.client.post(reverse('ai_services:start_insights_analysis'), {'time_period': 'last_7_days'})
+        return response, delay_mock
+
+    def test_calls_are_metered_per_user_and_day(self):
+        from .models import AIUsageCounter
+        from .tokens import record_usage
+        record_usage('mood_detection', 120, 5, user_id=self.user.id)
+        record_usage('quote_generation', 200, 30, user_id=self.user.id)
+        record_usage('mood_detection', 100, 5)
+        counter = AIUsageCounter.objects.get()
+        self.assertEqual((counter.user, counter.day), (self.user, timezone.localdate()))
+        self.assertEqual((counter.calls, counter.prompt_tokens, counter.completion_tokens), (2, 320, 35))
+
+    def test_user_over_quota_gets_429(self):
+        from .models import AIUsageCounter
+        response, delay_mock = self._start_insights()
+        self.assertEqual(response.status_code, 200)
+
+        AIUsageCounter.objects.create(user=self.user, day=timezone.localdate(), calls=3, prompt_tokens=900, completion_tokens=100)
+        response, delay_mock = self._start_insights()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()['quota'], 'user')
+        self.assertGreater(int(response['Retry-After']), 0)
+        delay_mock.assert_not_called()
+
+    def test_global_quota_applies_to_everyone(self):
+        from .models import AIUsageCounter
+        AIUsageCounter.objects.create(user=self.other_user, day=timezone.localdate(), calls=50, prompt_tokens=5000)
+        AIUsageCounter.objects.create(user=self.user, day=timezone.localdate() - datetime.timedelta(days=1), prompt_tokens=5000)
+        with mock.patch('ai_services.views.generate_life_suggestions_task.delay') as delay_mock:
+            response = self.client.post(reverse('ai_services:start_suggestions_analysis'),
+                                        json.dumps({'highlights': ['A walk'], 'challenges': []}), content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()['quota'], 'global')
+        delay_mock.assert_not_called()
+
+
+class MoodChartDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth import get_user_model
+        from journal.models import JournalEntry
+        cls.user = get_user_model().objects.create_user(username='chart_user', email='chart@example.com', password='password123')
+        for mood in ('sad', 'happy', 'calm', 'happy', None, ''):
+            JournalEntry.objects.create(user=cls.user, content=f"Feeling {mood}.", mood=mood)
+
+    def setUp(self):
+        caches[RESPONSE_CACHE_ALIAS].clear()
+        self.client.login(username='chart_user', password='password123')
+
+    def test_sentiment_counts_are_aggregated_in_one_query(self):
+        from .views import _get_sentiment_data_for_period
+        with self.assertNumQueries(1):
+            data = _get_sentiment_data_for_period(self.user, 'last_7_days')
+        self.assertEqual(data, {'labels': ['happy', 'calm', 'sad'], 'datasets': [{'data': [2, 1, 1]}], 'has_data': True})
+        response = self.client.get(reverse('ai_services:sentiment_chart_data_ajax'), {'time_period': 'all_time'})
+        self.assertEqual(response.json(), data)
+
+    def test_emotional_arc_averages_per_day_in_one_query(self):
+        from journal.models import JournalEntry
+        from .views import _get_emotional_arc_data
+        from .mood_rollups import rebuild_rollups
+        # A queryset update bypasses the signals that maintain the rollups.
+        JournalEntry.objects.filter(user=self.user, mood='sad').update(created_at=timezone.now() - datetime.timedelta(days=2))
+        rebuild_rollups([self.user.pk])
+        with self.assertNumQueries(1):
+            data = _get_emotional_arc_data(self.user, 'last_7_days')
+        series = data['datasets'][0]
+        self.assertEqual(len(data['labels']), 7)
+        self.assertEqual(series['data'], [-1, -1, -1, -1, -1.0, -1, 1.67])
+        self.assertEqual(series['is_interpolated'], [True, True, True, True, False, True, False])
+        self.assertTrue(data['has_data'])
+
+        with self.assertNumQueries(1):
+            all_time = _get_emotional_arc_data(self.user, 'all_time')
+        self.assertEqual(all_time['datasets'][0]['data'], [-1.0, -1, 1.67])
+
+
+class DailyMoodRollupTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        self.user = get_user_model().objects.create_user(username='rollup_user', email='rollup@example.com', password='password123')
+
+    def _rollup(self):
+        from .models import DailyMoodRollup
+        return DailyMoodRollup.objects.filter(user=self.user).values(
+            'day', 'happy_count', 'calm_count', 'sad_count', 'score_sum',
+        ).first()
+
+    def test_entry_saves_and_deletes_maintain_the_days_rollup(self):
+        from journal.models import JournalEntry
+        happy = JournalEntry.objects.create(user=self.user, content="A good day.", mood='happy')
+        sad = JournalEntry.objects.create(user=self.user, content="A bad evening.", mood='sad')
+        JournalEntry.objects.create(user=self.user, content="No mood yet.")
+        self.assertEqual(self._rollup(), {
+            'day': timezone.localdate(), 'happy_count': 1, 'calm_count': 0, 'sad_count': 1, 'score_sum': 1,
+        })
+
+        sad.mood = 'calm'
+        sad.save()
+        self.assertEqual(self._rollup()['calm_count'], 1)
+        self.assertEqual(self._rollup()['score_sum'], 3)
+
+        happy.delete()
+        sad.delete()
+        self.assertIsNone(self._rollup())
+
+    def test_mood_written_by_a_task_update_refreshes_the_rollup(self):
+        from journal.models import JournalEntry
+        from .idempotency import update_if_current
+        entry = JournalEntry.objects.create(user=self.user, content="Quiet afternoon.")
+        self.assertIsNone(self._rollup())
+        self.assertTrue(update_if_current(entry.pk, None, mood='calm', ai_mood_processed=True))
+        self.assertEqual(self._rollup()['calm_count'], 1)
+
+    def test_rebuild_command_regenerates_the_rollups(self):
+        from django.core.management import call_command
+        from journal.models import JournalEntry
+        from .models import DailyMoodRollup
+        JournalEntry.objects.create(user=self.user, content="Happy.", mood='happy')
+        JournalEntry.objects.create(user=self.user, content="Sad.", mood='sad')
+        JournalEntry.objects.filter(user=self.user, mood='sad').update(created_at=timezone.now() - datetime.timedelta(days=3))
+        DailyMoodRollup.objects.filter(user=self.user).update(happy_count=5)
+
+        call_command('rebuild_mood_rollups', '--user', 'rollup_user', stdout=io.StringIO())
+        rows = list(DailyMoodRollup.objects.filter(user=self.user).order_by('day').values_list('day', 'happy_count', 'sad_count', 'score_sum'))
+        today = timezone.localdate()
+        self.assertEqual(rows, [(today - datetime.timedelta(days=3), 0, 1, -1), (today, 1, 0, 2)])
+
+    def test_count_fields_match_the_scored_moods(self):
+        from journal.constants import MOOD_NUMERICAL
+        from .models import DailyMoodRollup
+        from .mood_rollups import MOOD_COUNT_FIELDS
+        model_fields = {f.name for f in DailyMoodRollup._meta.get_fields() if f.name.endswith('_count')}
+        self.assertEqual(model_fields, set(MOOD_COUNT_FIELDS.values()))
+        self.assertEqual(set(MOOD_COUNT_FIELDS), set(MOOD_NUMERICAL))
+
+    def test_moods_without_a_count_field_are_left_out(self):
+        from journal.models import JournalEntry
+        from .mood_rollups import MOOD_COUNT_FIELDS
+        counted = {mood: field for mood, field in MOOD_COUNT_FIELDS.items() if mood != 'angry'}
+        with mock.patch.dict('ai_services.mood_rollups.MOOD_COUNT_FIELDS', counted, clear=True):
+            JournalEntry.objects.create(user=self.user, content="Happy.", mood='happy')
+            JournalEntry.objects.create(user=self.user, content="Angry.", mood='angry')
+        self.assertEqual(self._rollup()['score_sum'], 2)
+
+    def test_migration_backfills_the_rollups(self):
+        import importlib
+        from django.apps import apps
+        from journal.models import JournalEntry
+        from .models import DailyMoodRollup
+        migration = importlib.import_module('ai_services.migrations.0004_dailymoodrollup')
+        JournalEntry.objects.create(user=self.user, content="Happy.", mood='happy')
+        JournalEntry.objects.create(user=self.user, content="Angry.", mood='angry')
+        DailyMoodRollup.objects.all().delete()
+
+        migration.backfill_rollups(apps, None)
+        self.assertEqual(DailyMoodRollup.objects.filter(user=self.user).values('day', 'happy_count', 'angry_count', 'score_sum').get(), {
+            'day': timezone.localdate(), 'happy_count': 1, 'angry_count': 1, 'score_sum': 0,
+        })
+
+
+@skipUnless(timeseries.np is not None, "numpy is not installed")
+class TimeSeriesTests(TestCase):
+    def test_forward_fill_and_smoothing_match_the_day_by_day_definitions(self):
+        np = timeseries.np
+        filled = timeseries.forward_fill(np.array([np.nan, 1.0, np.nan, np.nan, -1.0]))
+        self.assertEqual(filled.tolist(), [1.0, 1.0, 1.0, 1.0, -1.0])
+        self.assertEqual(timeseries.rolling_mean(np.array([3.0, 1.0, 2.0, 0.0]), 2).tolist(), [3.0, 2.0, 1.5, 1.0])
+
+        values = np.sin(np.arange(3000) / 10.0)
+        expected = [values[0]]
+        for value in values[1:]:
+            expected.append(0.05 * value + 0.95 * expected[-1])
+        self.assertTrue(np.allclose(timeseries.ewma(values, 0.05), expected))
+
+    def test_lttb_keeps_the_ends_and_the_extremes(self):
+        np = timeseries.np
+        values = np.zeros(1000)
+        values[500] = 2.0
+        indices = timeseries.lttb(values, 50)
+        self.assertEqual(len(indices), 50)
+        self.assertEqual((indices[0], indices[-1]), (0, 999))
+        self.assertIn(500, indices)
+        self.assertTrue((np.diff(indices) > 0).all())
+
+    def test_emotional_arc_view_smooths_and_downsamples(self):
+        from django.contrib.auth import get_user_model
+        from journal.models import JournalEntry
+        from .mood_rollups import rebuild_rollups
+        user = get_user_model().objects.create_user(username='series_user', email='series@example.com', password='password123')
+        for days_ago, mood in ((600, 'sad'), (300, 'happy'), (0, 'calm')):
+            entry = JournalEntry.objects.create(user=user, content=f"Feeling {mood}.", mood=mood)
+            JournalEntry.objects.filter(pk=entry.pk).update(created_at=timezone.now() - datetime.timedelta(days=days_ago))
+        rebuild_rollups([user.pk])
+        caches[RESPONSE_CACHE_ALIAS].clear()
+        self.client.login(username='series_user', password='password123')
+        url = reverse('ai_services:emotional_arc_data_ajax')
+
+        data = self.client.get(url, {'time_period': 'all_time'}).json()
+        self.assertEqual(len(data['labels']), 601)
+        self.assertEqual(data['labels'][-1], timezone.now().strftime('%b %d'))
+
+        data = self.client.get(url, {'time_period': 'all_time', 'max_points': 100}).json()
+        self.assertEqual(len(data['labels']), 100)
+        self.assertEqual(len(data['datasets'][0]['data']), 100)
+        self.assertEqual(data['datasets'][0]['data'][-1], 1.0)
+
+        data = self.client.get(url, {'time_period': 'last_365_days', 'smoothing': 'rolling', 'window': 2}).json()
+        self.assertEqual(data['datasets'][0]['data'][-3:], [2.0, 2.0, 1.5])
+        self.assertEqual(data['datasets'][0]['is_interpolated'][-3:], [True, True, False])
+
+        data = self.client.get(url, {'time_period': 'last_365_days', 'smoothing': 'bogus', 'window': 'x'}).json()
+        self.assertEqual(data['datasets'][0]['data'][-2:], [2.0, 1.0])
+
+
+@skipUnless(fakeredis is not None, "fakeredis is not installed")
+class ChartCacheTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from journal.models import JournalEntry
+        caches[RESPONSE_CACHE_ALIAS].clear()
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch('ai_services.chart_cache.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = get_user_model().objects.create_user(username='cache_user', email='cache@example.com', password='password123')
+        self.entry = JournalEntry.objects.create(user=self.user, content="A good day.", mood='happy')
+        self.client.login(username='cache_user', password='password123')
+        self.url = reverse('ai_services:sentiment_chart_data_ajax')
+
+    def test_chart_is_cached_and_revalidated_with_etag(self):
+        from . import views
+        with mock.patch.object(views, '_get_sentiment_data_for_period', wraps=views._get_sentiment_data_for_period) as build:
+            response = self.client.get(self.url, {'time_period': 'last_7_days'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['labels'], ['happy'])
+            self.assertIn('private', response['Cache-Control'])
+            self.assertIn('no-cache', response['Cache-Control'])
+            self.assertTrue(response.has_header('Last-Modified'))
+
+            self.assertEqual(self.client.get(self.url, {'time_period': 'last_7_days'}).json(), response.json())
+            not_modified = self.client.get(self.url, {'time_period': 'last_7_days'}, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(not_modified.status_code, 304)
+            not_modified = self.client.get(self.url, {'time_period': 'last_7_days'}, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(build.call_count, 1)
+
+        other_period = self.client.get(self.url, {'time_period': 'all_time'})
+        self.assertNotEqual(other_period['ETag'], response['ETag'])
+
+    def test_chart_version_is_shared_through_redis(self):
+        from .chart_cache import CHART_VERSION_KEY, bump_chart_version
+        key = CHART_VERSION_KEY.format(user_id=self.user.id)
+        first = self.client.get(self.url, {'time_period': 'last_7_days'})
+        version = self.redis.get(key)
+        self.assertIsNotNone(version)
+
+        # As a Celery worker would: the web process sees the bump through Redis.
+        bump_chart_version(self.user.id)
+        self.assertNotEqual(self.redis.get(key), version)
+        response = self.client.get(self.url, {'time_period': 'last_7_days'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_chart_version_is_read_once_per_request(self):
+        with mock.patch.object(self.redis, 'get', wraps=self.redis.get) as get_mock:
+            response = self.client.get(self.url, {'time_period': 'last_7_days'})
+        self.assertTrue(response.has_header('ETag'))
+        self.assertEqual(get_mock.call_count, 1)
+
+    @override_settings(TIME_ZONE='Pacific/Kiritimati')
+    def test_validators_move_at_local_midnight(self):
+        from django.utils import timezone as django_timezone
+        from .chart_cache import CHART_VERSION_KEY
+        # 23:00 and 01:00 in UTC+14, on the same UTC day.
+        before = datetime.datetime(2026, 10, 17, 9, 0, tzinfo=datetime.timezone.utc)
+        after = datetime.datetime(2026, 10, 17, 11, 0, tzinfo=datetime.timezone.utc)
+        self.redis.set(CHART_VERSION_KEY.format(user_id=self.user.id), int(before.timestamp() - 3600) * 10 ** 9)
+        with mock.patch.object(django_timezone, 'now', return_value=before):
+            first = self.client.get(self.url, {'time_period': 'last_7_days'})
+        with mock.patch.object(django_timezone, 'now', return_value=after):
+            response = self.client.get(self.url, {'time_period': 'last_7_days'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response['Last-Modified'], 'Sat, 17 Oct 2026 10:00:00 GMT')
+
+    def test_charts_are_not_cached_without_redis(self):
+        from . import views
+        self.redis.get = mock.Mock(side_effect=ConnectionError("Redis is down"))
+        with mock.patch.object(views, '_get_sentiment_data_for_period', wraps=views._get_sentiment_data_for_period) as build:
+            response = self.client.get(self.url, {'time_period': 'last_7_days'})
+            self.client.get(self.url, {'time_period': 'last_7_days'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertEqual(build.call_count, 2)
+
+    def test_mood_change_invalidates_the_cached_charts(self):
+        first = self.client.get(self.url, {'time_period': 'last_7_days'})
+        arc_url = reverse('ai_services:emotional_arc_data_ajax')
+        first_arc = self.client.get(arc_url, {'time_period': 'last_7_days'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.entry.mood = 'sad'
+            self.entry.save()
+
+        response = self.client.get(self.url, {'time_period': 'last_7_days'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['labels'], ['sad'])
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        arc = self.client.get(arc_url, {'time_period': 'last_7_days'}, HTTP_IF_NONE_MATCH=first_arc['ETag'])
+        self.assertEqual(arc.status_code, 200)
+        self.assertEqual(arc.json()['datasets'][0]['data'][-1], -1.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.entry.save(update_fields=['ai_quote'])
+        self.assertEqual(self.client.get(self.url, {'time_period': 'last_7_days'}, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
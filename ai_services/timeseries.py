@@ -0,0 +1,175 @@
+# ai_services/timeseries.py
+
+"""
+Daily series of the Mood Trends chart (emotional arc).
+
+`build_daily_series` turns the sparse per-day mood averages into one point per
+calendar day: days without entries carry the previous day's value forward
+(days before the first entry take the first value), the series is optionally
+smoothed with a trailing rolling mean or an exponentially weighted moving
+average, and long ranges are downsampled with Largest-Triangle-Three-Buckets
+(LTTB) to at most `max_points` points, which keeps the chart's shape while
+sending a few hundred points instead of thousands. Labels are only formatted
+for the points that are sent.
+
+The work is done with NumPy. Without it the series is filled in plain Python,
+unsmoothed and not downsampled.
+"""
+import calendar
+import datetime
+import logging
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for smoothing and downsampling.
+    np = None
+
+logger = logging.getLogger(__name__)
+
+SMOOTHING_NONE = 'none'
+SMOOTHING_ROLLING = 'rolling'
+SMOOTHING_EWMA = 'ewma'
+SMOOTHING_METHODS = (SMOOTHING_NONE, SMOOTHING_ROLLING, SMOOTHING_EWMA)
+
+DEFAULT_WINDOW = 7
+MAX_WINDOW = 90
+# LTTB keeps the first and last points, so fewer than three leaves nothing to choose.
+MIN_POINTS = 3
+# Largest point count a client may ask for; a decade of days fits.
+MAX_POINTS = 5000
+
+LABEL_FORMAT = '%b %d'
+# English month abbreviations, as strftime('%b') gives in the C locale.
+_MONTH_ABBR = list(calendar.month_abbr)[1:]
+
+
+def build_daily_series(daily_values, start_day, end_day, smoothing=SMOOTHING_NONE, window=DEFAULT_WINDOW, max_points=None):
+    """
+    Builds the chart series from `daily_values` ({day: value}) over
+    [start_day, end_day]. Returns (labels, values, is_interpolated), where a
+    value is None only if no day has one and is_interpolated marks the days
+    without entries.
+    """
+    n_days = (end_day - start_day).days + 1
+    if n_days <= 0:
+        return [], [], []
+    if np is None:
+        if smoothing != SMOOTHING_NONE or max_points:
+            logger.warning("numpy is not installed; the mood trend series is neither smoothed nor downsampled.")
+        return _fill_python(daily_values, start_day, n_days)
+
+    values = np.full(n_days, np.nan)
+    for day, value in daily_values.items():
+        offset = (day - start_day).days
+        if 0 <= offset < n_days:
+            values[offset] = value
+    observed = ~np.isnan(values)
+    if not observed.any():
+        indices = np.arange(n_days)
+        return _labels(start_day, indices), [None] * n_days, [False] * n_days
+
+    filled = forward_fill(values)
+    if smoothing == SMOOTHING_ROLLING:
+        filled = rolling_mean(filled, window)
+    elif smoothing == SMOOTHING_EWMA:
+        filled = ewma(filled, 2.0 / (window + 1))
+
+    indices = lttb(filled, max_points) if max_points else np.arange(n_days)
+    return (
+        _labels(start_day, indices),
+        np.round(filled[indices], 2).tolist(),
+        (~observed[indices]).tolist(),
+    )
+
+
+def forward_fill(values):
+    """Replaces NaNs with the last preceding value; leading NaNs take the first value."""
+    observed = ~np.isnan(values)
+    positions = np.where(observed, np.arange(len(values)), -1)
+    np.maximum.accumulate(positions, out=positions)
+    positions[positions < 0] = np.argmax(observed)
+    return values[positions]
+
+
+def rolling_mean(values, window):
+    """Trailing mean over the last `window` values; the first values average what is available."""
+    window = max(1, min(int(window), len(values)))
+    sums = np.cumsum(values)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / counts
+
+
+def ewma(values, alpha):
+    """
+    Exponentially weighted moving average, y[0] = x[0] and
+    y[t] = alpha * x[t] + (1 - alpha) * y[t-1], in closed form per block.
+    Blocks are short enough for (1 - alpha) ** -length to stay finite.
+    """
+    decay = 1.0 - alpha
+    if decay <= 0:
+        return values.copy()
+    block = max(1, int(600 / -np.log(decay)))
+    smoothed = np.empty_like(values)
+    previous = values[0]
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        powers = decay ** np.arange(1, len(chunk) + 1)
+        smoothed[start:start + len(chunk)] = powers * (previous + alpha * np.cumsum(chunk / powers))
+        previous = smoothed[start + len(chunk) - 1]
+    return smoothed
+
+
+def lttb(values, max_points):
+    """
+    Indices of at most `max_points` points chosen by Largest-Triangle-Three-
+    Buckets, with x the position in the series. The first and last points are
+    always kept; from each bucket in between, the point forming the largest
+    triangle with the previously chosen point and the next bucket's average.
+    """
+    n = len(values)
+    max_points = max(int(max_points), MIN_POINTS)
+    if n <= max_points:
+        return np.arange(n)
+    x = np.arange(n, dtype=float)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    selected = np.empty(max_points, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    chosen = 0
+    for bucket in range(max_points - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        next_lo, next_hi = hi, (edges[bucket + 2] if bucket + 2 < len(edges) else n)
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = values[next_lo:next_hi].mean()
+        areas = np.abs(
+            (x[chosen] - avg_x) * (values[lo:hi] - values[chosen])
+            - (x[chosen] - x[lo:hi]) * (avg_y - values[chosen])
+        )
+        chosen = lo + int(np.argmax(areas))
+        selected[bucket + 1] = chosen
+    return selected
+
+
+def _labels(start_day, indices):
+    """LABEL_FORMAT labels of the days at `indices`, formatted as arrays."""
+    days = np.datetime64(start_day, 'D') + np.asarray(indices, dtype=int)
+    months = days.astype('datetime64[M]')
+    month_names = np.array(_MONTH_ABBR)[months.astype(int) % 12]
+    day_numbers = np.char.zfill(((days - months).astype(int) + 1).astype(str), 2)
+    return np.char.add(np.char.add(month_names, ' '), day_numbers).tolist()
+
+
+def _fill_python(daily_values, start_day, n_days):
+    labels, values, is_interpolated = [], [], []
+    last_value = daily_values[min(daily_values)] if daily_values else None
+    for offset in range(n_days):
+        day = start_day + datetime.timedelta(days=offset)
+        labels.append(day.strftime(LABEL_FORMAT))
+        if day in daily_values:
+            last_value = daily_values[day]
+            values.append(round(last_value, 2))
+            is_interpolated.append(False)
+        else:
+            values.append(round(last_value, 2) if last_value is not None else None)
+            is_interpolated.append(last_value is not None)
+    return labels, values, is_interpolated
@@ -0,0 +1,135 @@
+# ai_services/tokens.py
+
+"""
+Token counting and per-task prompt budgets.
+
+Counts use tiktoken when it is installed and its encoding file can be loaded
+(tiktoken caches it under TIKTOKEN_CACHE_DIR, so pre-populating that directory
+makes this work offline). Otherwise a conservative ~4 characters per token
+estimate is used. The encoder is loaded once per process.
+"""
+import functools
+import logging
+
+from django.conf import settings
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to a character-based estimate.
+    tiktoken = None
+
+from .metrics import incr_counter
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+TRUNCATION_MARKER = '...'
+
+# Token budget of the journal content embedded in each task's prompt.
+DEFAULT_TOKEN_BUDGETS = {
+    'quote_generation': 250,
+    'mood_detection': 375,
+    'tag_suggestion': 500,
+    'entry_analysis': 500,
+    'collective_insights': 6000,
+    'period_summary': 3000,
+    'insights_reduce': 6000,
+    'life_suggestions_generation': 800,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoder(encoding_name):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        logger.warning(f"Could not load tokenizer '{encoding_name}' ({e}). Falling back to estimated token counts.")
+        return None
+
+
+def get_encoder():
+    """Returns the configured tiktoken encoding, or None when it is unavailable."""
+    return _get_encoder(getattr(settings, 'AI_TOKENIZER_ENCODING', 'cl100k_base'))
+
+
+def count_tokens(text):
+    """Returns the number of tokens in `text`."""
+    if not text:
+        return 0
+    encoder = get_encoder()
+    if encoder is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cuts `text` to at most `max_tokens` tokens, marking the cut with an ellipsis."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoder = get_encoder()
+    if encoder is None:
+        return text[:max(0, max_tokens * CHARS_PER_TOKEN - len(TRUNCATION_MARKER))] + TRUNCATION_MARKER
+    tokens = encoder.encode(text, disallowed_special=())
+    return encoder.decode(tokens[:max(0, max_tokens - count_tokens(TRUNCATION_MARKER))]) + TRUNCATION_MARKER
+
+
+def get_token_budget(task_name):
+    """Returns the content token budget of `task_name` (AI_PROMPT_TOKEN_BUDGETS overrides the defaults)."""
+    budgets = dict(DEFAULT_TOKEN_BUDGETS)
+    budgets.update(getattr(settings, 'AI_PROMPT_TOKEN_BUDGETS', {}))
+    return budgets.get(task_name, DEFAULT_TOKEN_BUDGETS['entry_analysis'])
+
+
+def fit_sections(sections, max_tokens):
+    """
+    Trims a list of text sections so that together they fit in `max_tokens`.
+    Short sections are kept whole; the remaining budget is shared equally
+    among the longer ones, each of which is truncated to its share.
+    """
+    counts = [count_tokens(section) for section in sections]
+    if sum(counts) <= max_tokens:
+        return list(sections)
+
+    # Water-filling: raise a common cap until the budget is used up.
+    remaining_budget = max_tokens
+    remaining = len(sections)
+    cap = 0
+    for count in sorted(counts):
+        share = remaining_budget // remaining
+        if count > share:
+            cap = share
+            break
+        remaining_budget -= count
+        remaining -= 1
+    return [section if count <= cap else truncate_to_tokens(section, cap) for section, count in zip(sections, counts)]
+
+
+def record_usage(task_name, prompt_tokens, completion_tokens, user_id=None):
+    """
+    Adds one call's token usage to the per-task and total counters and, for
+    calls made for a user, to the user's daily quota counter.
+    """
+    for prefix in ('tokens', f'tokens.{task_name}'):
+        incr_counter(f'{prefix}.prompt', prompt_tokens)
+        incr_counter(f'{prefix}.completion', completion_tokens)
+    incr_counter(f'tokens.{task_name}.calls')
+    if user_id:
+        from .quotas import record_user_usage
+        record_user_usage(user_id, prompt_tokens, completion_tokens)
+
+
+def usage_from_response(response_data, prompt_text, content):
+    """
+    Returns (prompt_tokens, completion_tokens) for a chat-completions
+    response, preferring the provider's reported `usage` over local counts.
+    """
+    usage = (response_data or {}).get('usage') or {}
+    prompt_tokens = usage.get('prompt_tokens')
+    completion_tokens = usage.get('completion_tokens')
+    if prompt_tokens is None:
+        prompt_tokens = count_tokens(prompt_text)
+    if completion_tokens is None:
+        completion_tokens = count_tokens(content)
+    return prompt_tokens, completion_tokens
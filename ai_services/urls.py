@@ -24,4 +24,7 @@ urlpatterns = [
 
     # API endpoint to poll for the results of the life suggestions task.
     path('suggestions/get-result/', views.GetSuggestionsResultView.as_view(), name='get_suggestions_result'),
+
+    # Staff-only JSON endpoint exposing AI pipeline counters (cache hits/misses, etc.).
+    path('metrics/', views.AIMetricsView.as_view(), name='ai_metrics'),
 ]
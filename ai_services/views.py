@@ -1,31 +1,45 @@
 # ai_services/views.py
 
 from django.views.generic import View, TemplateView
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.http import JsonResponse
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django.utils.translation import gettext as _
-from django.db.models.functions import TruncDay
-from django.db.models import Avg, Count
-from collections import Counter, defaultdict
+from django.db.models import Sum
 import datetime
 import json
 import logging
 
 from celery.result import AsyncResult
 from .tasks import generate_insights_for_period_task, generate_life_suggestions_task
+from .metrics import get_counters
+from .chart_cache import chart_etag, chart_last_modified, get_chart_version, get_or_build_chart
+from .circuit_breaker import get_state as get_circuit_breaker_state
+from .response_cache import get_cache_stats
+from .models import DailyMoodRollup
+from .mood_rollups import MOOD_COUNT_FIELDS
+from .quotas import quota_exceeded, quota_exceeded_response
+from .timeseries import (
+    DEFAULT_WINDOW, MAX_POINTS, MAX_WINDOW, MIN_POINTS, SMOOTHING_METHODS, SMOOTHING_NONE, build_daily_series,
+)
+from .result_cache import (
+    get_cached_result, insights_result_key, remember_pending_task, store_task_result, suggestions_result_key,
+)
 
-from journal.models import JournalEntry
-from journal.constants import MOOD_CHOICES, MOOD_NUMERICAL
+from journal.constants import MOOD_CHOICES
 # Assuming MOOD_VISUALS is not in utils, or just not needed here anymore for colors.
 
 logger = logging.getLogger(__name__)
 
 def _get_start_end_dates(time_period_value):
     """
-    Calculate start and end dates for a given time period identifier.
+    Calculate start and end dates for a given time period identifier, in
+    local time: the rollups' days are local calendar days.
     """
-    end_date = timezone.now()
+    end_date = timezone.localtime()
     start_date = None
     
     valid_periods = ['last_7_days', 'last_30_days', 'last_90_days', 'last_365_days', 'all_time']
@@ -43,26 +57,28 @@ def _get_start_end_dates(time_period_value):
     
     return start_date, end_date
 
+def _get_rollups_for_period(user, start_date, end_date):
+    """The user's daily mood rollups from `start_date` (None: all time) to `end_date`."""
+    rollups = DailyMoodRollup.objects.filter(user=user, day__lte=end_date.date())
+    if start_date:
+        rollups = rollups.filter(day__gte=start_date.date())
+    return rollups
+
+
 def _get_sentiment_data_for_period(user, time_period_value):
     """
     Fetch and process sentiment data for a chart showing mood occurrences.
     This version sends raw mood keys as labels for the frontend to process.
+    Counts are summed over the daily mood rollups, not the entries.
     """
     start_date, end_date = _get_start_end_dates(time_period_value)
     
-    entries_query = JournalEntry.objects.filter(user=user)
-    if start_date:
-        start_of_day = timezone.make_aware(datetime.datetime.combine(start_date.date(), datetime.time.min))
-        end_of_day = timezone.make_aware(datetime.datetime.combine(end_date.date(), datetime.time.max))
-        entries_for_period = entries_query.filter(created_at__gte=start_of_day, created_at__lte=end_of_day)
-    else: 
-        entries_for_period = entries_query.all()
-    
-    mood_counts = Counter(entry.mood for entry in entries_for_period.only('mood') if entry.mood)
+    mood_counts = _get_rollups_for_period(user, start_date, end_date).aggregate(
+        **{mood: Sum(field) for mood, field in MOOD_COUNT_FIELDS.items()}
+    )
     
-    # Sort moods based on the order in MOOD_CHOICES for consistency
-    mood_order = [mood[0] for mood in MOOD_CHOICES]
-    sorted_moods = sorted(mood_counts.items(), key=lambda item: mood_order.index(item[0]) if item[0] in mood_order else -1)
+    # Moods are listed in MOOD_CHOICES order for consistency.
+    sorted_moods = [(mood_key, mood_counts.get(mood_key)) for mood_key, _label in MOOD_CHOICES if mood_counts.get(mood_key)]
     
     # **CHANGE**: Send the raw mood key (e.g., 'happy') as the label.
     # The frontend (JavaScript) will be responsible for translating this to a display name and color.
@@ -77,67 +93,45 @@ def _get_sentiment_data_for_period(user, time_period_value):
         'has_data': bool(chart_data_values)
     }
 
-def _get_emotional_arc_data(user, time_period_value):
+
+def _get_daily_mood_averages(user, start_date=None, end_date=None):
+    """
+    Returns [(day, average mood score, entry count)] in date order, read
+    from the daily mood rollups (one row per day with a scored mood).
+    """
+    end_date = end_date or timezone.localtime()
+    daily = _get_rollups_for_period(user, start_date, end_date).order_by('day').values_list(
+        'day', 'score_sum', *MOOD_COUNT_FIELDS.values()
+    )
+    series = []
+    for day, score_sum, *counts in daily:
+        count = sum(counts)
+        if count:
+            series.append((day, score_sum / count, count))
+    return series
+
+
+def _get_emotional_arc_data(user, time_period_value, smoothing=SMOOTHING_NONE, window=DEFAULT_WINDOW, max_points=None):
     """
     Fetch and process daily mood averages for the Mood Trends line chart.
+    For 'all_time' the chart starts on the first day with a scored mood.
+    Days without entries carry the last mood forward; the series can be
+    smoothed and downsampled to `max_points` (see timeseries.py).
     """
     start_date, end_date = _get_start_end_dates(time_period_value)
 
+    daily_series = _get_daily_mood_averages(user, start_date, end_date)
     if not start_date:
-        first_entry = JournalEntry.objects.filter(user=user).order_by('created_at').first()
-        if not first_entry:
+        if not daily_series:
             return {'has_data': False}
-        start_date = first_entry.created_at
+        start_day = daily_series[0][0]
+    else:
+        start_day = start_date.date()
 
-    # Ensure date_range starts from the beginning of the day
-    start_date_midnight = timezone.make_aware(datetime.datetime.combine(start_date.date(), datetime.time.min))
-    date_range = [start_date_midnight.date() + datetime.timedelta(days=x) for x in range((end_date.date() - start_date_midnight.date()).days + 1)]
-    
-    entries = JournalEntry.objects.filter(
-        user=user, 
-        created_at__date__gte=start_date_midnight.date(), 
-        created_at__date__lte=end_date.date()
-    ).exclude(mood__isnull=True).exclude(mood__exact='').order_by('created_at')
-
-    # Map entries to mood scores
-    entries_with_mood_value = []
-    for entry in entries:
-        mood_score = MOOD_NUMERICAL.get(entry.mood)
-        if mood_score is not None:
-            entries_with_mood_value.append({
-                'date': entry.created_at.date(),
-                'score': mood_score
-            })
-
-    # Aggregate daily mood averages
-    daily_moods = defaultdict(lambda: {'sum': 0, 'count': 0})
-    for entry in entries_with_mood_value:
-        day = entry['date']
-        daily_moods[day]['sum'] += entry['score']
-        daily_moods[day]['count'] += 1
-
-    # Prepare chart data with interpolation
-    chart_labels = [day.strftime('%b %d') for day in date_range]
-    chart_data = []
-    is_interpolated = []
-    last_valid_mood = None
-
-    # Find the first valid mood in the range to start interpolation
-    for day in date_range:
-         if day in daily_moods:
-            last_valid_mood = daily_moods[day]['sum'] / daily_moods[day]['count']
-            break
-
-    for day in date_range:
-        if day in daily_moods:
-            avg_mood = daily_moods[day]['sum'] / daily_moods[day]['count']
-            chart_data.append(round(avg_mood, 2))
-            is_interpolated.append(False)
-            last_valid_mood = avg_mood
-        else:
-            # Interpolate by carrying forward the last known mood
-            chart_data.append(last_valid_mood)
-            is_interpolated.append(True if last_valid_mood is not None else False)
+    daily_moods = {day: avg_score for day, avg_score, _count in daily_series}
+    chart_labels, chart_data, is_interpolated = build_daily_series(
+        daily_moods, start_day, end_date.date(), smoothing=smoothing, window=window, max_points=max_points,
+    )
 
     return {
         'labels': chart_labels,
@@ -146,6 +140,15 @@ def _get_emotional_arc_data(user, time_period_value):
     }
 
 
+def _int_param(request, name, default, minimum, maximum):
+    """An integer query parameter clamped to [minimum, maximum]; the default if missing or invalid."""
+    try:
+        value = int(request.GET.get(name, default))
+    except (TypeError, ValueError):
+        return default
+    return max(minimum, min(value, maximum))
+
+
 class AIInsightsDashboardView(LoginRequiredMixin, TemplateView):
     template_name = 'ai_services/ai_insights_dashboard.html'
 
@@ -171,27 +174,114 @@ class AIInsightsDashboardView(LoginRequiredMixin, TemplateView):
         logger.info(f"AIInsightsDashboardView loaded for user {request.user.username}, period: {selected_period}")
         return context
 
+def _sentiment_chart_params(request):
+    return {'time_period': request.GET.get('time_period', 'last_30_days')}
+
+
+def _arc_chart_params(request):
+    smoothing = request.GET.get('smoothing', SMOOTHING_NONE)
+    if smoothing not in SMOOTHING_METHODS:
+        smoothing = SMOOTHING_NONE
+    max_points = _int_param(request, 'max_points', 0, 0, MAX_POINTS)
+    return {
+        'time_period': request.GET.get('time_period', 'last_30_days'),
+        'smoothing': smoothing,
+        'window': _int_param(request, 'window', DEFAULT_WINDOW, 1, MAX_WINDOW),
+        'max_points': max(max_points, MIN_POINTS) if max_points else 0,
+    }
+
+
+def _chart_version(request):
+    # Read once per request, so the validators and the cached data agree on one version.
+    if not hasattr(request, '_chart_version'):
+        request._chart_version = get_chart_version(request.user.pk)
+    return request._chart_version
+
+
+def _sentiment_chart_etag(request, *args, **kwargs):
+    return chart_etag('sentiment', request.user.pk, _sentiment_chart_params(request), _chart_version(request))
+
+
+def _arc_chart_etag(request, *args, **kwargs):
+    return chart_etag('arc', request.user.pk, _arc_chart_params(request), _chart_version(request))
+
+
+def _chart_last_modified(request, *args, **kwargs):
+    return chart_last_modified(_chart_version(request))
+
+
+def _chart_response(chart_data):
+    # Browsers keep the data but revalidate it (ETag / Last-Modified) on every use.
+    response = JsonResponse(chart_data)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 class SentimentChartDataView(LoginRequiredMixin, View):
-    """Provide JSON data for the sentiment chart via AJAX."""
+    """
+    Provide JSON data for the sentiment chart via AJAX. Responses are cached
+    per user and period until the user's moods change (see chart_cache.py).
+    """
+    @method_decorator(condition(
+        etag_func=_sentiment_chart_etag,
+        last_modified_func=_chart_last_modified,
+    ))
     def get(self, request, *args, **kwargs):
-        time_period = request.GET.get('time_period', 'last_30_days')
-        chart_data = _get_sentiment_data_for_period(request.user, time_period)
-        return JsonResponse(chart_data)
+        params = _sentiment_chart_params(request)
+        chart_data = get_or_build_chart(
+            'sentiment', request.user.pk, params, _chart_version(request),
+            lambda: _get_sentiment_data_for_period(request.user, params['time_period']),
+        )
+        return _chart_response(chart_data)
 
 class EmotionalArcDataView(LoginRequiredMixin, View):
-    """Provide JSON data for the Mood Trends line chart via AJAX."""
+    """
+    Provide JSON data for the Mood Trends line chart via AJAX.
+    Optional query parameters: `smoothing` ('none', 'rolling' or 'ewma'),
+    `window` (days averaged, or the EWMA span) and `max_points` (downsample
+    longer series to this many points; 0 keeps every day). Responses are
+    cached like the sentiment chart's.
+    """
+    @method_decorator(condition(
+        etag_func=_arc_chart_etag,
+        last_modified_func=_chart_last_modified,
+    ))
     def get(self, request, *args, **kwargs):
-        time_period = request.GET.get('time_period', 'last_30_days')
-        chart_data = _get_emotional_arc_data(request.user, time_period)
-        return JsonResponse(chart_data)
+        params = _arc_chart_params(request)
+        chart_data = get_or_build_chart(
+            'arc', request.user.pk, params, _chart_version(request), lambda: _get_emotional_arc_data(
+                request.user, params['time_period'],
+                smoothing=params['smoothing'], window=params['window'], max_points=params['max_points'],
+            ),
+        )
+        return _chart_response(chart_data)
+
+def _wants_force_refresh(request):
+    value = request.POST.get('force_refresh') or request.GET.get('force_refresh') or ''
+    return value.lower() in ('1', 'true', 'yes')
 
 class StartInsightsAnalysisView(LoginRequiredMixin, View):
-    """Start the Celery task for generating collective insights."""
+    """
+    Start the Celery task for generating collective insights, unless the same
+    period was analysed since the user's last entry change: then the memoized
+    result is returned at once with `cached: true`. Pass `force_refresh=1` to
+    always run a new analysis. New analyses are refused with 429 while the
+    user's daily AI quota is used up (see quotas.py).
+    """
     def post(self, request, *args, **kwargs):
         time_period = request.POST.get('time_period')
         if not time_period:
             return JsonResponse({'status': 'error', 'message': 'Time period is required.'}, status=400)
+        cache_key = insights_result_key(request.user.id, time_period)
+        if not _wants_force_refresh(request):
+            cached_result = get_cached_result(cache_key)
+            if cached_result is not None:
+                return JsonResponse({**cached_result, 'status': 'SUCCESS', 'cached': True})
+        exceeded = quota_exceeded(request.user.id)
+        if exceeded:
+            return quota_exceeded_response(exceeded)
         task = generate_insights_for_period_task.delay(request.user.id, time_period)
+        remember_pending_task(task.id, cache_key)
         return JsonResponse({'status': 'processing', 'task_id': task.id})
 
 class GetInsightsResultView(LoginRequiredMixin, View):
@@ -205,7 +295,9 @@ class GetInsightsResultView(LoginRequiredMixin, View):
         if task_result.ready():
             if task_result.successful():
                 result = task_result.get()
+                store_task_result(task_id, result)
                 result['status'] = 'SUCCESS'
+                result['cached'] = False
                 return JsonResponse(result)
             else:
                 logger.error(f"Task {task_id} for insights failed: {task_result.info}")
@@ -214,7 +306,11 @@ class GetInsightsResultView(LoginRequiredMixin, View):
             return JsonResponse({'status': task_result.state})
 
 class StartSuggestionsAnalysisView(LoginRequiredMixin, View):
-    """Start the Celery task for generating life suggestions."""
+    """
+    Start the Celery task for generating life suggestions, or return the
+    memoized suggestions for the same insights (see StartInsightsAnalysisView;
+    `force_refresh=1` goes in the query string here).
+    """
     def post(self, request, *args, **kwargs):
         try:
             insights_data = json.loads(request.body)
@@ -223,7 +319,16 @@ class StartSuggestionsAnalysisView(LoginRequiredMixin, View):
         except json.JSONDecodeError:
             return JsonResponse({'status': 'error', 'message': 'Invalid JSON payload.'}, status=400)
 
+        cache_key = suggestions_result_key(request.user.id, insights_data)
+        if not _wants_force_refresh(request):
+            cached_result = get_cached_result(cache_key)
+            if cached_result is not None:
+                return JsonResponse({**cached_result, 'status': 'SUCCESS', 'cached': True})
+        exceeded = quota_exceeded(request.user.id)
+        if exceeded:
+            return quota_exceeded_response(exceeded)
         task = generate_life_suggestions_task.delay(request.user.id, insights_data)
+        remember_pending_task(task.id, cache_key)
         return JsonResponse({'status': 'processing', 'task_id': task.id})
 
 class GetSuggestionsResultView(LoginRequiredMixin, View):
@@ -237,10 +342,24 @@ class GetSuggestionsResultView(LoginRequiredMixin, View):
         if task_result.ready():
             if task_result.successful():
                 result = task_result.get()
+                store_task_result(task_id, result)
                 result['status'] = 'SUCCESS'
+                result['cached'] = False
                 return JsonResponse(result)
             else:
                 logger.error(f"Suggestions Task {task_id} failed: {task_result.info}")
                 return JsonResponse({'status': 'FAILURE', 'message': 'Suggestion generation failed.'}, status=500)
         else:
             return JsonResponse({'status': task_result.state})
+
+class AIMetricsView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Expose AI pipeline counters (cache hit ratio, breaker transitions, ...) as JSON for staff users."""
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({
+            'counters': get_counters(),
+            'response_cache': get_cache_stats(),
+            'circuit_breaker': get_circuit_breaker_state(),
+        })
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0010_alter_journalattachment_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journalentry',
+            name='ai_model',
+            field=models.CharField(blank=True, help_text='AI model that last processed this entry.', max_length=100, null=True),
+        ),
+    ]
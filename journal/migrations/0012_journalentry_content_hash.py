@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:40
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def compute_content_hash(content):
+    # Same as journal.models.compute_content_hash at the time of this migration.
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+
+def populate_content_hashes(apps, schema_editor):
+    JournalEntry = apps.get_model('journal', 'JournalEntry')
+    batch = []
+    for entry in JournalEntry.objects.only('pk', 'content').iterator(chunk_size=500):
+        entry.content_hash = compute_content_hash(entry.content)
+        batch.append(entry)
+        if len(batch) >= 500:
+            JournalEntry.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    if batch:
+        JournalEntry.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0011_journalentry_ai_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journalentry',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', help_text='Hash of the current content. AI tasks only write their results while it still matches the content they analysed.', max_length=64),
+        ),
+        migrations.RunPython(populate_content_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:45
+
+from django.db import migrations, models
+
+
+def mark_processed_entries_successful(apps, schema_editor):
+    JournalEntry = apps.get_model('journal', 'JournalEntry')
+    for part in ('quote', 'mood', 'tags'):
+        JournalEntry.objects.filter(**{f'ai_{part}_processed': True}).update(**{f'ai_{part}_status': 'success'})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0012_journalentry_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journalentry',
+            name='ai_mood_completed_at',
+            field=models.DateTimeField(blank=True, help_text='When the last AI mood detection finished.', null=True),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='ai_mood_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('success', 'Success'), ('fallback', 'Fallback'), ('failure', 'Failure')], default='pending', help_text='Outcome of the last AI mood detection.', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='ai_quote_completed_at',
+            field=models.DateTimeField(blank=True, help_text='When the last AI quote generation finished.', null=True),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='ai_quote_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('success', 'Success'), ('fallback', 'Fallback'), ('failure', 'Failure')], default='pending', help_text='Outcome of the last AI quote generation.', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='ai_tags_completed_at',
+            field=models.DateTimeField(blank=True, help_text='When the last AI tag suggestion finished.', null=True),
+        ),
+        migrations.AddField(
+            model_name='journalentry',
+            name='ai_tags_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('success', 'Success'), ('fallback', 'Fallback'), ('failure', 'Failure')], default='pending', help_text='Outcome of the last AI tag suggestion.', max_length=10),
+        ),
+        migrations.RunPython(mark_processed_entries_successful, migrations.RunPython.noop),
+    ]
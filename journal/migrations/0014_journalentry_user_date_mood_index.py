@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0013_journalentry_ai_task_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['user', 'created_at', 'mood'], name='journal_entry_user_date_mood'),
+        ),
+    ]
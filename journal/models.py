@@ -5,6 +5,7 @@ from django.conf import settings
 from django.utils import timezone
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
+import hashlib
 import os
 import logging
 from uuid import uuid4
@@ -57,6 +58,19 @@ def user_directory_path(instance, filename):
     return f'user_{user_id}/journal_attachments/{year}/{month}/{day}/{unique_filename}'
 
 
+AI_TASK_STATUS_CHOICES = [
+    ('pending', _('Pending')),
+    ('success', _('Success')),
+    ('fallback', _('Fallback')),
+    ('failure', _('Failure')),
+]
+
+
+def compute_content_hash(content):
+    """Returns the SHA-256 hex digest identifying a version of an entry's content."""
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+
 class JournalEntry(models.Model):
     """
     Represents a single journal entry made by a user.
@@ -113,11 +127,26 @@ class JournalEntry(models.Model):
     ai_quote_processed = models.BooleanField(default=False, help_text="True if AI quote generation has been processed for this version.")
     ai_mood_processed = models.BooleanField(default=False, help_text="True if AI mood detection has been processed for this version.")
     ai_tags_processed = models.BooleanField(default=False, help_text="True if AI tag suggestion has been processed for this version.")
+    ai_model = models.CharField(max_length=100, blank=True, null=True, help_text="AI model that last processed this entry.")
+
+    # Terminal outcome of each AI task, recorded by the task itself together with its result.
+    ai_quote_status = models.CharField(max_length=10, choices=AI_TASK_STATUS_CHOICES, default='pending', help_text="Outcome of the last AI quote generation.")
+    ai_mood_status = models.CharField(max_length=10, choices=AI_TASK_STATUS_CHOICES, default='pending', help_text="Outcome of the last AI mood detection.")
+    ai_tags_status = models.CharField(max_length=10, choices=AI_TASK_STATUS_CHOICES, default='pending', help_text="Outcome of the last AI tag suggestion.")
+    ai_quote_completed_at = models.DateTimeField(blank=True, null=True, help_text="When the last AI quote generation finished.")
+    ai_mood_completed_at = models.DateTimeField(blank=True, null=True, help_text="When the last AI mood detection finished.")
+    ai_tags_completed_at = models.DateTimeField(blank=True, null=True, help_text="When the last AI tag suggestion finished.")
+    content_hash = models.CharField(max_length=64, blank=True, default='', help_text="Hash of the current content. AI tasks only write their results while it still matches the content they analysed.")
 
     class Meta:
         ordering = ['-created_at']
         verbose_name = _("Journal Entry")
         verbose_name_plural = _("Journal Entries")
+        indexes = [
+            # Per-user date-range scans of the dashboard charts; mood is included so that
+            # the mood aggregations are answered from the index alone.
+            models.Index(fields=['user', 'created_at', 'mood'], name='journal_entry_user_date_mood'),
+        ]
 
     def __str__(self):
         if self.title:
@@ -128,6 +157,14 @@ class JournalEntry(models.Model):
         """Returns the URL to access a detail record for this journal entry."""
         return reverse('journal:journal_detail', kwargs={'pk': self.pk})
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.content_hash = compute_content_hash(self.content)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'content_hash'}
+        super().save(*args, **kwargs)
+
     def get_image_attachments(self):
         """Returns a queryset of attachments that are images."""
         return self.attachments.filter(file_type='image').order_by('uploaded_at')
@@ -4,6 +4,7 @@ import os
 import shutil
 import uuid 
 import logging
+from unittest import mock
 
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
@@ -398,4 +399,95 @@ class JournalViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json()['status'], 'success')
         with self.assertRaises(JournalEntry.DoesNotExist):
-            JournalEntry.objects.get(pk=pk_to_delete)
\ No newline at end of file
+            JournalEntry.objects.get(pk=pk_to_delete)
+
+class AIStatusViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='status_user', email='status_user@example.com', password='password123')
+        cls.other_user = User.objects.create_user(username='status_other', email='status_other@example.com', password='password123')
+        cls.done_entry = JournalEntry.objects.create(
+            user=cls.user, content="All done.", ai_quote_processed=True, ai_mood_processed=True, ai_tags_processed=True,
+        )
+        cls.running_entry = JournalEntry.objects.create(
+            user=cls.user, content="Still running.", ai_quote_processed=True,
+            ai_mood_task_id='mood-task', ai_tags_task_id='tags-task',
+        )
+        cls.other_entry = JournalEntry.objects.create(user=cls.other_user, content="Not yours.")
+
+    def setUp(self):
+        self.client.login(username='status_user', password='password123')
+
+    def test_batch_status_is_read_from_the_entries(self):
+        JournalEntry.objects.filter(pk=self.running_entry.pk).update(ai_mood_status='failure')
+        ids = f'{self.done_entry.id},{self.running_entry.id},{self.other_entry.id}'
+        with mock.patch('celery.result.AsyncResult') as async_result_mock, self.assertNumQueries(4):
+            response = self.client.get(reverse('journal:ai_service_batch_status'), {'ids': ids})
+        self.assertEqual(response.status_code, 200)
+        entries = response.json()['entries']
+        self.assertEqual(set(entries), {str(self.done_entry.id), str(self.running_entry.id)})
+        self.assertTrue(entries[str(self.done_entry.id)]['all_done'])
+        self.assertEqual(entries[str(self.running_entry.id)]['task_statuses'],
+                         {'quote_status': 'SUCCESS', 'mood_status': 'FAILURE', 'tags_status': 'PENDING'})
+        async_result_mock.assert_not_called()
+
+    def test_status_is_read_from_the_entry(self):
+        JournalEntry.objects.filter(pk=self.running_entry.pk).update(ai_mood_status='failure', ai_tags_status='fallback')
+        with mock.patch('celery.result.AsyncResult') as async_result_mock, self.assertNumQueries(4):
+            response = self.client.get(reverse('journal:ai_service_status', args=[self.running_entry.id]))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['task_statuses'], {'quote_status': 'SUCCESS', 'mood_status': 'FAILURE', 'tags_status': 'FALLBACK'})
+        self.assertTrue(data['all_done'])
+        async_result_mock.assert_not_called()
+
+    def test_status_of_another_users_entry_is_not_found(self):
+        response = self.client.get(reverse('journal:ai_service_status', args=[self.other_entry.id]))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(AI_QUOTA_ENABLED=True, AI_USER_DAILY_TOKEN_QUOTA=1000)
+    def test_entry_over_quota_is_saved_without_ai_tasks(self):
+        from ai_services.models import AIUsageCounter
+        AIUsageCounter.objects.create(user=self.user, day=timezone.localdate(), calls=1, prompt_tokens=1000)
+        form_data = {
+            'title': 'Over quota', 'content': 'Saved anyway.', 'mood': '', 'privacy_level': 'private',
+            'attachments-TOTAL_FORMS': '0', 'attachments-INITIAL_FORMS': '0', 'attachments-MAX_NUM_FORMS': '',
+        }
+        with mock.patch('journal.views.dispatch_entry_task') as dispatch_mock:
+            response = self.client.post(reverse('journal:journal_create'), form_data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 429)
+        dispatch_mock.assert_not_called()
+        entry = JournalEntry.objects.get(title='Over quota')
+        self.assertEqual(response.json()['entry_id'], entry.id)
+        self.assertFalse(entry.ai_mood_processed)
+        self.assertEqual(entry.ai_mood_status, 'failure')
+
+    @override_settings(AI_QUOTA_ENABLED=True, AI_USER_DAILY_TOKEN_QUOTA=1000)
+    def test_edit_over_quota_keeps_the_ai_results(self):
+        from ai_services.models import AIUsageCounter
+        entry = JournalEntry.objects.create(
+            user=self.user, title='Analysed', content='A calm morning.', mood='calm',
+            ai_quote='Be still. - Anonymous', ai_quote_processed=True, ai_quote_status='success',
+            ai_mood_processed=True, ai_mood_status='success',
+        )
+        AIUsageCounter.objects.create(user=self.user, day=timezone.localdate(), calls=1, prompt_tokens=1000)
+        form_data = {
+            'title': 'Analysed', 'content': 'A calm morning!', 'mood': 'calm', 'privacy_level': 'private',
+            'attachments-TOTAL_FORMS': '0', 'attachments-INITIAL_FORMS': '0', 'attachments-MAX_NUM_FORMS': '',
+        }
+        with mock.patch('journal.views.dispatch_entry_task') as dispatch_mock:
+            response = self.client.post(reverse('journal:journal_update', kwargs={'pk': entry.pk}), form_data,
+                                        HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 429)
+        dispatch_mock.assert_not_called()
+        entry.refresh_from_db()
+        self.assertEqual(entry.content, 'A calm morning!')
+        self.assertEqual((entry.ai_quote, entry.ai_quote_status), ('Be still. - Anonymous', 'success'))
+        self.assertEqual((entry.mood, entry.ai_mood_status), ('calm', 'success'))
+
+    @override_settings(AI_STATUS_BATCH_MAX=2)
+    def test_batch_status_rejects_invalid_or_too_many_ids(self):
+        url = reverse('journal:ai_service_batch_status')
+        self.assertEqual(self.client.get(url, {'ids': '1,x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'ids': '1,2,3'}).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 400)
@@ -16,4 +16,8 @@ urlpatterns = [
     # URL for polling the status of AI tasks for a *single* entry.
     # This remains in 'journal' as it's tightly coupled with the entry creation/update flow.
     path('entry/<int:entry_id>/ai-status/', views.AIServiceStatusView.as_view(), name='ai_service_status'),
+    # Statuses of many entries in one request (?ids=1,2,3), for processing badges on list pages.
+    path('entries/ai-status/', views.AIServiceBatchStatusView.as_view(), name='ai_service_batch_status'),
+    # Server-Sent Events stream of the same statuses, pushed as the AI tasks finish.
+    path('entry/<int:entry_id>/ai-events/', views.AIServiceEventsView.as_view(), name='ai_service_events'),
 ]
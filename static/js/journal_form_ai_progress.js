@@ -1,7 +1,9 @@
 /**
  * Handles the AI processing progress modal for the journal entry form.
  * This script intercepts the form submission, shows a progress modal,
- * and polls the backend for the status of asynchronous AI tasks.
+ * and follows the status of the asynchronous AI tasks. Updates are pushed
+ * over Server-Sent Events; when streaming is unavailable it falls back to
+ * polling the status endpoint.
  */
 document.addEventListener("DOMContentLoaded", function () {
   const journalForm = document.getElementById("journal-entry-form");
@@ -97,6 +99,10 @@ document.addEventListener("DOMContentLoaded", function () {
         statusText = "Done";
         statusIcon = "<i class='fas fa-check-circle text-green-500 ml-1'></i>";
         textColor = "text-green-600 dark:text-green-400";
+      } else if (status === "FALLBACK") {
+        statusText = "Done (fallback)";
+        statusIcon = "<i class='fas fa-check-circle text-yellow-500 ml-1'></i>";
+        textColor = "text-yellow-600 dark:text-yellow-400";
       } else if (status === "FAILURE") {
         statusText = "Failed";
         statusIcon = "<i class='fas fa-times-circle text-red-500 ml-1'></i>";
@@ -139,6 +145,45 @@ document.addEventListener("DOMContentLoaded", function () {
       progressPercentageText.textContent = `${percentage}%`;
   }
 
+  /**
+   * Renders one status object (from the stream or a poll).
+   * Returns true once every task is done.
+   */
+  function applyTaskStatus(data, redirectUrl) {
+    let completedCount = 0;
+    let hasFailure = false;
+    const taskTypes = ["quote", "mood", "tags"];
+
+    taskTypes.forEach((taskType) => {
+      const status = data.task_statuses[`${taskType}_status`];
+      updateTaskStatusUI(taskType, status);
+      if (
+        status === "SUCCESS" ||
+        status === "FALLBACK" ||
+        status === "FAILURE" ||
+        status === "DISABLED_BY_USER"
+      ) {
+        completedCount++;
+        if (status === "FAILURE") hasFailure = true;
+      }
+    });
+
+    updateOverallProgressUI(completedCount, totalAiTasks, hasFailure);
+
+    if (data.all_done) {
+      spinner.classList.add("hidden");
+      progressTitle.textContent = hasFailure
+        ? "Processing Partially Complete"
+        : "Enhancements Complete!";
+      successMessageDiv.classList.remove("hidden");
+      setTimeout(
+        () => (window.location.href = redirectUrl),
+        hasFailure ? 3000 : 1500
+      );
+    }
+    return data.all_done;
+  }
+
   async function pollTaskStatus(entryId, redirectUrl) {
     const statusUrl = `/journal/entry/${entryId}/ai-status/`;
     let attempts = 0;
@@ -159,36 +204,8 @@ document.addEventListener("DOMContentLoaded", function () {
         if (data.status !== "ok")
           throw new Error(data.message || "Status check failed.");
 
-        let completedCount = 0;
-        let hasFailure = false;
-        const taskTypes = ["quote", "mood", "tags"];
-
-        taskTypes.forEach((taskType) => {
-          const status = data.task_statuses[`${taskType}_status`];
-          updateTaskStatusUI(taskType, status);
-          if (
-            status === "SUCCESS" ||
-            status === "FAILURE" ||
-            status === "DISABLED_BY_USER"
-          ) {
-            completedCount++;
-            if (status === "FAILURE") hasFailure = true;
-          }
-        });
-
-        updateOverallProgressUI(completedCount, totalAiTasks, hasFailure);
-
-        if (data.all_done) {
+        if (applyTaskStatus(data, redirectUrl)) {
           clearInterval(pollingInterval);
-          spinner.classList.add("hidden");
-          progressTitle.textContent = hasFailure
-            ? "Processing Partially Complete"
-            : "Enhancements Complete!";
-          successMessageDiv.classList.remove("hidden");
-          setTimeout(
-            () => (window.location.href = redirectUrl),
-            hasFailure ? 3000 : 1500
-          );
         }
       } catch (error) {
         console.error("Polling error:", error);
@@ -196,6 +213,42 @@ document.addEventListener("DOMContentLoaded", function () {
     }, 3000);
   }
 
+  function streamTaskStatus(entryId, redirectUrl) {
+    if (!window.EventSource) {
+      pollTaskStatus(entryId, redirectUrl);
+      return;
+    }
+    const source = new EventSource(`/journal/entry/${entryId}/ai-events/`);
+    let finished = false;
+
+    function fallBackToPolling() {
+      source.close();
+      if (!finished) {
+        finished = true;
+        pollTaskStatus(entryId, redirectUrl);
+      }
+    }
+
+    source.addEventListener("status", (event) => {
+      if (applyTaskStatus(JSON.parse(event.data), redirectUrl)) {
+        finished = true;
+        source.close();
+      }
+    });
+    // Sent when the server cannot stream, or the stream ended before all tasks were done.
+    source.addEventListener("fallback", (event) => {
+      if (applyTaskStatus(JSON.parse(event.data), redirectUrl)) {
+        finished = true;
+        source.close();
+      } else {
+        fallBackToPolling();
+      }
+    });
+    // Also fired when the server answers 204 (no streaming). EventSource would reconnect on
+    // its own after other errors; the status endpoint is the cheaper recovery.
+    source.onerror = fallBackToPolling;
+  }
+
   if (journalForm) {
     journalForm.addEventListener("submit", async function (event) {
       event.preventDefault();
@@ -226,6 +279,18 @@ document.addEventListener("DOMContentLoaded", function () {
         if (contentType && contentType.indexOf("application/json") !== -1) {
           const responseData = await response.json();
 
+          if (response.status === 429 && responseData.redirect_url) {
+            // Saved, but the daily AI quota is used up: no enhancements this time.
+            progressTitle.textContent = "Entry Saved";
+            progressMessage.innerHTML = `<span class="text-yellow-600 dark:text-yellow-400">${responseData.message}</span>`;
+            spinner.classList.add("hidden");
+            setTimeout(
+              () => (window.location.href = responseData.redirect_url),
+              4000
+            );
+            return;
+          }
+
           if (!response.ok) {
             console.error("Form submission error response:", responseData);
             progressTitle.textContent = "Submission Error";
@@ -242,7 +307,7 @@ document.addEventListener("DOMContentLoaded", function () {
           ) {
             progressMessage.textContent =
               "Entry saved! AI enhancements are in progress...";
-            pollTaskStatus(responseData.entry_id, responseData.redirect_url);
+            streamTaskStatus(responseData.entry_id, responseData.redirect_url);
           } else {
             throw new Error(
               responseData.message ||